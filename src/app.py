@@ -1,9 +1,387 @@
 import streamlit as st
+from clients.extraction_cache import hash_bytes
 from clients.google_client import GoogleGeminiClient
+from clients.scheduler import RequestFailedError
+from contract_versions import ContractVersionStore, extract_contract_version, page_fingerprints
+from deal_store import DealStore
+from near_duplicates import NearDuplicateIndex
+from pdf_preprocess import CHUNKING_MIN_PAGES, count_pages, extract_hot_deals_chunked, extract_page_texts
+from postprocess import postprocess_hot_deals
+from functools import partial
 import pandas as pd
+import copy
 import json
+import math
 
-google_client = GoogleGeminiClient()
+PAGE_SIZE_OPTIONS = [5, 10, 25, 50]
+
+# Deal fields shown in the bulk-edit table, mapped to the key prefix of the matching detail widget
+BULK_EDIT_FIELDS = {
+    "name": "name",
+    "deal_type": "deal_type",
+    "marketing_headline": "headline",
+    "marketing_subtitle": "subtitle",
+    "urgency_message": "urgency",
+    "original_display_price": "orig_price",
+    "discounted_display_price": "disc_price",
+    "savings_percentage": "savings",
+    "valid_from": "valid_from",
+    "valid_until": "valid_until",
+    "booking_deadline": "booking_deadline",
+    "minimum_nights": "min_nights",
+    "maximum_nights": "max_nights",
+    "travel_dates_from": "travel_from",
+    "travel_dates_until": "travel_until",
+}
+
+# Session state that survives switching to another contract
+PERSISTENT_STATE_KEYS = {"page_size", "track_versions"}
+
+
+def render_hot_deal_editor(idx, hot_deal):
+    """
+    Renders the editable expander for one hot deal, writing edits back into the dict.
+    """
+    with st.expander(f"Hot Deal {idx+1}: {hot_deal.get('name', 'Unnamed Deal')}"):
+        # Editable fields for main hot deal info
+        hot_deal['name'] = st.text_input("Deal Name", value=hot_deal.get('name', ''), key=f"name_{idx}")
+        hot_deal['deal_type'] = st.text_input("Deal Type", value=hot_deal.get('deal_type', ''), key=f"deal_type_{idx}")
+        hot_deal['description'] = st.text_area("Description", value=hot_deal.get('description', ''), key=f"description_{idx}")
+        hot_deal['marketing_headline'] = st.text_input("Marketing Headline", value=hot_deal.get('marketing_headline', ''), key=f"headline_{idx}")
+        hot_deal['marketing_subtitle'] = st.text_input("Marketing Subtitle", value=hot_deal.get('marketing_subtitle', ''), key=f"subtitle_{idx}")
+        hot_deal['urgency_message'] = st.text_input("Urgency Message", value=hot_deal.get('urgency_message', ''), key=f"urgency_{idx}")
+        st.button("Regenerate marketing copy", key=f"regenerate_copy_{idx}", on_click=regenerate_marketing_copy, args=(idx,))
+        hot_deal['original_display_price'] = st.number_input("Original Display Price", value=hot_deal.get('original_display_price', 0.0), key=f"orig_price_{idx}")
+        hot_deal['discounted_display_price'] = st.number_input("Discounted Display Price", value=hot_deal.get('discounted_display_price', 0.0), key=f"disc_price_{idx}")
+        hot_deal['savings_percentage'] = st.number_input("Savings Percentage", value=hot_deal.get('savings_percentage', 0.0), key=f"savings_{idx}")
+        hot_deal['valid_from'] = st.text_input("Valid From (YYYY-MM-DD)", value=hot_deal.get('valid_from', ''), key=f"valid_from_{idx}")
+        hot_deal['valid_until'] = st.text_input("Valid Until (YYYY-MM-DD)", value=hot_deal.get('valid_until', ''), key=f"valid_until_{idx}")
+        hot_deal['booking_deadline'] = st.text_input("Booking Deadline (YYYY-MM-DD)", value=hot_deal.get('booking_deadline', ''), key=f"booking_deadline_{idx}")
+        hot_deal['minimum_nights'] = st.number_input("Minimum Nights", value=hot_deal.get('minimum_nights', 1), key=f"min_nights_{idx}", step=1)
+        hot_deal['maximum_nights'] = st.number_input("Maximum Nights", value=hot_deal.get('maximum_nights', 1), key=f"max_nights_{idx}", step=1)
+        hot_deal['travel_dates_from'] = st.text_input("Travel Dates From (YYYY-MM-DD)", value=hot_deal.get('travel_dates_from', ''), key=f"travel_from_{idx}")
+        hot_deal['travel_dates_until'] = st.text_input("Travel Dates Until (YYYY-MM-DD)", value=hot_deal.get('travel_dates_until', ''), key=f"travel_until_{idx}")
+
+        # Editable hotel info
+        # st.markdown("**Hotel Information**")
+        # hotel = hot_deal.get('hotel', {})
+        # hotel['name'] = st.text_input("Hotel Name", value=hotel.get('name', ''), key=f"hotel_name_{idx}")
+        # hotel['address'] = st.text_input("Hotel Address", value=hotel.get('address', ''), key=f"hotel_address_{idx}")
+        # hotel['rating'] = st.number_input("Hotel Rating", value=hotel.get('rating', 0.0), key=f"hotel_rating_{idx}")
+        # hotel['price'] = st.number_input("Hotel Price", value=hotel.get('price', 0.0), key=f"hotel_price_{idx}")
+        # hotel['image'] = st.text_input("Hotel Image URL", value=hotel.get('image', ''), key=f"hotel_image_{idx}")
+        # hotel['url'] = st.text_input("Hotel URL", value=hotel.get('url', ''), key=f"hotel_url_{idx}")
+        # hotel['description'] = st.text_area("Hotel Description", value=hotel.get('description', ''), key=f"hotel_desc_{idx}")
+        # hot_deal['hotel'] = hotel
+
+        # Deal Inclusions
+        st.markdown("**Deal Inclusions**")
+        deal_inclusions = hot_deal.get('deal_inclusions', [])
+        for i, inclusion in enumerate(deal_inclusions):
+            st.markdown(f"*Inclusion {i+1}*")
+            inclusion['title'] = st.text_input("Inclusion Title", value=inclusion.get('title', ''), key=f"inc_title_{idx}_{i}")
+            inclusion['description'] = st.text_area("Inclusion Description", value=inclusion.get('description', ''), key=f"inc_desc_{idx}_{i}")
+            inclusion['category'] = st.text_input("Inclusion Category", value=inclusion.get('category', ''), key=f"inc_cat_{idx}_{i}")
+        hot_deal['deal_inclusions'] = deal_inclusions
+
+        # Meal Plans
+        st.markdown("**Meal Plans**")
+        meal_plans = hot_deal.get('meal_plans', [])
+        if not meal_plans:
+            st.markdown("No meal plans found")
+        else:
+            for i, meal in enumerate(meal_plans):
+                st.markdown(f"*Meal Plan {i+1}*")
+                meal['name'] = st.text_input("Meal Plan Name", value=meal.get('name', ''), key=f"meal_name_{idx}_{i}")
+                meal['adult_price'] = st.number_input("Adult Price", value=meal.get('adult_price', 0.0) if meal.get('adult_price') is not None else 0.0, key=f"meal_adult_{idx}_{i}")
+                meal['child_price'] = st.number_input("Child Price", value=meal.get('child_price', 0.0) if meal.get('child_price') is not None else 0.0, key=f"meal_child_{idx}_{i}")
+                meal['infant_free'] = st.checkbox("Infant Free", value=meal.get('infant_free', False), key=f"meal_infant_{idx}_{i}")
+                meal['description'] = st.text_area("Meal Plan Description", value=meal.get('description', ''), key=f"meal_desc_{idx}_{i}")
+            hot_deal['meal_plans'] = meal_plans
+
+        # Special Offers
+        st.markdown("**Special Offers**")
+        special_offers = hot_deal.get('special_offers', [])
+        for i, offer in enumerate(special_offers):
+            st.markdown(f"*Special Offer {i+1}*")
+            offer['code'] = st.text_input("Offer Code", value=offer.get('code', ''), key=f"offer_code_{idx}_{i}")
+            offer['title'] = st.text_input("Offer Title", value=offer.get('title', ''), key=f"offer_title_{idx}_{i}")
+            offer['description'] = st.text_area("Offer Description", value=offer.get('description', ''), key=f"offer_desc_{idx}_{i}")
+            offer['min_nights'] = st.number_input("Min Nights", value=offer.get('min_nights', 1), key=f"offer_min_nights_{idx}_{i}", step=1)
+            offer['max_free_nights'] = st.number_input("Max Free Nights", value=offer.get('max_free_nights', 0), key=f"offer_max_free_{idx}_{i}", step=1)
+            offer['valid_from'] = st.text_input("Offer Valid From (YYYY-MM-DD)", value=offer.get('valid_from', ''), key=f"offer_valid_from_{idx}_{i}")
+            offer['valid_until'] = st.text_input("Offer Valid Until (YYYY-MM-DD)", value=offer.get('valid_until', ''), key=f"offer_valid_until_{idx}_{i}")
+        hot_deal['special_offers'] = special_offers
+
+        # Wedding Packages
+        st.markdown("**Wedding Packages**")
+        wedding_packages = hot_deal.get('wedding_packages', [])
+        for i, wedding in enumerate(wedding_packages):
+            st.markdown(f"*Wedding Package {i+1}*")
+            wedding['name'] = st.text_input("Wedding Package Name", value=wedding.get('name', ''), key=f"wed_name_{idx}_{i}")
+            wedding['base_price'] = st.number_input("Base Price", value=wedding.get('base_price', 0.0) if wedding.get('base_price') is not None else 0.0, key=f"wed_base_{idx}_{i}")
+            wedding['comissionable'] = st.checkbox("Comissionable", value=wedding.get('comissionable', False), key=f"wed_comm_{idx}_{i}")
+            wedding['min_guests'] = st.number_input("Min Guests", value=wedding.get('min_guests', 2), key=f"wed_min_guests_{idx}_{i}", step=1)
+            wedding['description'] = st.text_area("Wedding Description", value=wedding.get('description', ''), key=f"wed_desc_{idx}_{i}")
+            wedding['code'] = st.text_input("Wedding Code", value=wedding.get('code', ''), key=f"wed_code_{idx}_{i}")
+        hot_deal['wedding_packages'] = wedding_packages
+
+
+def regenerate_marketing_copy(idx):
+    # Only the copy model is called, with the deal's facts; the contract is not re-extracted
+    hot_deal = st.session_state["hot_deals"][idx]
+    try:
+        hot_deal.update(get_google_client().generate_marketing_copy(hot_deal, refresh=True))
+    except Exception as e:
+        st.session_state[f"regenerate_copy_error_{idx}"] = str(e)
+        return
+    st.session_state.pop(f"regenerate_copy_error_{idx}", None)
+    for prefix in ("headline", "subtitle", "urgency"):
+        st.session_state.pop(f"{prefix}_{idx}", None)
+
+
+def bulk_row(hot_deal):
+    return tuple(hot_deal.get(field) for field in BULK_EDIT_FIELDS)
+
+
+@st.fragment
+def deal_editor_fragment(idx):
+    # Widget interactions inside one deal only rerun this fragment
+    hot_deal = st.session_state["hot_deals"][idx]
+    render_hot_deal_editor(idx, hot_deal)
+    if f"regenerate_copy_error_{idx}" in st.session_state:
+        st.error(f"Failed to regenerate marketing copy: {st.session_state[f'regenerate_copy_error_{idx}']}")
+    # A change to a field shown in the bulk table (an edit or regenerated copy) updates only
+    # this deal's table row; the table shows it the next time its fragment or the page reruns,
+    # under a new widget key so no stale diff is replayed over it
+    row = bulk_row(hot_deal)
+    if row != st.session_state["bulk_rows"][idx]:
+        st.session_state["bulk_rows"][idx] = row
+        st.session_state["bulk_base"].loc[idx] = list(row)
+        st.session_state["bulk_version"] += 1
+
+
+def apply_bulk_edits(editor_key):
+    """
+    Copies cells changed in the bulk-edit table into the touched deals only, and
+    drops the matching detail widget state so those widgets pick up the new values.
+    """
+    for row, changes in st.session_state[editor_key]["edited_rows"].items():
+        hot_deal = st.session_state["hot_deals"][int(row)]
+        for field, value in changes.items():
+            hot_deal[field] = value
+            st.session_state.pop(f"{BULK_EDIT_FIELDS[field]}_{row}", None)
+    st.session_state["bulk_edits_applied"] = True
+
+
+@st.fragment
+def bulk_editor_fragment():
+    st.markdown("**Bulk Edit**")
+    hot_deals = st.session_state["hot_deals"]
+    rows = [bulk_row(hot_deal) for hot_deal in hot_deals]
+    # The table is rebuilt from the deals whenever they changed (through it, the detail
+    # forms or regenerated copy); a new widget key starts it with no pending diffs
+    if rows != st.session_state.get("bulk_rows"):
+        st.session_state["bulk_rows"] = rows
+        st.session_state["bulk_base"] = pd.DataFrame(rows, columns=list(BULK_EDIT_FIELDS))
+        st.session_state["bulk_version"] = st.session_state.get("bulk_version", 0) + 1
+    editor_key = f"bulk_editor_{st.session_state['bulk_version']}"
+    st.data_editor(st.session_state["bulk_base"], key=editor_key, on_change=apply_bulk_edits, args=(editor_key,),
+                   num_rows="fixed")
+    if st.session_state.pop("bulk_edits_applied", False):
+        # Deal expanders and consistency checks outside this fragment show the edited values too
+        st.rerun()
+
+
+@st.fragment
+def consistency_checks_fragment(download_options):
+    issues = postprocess_hot_deals({"hot_deals": st.session_state["hot_deals"]})
+    if issues.empty:
+        st.caption("No consistency issues found.")
+    else:
+        st.subheader("Consistency Checks")
+        st.dataframe(issues, hide_index=True)
+    download_options["fix"] = st.checkbox("Fix inverted ranges and recompute savings in the download", value=True,
+                                          key="fix_download")
+    st.button("Re-run checks")
+
+
+def download_payload(hot_deals, download_options):
+    # Built when the button is clicked, so it reflects edits made in any fragment
+    data = {"hot_deals": copy.deepcopy(hot_deals)}
+    if download_options.get("version_contract_id"):
+        get_version_store().save_edits(download_options["version_contract_id"], data["hot_deals"])
+    if download_options.get("fix"):
+        postprocess_hot_deals(data, fix=True)
+    return json.dumps(data, indent=2)
+
+
+def extract_with_preview(file_bytes, display_name, page_texts=None):
+    """
+    Runs the extraction, previewing each deal as soon as it is produced.
+    :return: The extracted data as a dict (``hot_deals`` and, if any, ``validation_errors``).
+    """
+    hot_deals = []
+    preview = st.container()
+    with st.spinner("Extracting hot deal packages..."):
+        if count_pages(file_bytes) >= CHUNKING_MIN_PAGES:
+            # Large contracts: only the relevant pages are extracted, in parallel chunks
+            data = extract_hot_deals_chunked(google_client, file_bytes, display_name=display_name, page_texts=page_texts)
+            if "error" in data:
+                raise ValueError(data["error"])
+            deal_stream = data.get("hot_deals", [])
+        else:
+            # Deals are shown as soon as each one is generated (or replayed instantly from cache)
+            data = None
+            deal_stream = google_client.stream_hot_deal_packages_from_bytes(file_bytes, display_name=display_name)
+        for idx, hot_deal in enumerate(deal_stream):
+            hot_deals.append(hot_deal)
+            with preview.expander(f"Hot Deal {idx+1}: {hot_deal.get('name', 'Unnamed Deal')}"):
+                st.json(hot_deal, expanded=False)
+    if data is None:
+        # The finished stream was just cached together with its validation report
+        data = google_client.cached_hot_deal_packages(file_bytes) or {"hot_deals": hot_deals}
+    return data
+
+
+def section_extractor(file_bytes, page_texts=None):
+    """
+    Returns the section extractor for tracked contract versions: a section covering the
+    whole contract (below CHUNKING_MIN_PAGES) keeps the streaming preview, smaller
+    sections of a large contract are extracted directly.
+    """
+    def extract(section_bytes, section_name):
+        if section_bytes is file_bytes:
+            return extract_with_preview(section_bytes, section_name, page_texts)
+        return google_client.extract_hot_deal_packages_from_bytes(section_bytes, display_name=section_name)
+    return extract
+
+
+@st.cache_resource
+def get_google_client():
+    # One client per server process so the in-memory extraction cache survives reruns
+    client = GoogleGeminiClient()
+    client.file_registry.start_sweeper()
+    return client
+
+
+@st.cache_resource
+def get_version_store():
+    return ContractVersionStore()
+
+
+@st.cache_resource
+def get_deal_store():
+    return DealStore()
+
+
+@st.cache_resource
+def get_duplicate_index():
+    return NearDuplicateIndex()
+
+
+def choose_duplicate_action(contract_key, action):
+    st.session_state["duplicate_action"] = {contract_key: action}
+
+
+def contract_page_texts(contract_key, file_bytes):
+    # Extracted once per upload and shared by revision matching, near-duplicates, chunking and indexing
+    if st.session_state.get("page_texts", (None,))[0] != contract_key:
+        st.session_state["page_texts"] = (contract_key, extract_page_texts(file_bytes))
+    return st.session_state["page_texts"][1]
+
+
+def near_duplicate_prompt(contract_key, file_bytes, page_texts):
+    """
+    Looks for an earlier contract this upload is a near-duplicate of (a re-scan, a
+    re-export, a new cover page), before anything is sent to Gemini. A match whose offer
+    and rate pages differ is shown with a warning and left to the user.
+    :return: "reuse" or "extract" once the user has decided, "extract" when there is no
+             near-duplicate; stops the script while the user is being asked.
+    """
+    action = st.session_state.get("duplicate_action", {}).get(contract_key)
+    if action:
+        return action
+    # Checked once per upload; reruns while the user decides reuse the match
+    if st.session_state.get("duplicate_check", (None,))[0] != contract_key:
+        # Matches whose rate and offer pages differ are shown too, with a warning
+        match = get_duplicate_index().find(file_bytes, page_texts=page_texts, include_differing=True)
+        st.session_state["duplicate_check"] = (contract_key, match)
+    match = st.session_state["duplicate_check"][1]
+    if match is None:
+        return "extract"
+    st.info(f"This contract is {match['similarity']:.0%} similar to {match['display_name']}, "
+            f"extracted {match['indexed_at'][:10]}.")
+    differ = match["deal_pages_differ"]
+    if differ:
+        if match["deal_pages_similarity"] is None:
+            st.warning("Its rate and offer pages could not be compared with this upload's. "
+                       "Check the deals before reusing them.")
+        else:
+            figures = " and their figures differ" if match["deal_figures_match"] is False else ""
+            st.warning(f"Its rate and offer pages differ: {match['deal_pages_similarity']:.0%} similar{figures}. "
+                       "Check the deals before reusing them.")
+    with st.expander(f"Earlier extraction: {len(match['result'].get('hot_deals', []))} deal(s)"):
+        st.json(match["result"], expanded=False)
+    reuse_col, extract_col = st.columns(2)
+    reuse_col.button("Reuse this extraction", type="secondary" if differ else "primary",
+                     on_click=choose_duplicate_action, args=(contract_key, "reuse"))
+    extract_col.button("Extract anyway", type="primary" if differ else "secondary", on_click=choose_duplicate_action,
+                       args=(contract_key, "extract"))
+    st.stop()
+
+
+def index_extraction(file_bytes, display_name, hot_deals, page_texts):
+    # Later near-duplicates of this contract are offered these deals
+    try:
+        get_duplicate_index().add_contract(file_bytes, {"hot_deals": hot_deals}, display_name=display_name,
+                                           page_texts=page_texts)
+    except Exception as e:
+        st.toast(f"Could not index this contract for near-duplicate detection: {e}")
+
+
+@st.fragment(run_every=5)
+def metrics_panel():
+    # Process-wide: the client (and its telemetry) is shared by every session of this server
+    report = get_google_client().telemetry.report()
+    st.markdown("**Extraction Metrics**")
+    totals = report["totals"]
+    tokens_col, cost_col = st.columns(2)
+    tokens_col.metric("Tokens", f"{totals['prompt_tokens'] + totals['output_tokens']:,}")
+    cost_col.metric("Est. cost", f"${totals['cost_usd']:.4f}")
+    if report["stages"]:
+        stages = pd.DataFrame.from_dict(report["stages"], orient="index")
+        st.dataframe(stages[["count", "errors", "mean_ms", "p95_ms"]])
+    scheduler = get_google_client().scheduler.stats()
+    st.caption(
+        f"Requests: {scheduler['attempts']} attempts, {scheduler['retries']} retries, {scheduler['hedges']} hedged, "
+        f"{scheduler['fallbacks']} fallbacks, {scheduler['throttled']} throttled · "
+        f"concurrency {scheduler['in_flight']}/{scheduler['concurrency_limit']}"
+    )
+
+
+def save_current_edits():
+    # Edits of the contract on screen become the base a revision of it is merged into
+    contract_id = st.session_state.get("download_options", {}).get("version_contract_id")
+    if contract_id and "hot_deals" in st.session_state:
+        get_version_store().save_edits(contract_id, st.session_state["hot_deals"])
+
+
+def save_to_deal_store():
+    # Stored as downloaded, so queries see the same fixed-up deals as the JSON file
+    download_options = st.session_state["download_options"]
+    data = {"hot_deals": copy.deepcopy(st.session_state["hot_deals"])}
+    if download_options.get("fix"):
+        postprocess_hot_deals(data, fix=True)
+    contract = download_options.get("version_contract_id") or st.session_state["contract_key"]
+    count = get_deal_store().upsert_extraction(data, contract)
+    st.toast(f"Saved {count} deal(s) to the deal store")
+
+
+google_client = get_google_client()
+
+with st.sidebar:
+    metrics_panel()
 
 st.title("Hot Deal Package Extractor")
 
@@ -12,109 +390,106 @@ st.write("Upload a hotel rates contract as a PDF file and automatically extract
 uploaded_file = st.file_uploader("Upload a PDF file", type="pdf")
 
 if uploaded_file is not None:
-    uploaded_file = google_client.upload_pdf(uploaded_file.read())
-    file_name = getattr(uploaded_file, "name", None)
-    st.write("File uploaded successfully")
-    st.write(uploaded_file)
-    with st.spinner("Extracting hot deal packages..."):
-      # Extract hot deals as JSON string
-      hot_deals_data = google_client.extract_hot_deal_packages(uploaded_file)
-
-      if hot_deals_data:
-          st.subheader("Extracted Hot Deals (Editable)")
-          # convert the hot_deals_data to a pandas dataframe
-          # hot_deals_data is already a JSON object (dict), so just extract the hot_deals list and convert to DataFrame
-          hot_deals_list = hot_deals_data.get("hot_deals", [])
-          
-          # For each hot deal, display editable fields in an expander
-          for idx, hot_deal in enumerate(hot_deals_list):
-              with st.expander(f"Hot Deal {idx+1}: {hot_deal.get('name', 'Unnamed Deal')}"):
-                  # Editable fields for main hot deal info
-                  hot_deal['name'] = st.text_input("Deal Name", value=hot_deal.get('name', ''), key=f"name_{idx}")
-                  hot_deal['deal_type'] = st.text_input("Deal Type", value=hot_deal.get('deal_type', ''), key=f"deal_type_{idx}")
-                  hot_deal['description'] = st.text_area("Description", value=hot_deal.get('description', ''), key=f"description_{idx}")
-                  hot_deal['marketing_headline'] = st.text_input("Marketing Headline", value=hot_deal.get('marketing_headline', ''), key=f"headline_{idx}")
-                  hot_deal['marketing_subtitle'] = st.text_input("Marketing Subtitle", value=hot_deal.get('marketing_subtitle', ''), key=f"subtitle_{idx}")
-                  hot_deal['urgency_message'] = st.text_input("Urgency Message", value=hot_deal.get('urgency_message', ''), key=f"urgency_{idx}")
-                  hot_deal['original_display_price'] = st.number_input("Original Display Price", value=hot_deal.get('original_display_price', 0.0), key=f"orig_price_{idx}")
-                  hot_deal['discounted_display_price'] = st.number_input("Discounted Display Price", value=hot_deal.get('discounted_display_price', 0.0), key=f"disc_price_{idx}")
-                  hot_deal['savings_percentage'] = st.number_input("Savings Percentage", value=hot_deal.get('savings_percentage', 0.0), key=f"savings_{idx}")
-                  hot_deal['valid_from'] = st.text_input("Valid From (YYYY-MM-DD)", value=hot_deal.get('valid_from', ''), key=f"valid_from_{idx}")
-                  hot_deal['valid_until'] = st.text_input("Valid Until (YYYY-MM-DD)", value=hot_deal.get('valid_until', ''), key=f"valid_until_{idx}")
-                  hot_deal['booking_deadline'] = st.text_input("Booking Deadline (YYYY-MM-DD)", value=hot_deal.get('booking_deadline', ''), key=f"booking_deadline_{idx}")
-                  hot_deal['minimum_nights'] = st.number_input("Minimum Nights", value=hot_deal.get('minimum_nights', 1), key=f"min_nights_{idx}", step=1)
-                  hot_deal['maximum_nights'] = st.number_input("Maximum Nights", value=hot_deal.get('maximum_nights', 1), key=f"max_nights_{idx}", step=1)
-                  hot_deal['travel_dates_from'] = st.text_input("Travel Dates From (YYYY-MM-DD)", value=hot_deal.get('travel_dates_from', ''), key=f"travel_from_{idx}")
-                  hot_deal['travel_dates_until'] = st.text_input("Travel Dates Until (YYYY-MM-DD)", value=hot_deal.get('travel_dates_until', ''), key=f"travel_until_{idx}")
-
-                  # Editable hotel info
-                  # st.markdown("**Hotel Information**")
-                  # hotel = hot_deal.get('hotel', {})
-                  # hotel['name'] = st.text_input("Hotel Name", value=hotel.get('name', ''), key=f"hotel_name_{idx}")
-                  # hotel['address'] = st.text_input("Hotel Address", value=hotel.get('address', ''), key=f"hotel_address_{idx}")
-                  # hotel['rating'] = st.number_input("Hotel Rating", value=hotel.get('rating', 0.0), key=f"hotel_rating_{idx}")
-                  # hotel['price'] = st.number_input("Hotel Price", value=hotel.get('price', 0.0), key=f"hotel_price_{idx}")
-                  # hotel['image'] = st.text_input("Hotel Image URL", value=hotel.get('image', ''), key=f"hotel_image_{idx}")
-                  # hotel['url'] = st.text_input("Hotel URL", value=hotel.get('url', ''), key=f"hotel_url_{idx}")
-                  # hotel['description'] = st.text_area("Hotel Description", value=hotel.get('description', ''), key=f"hotel_desc_{idx}")
-                  # hot_deal['hotel'] = hotel
-
-                  # Deal Inclusions
-                  st.markdown("**Deal Inclusions**")
-                  deal_inclusions = hot_deal.get('deal_inclusions', [])
-                  for i, inclusion in enumerate(deal_inclusions):
-                      st.markdown(f"*Inclusion {i+1}*")
-                      inclusion['title'] = st.text_input("Inclusion Title", value=inclusion.get('title', ''), key=f"inc_title_{idx}_{i}")
-                      inclusion['description'] = st.text_area("Inclusion Description", value=inclusion.get('description', ''), key=f"inc_desc_{idx}_{i}")
-                      inclusion['category'] = st.text_input("Inclusion Category", value=inclusion.get('category', ''), key=f"inc_cat_{idx}_{i}")
-                  hot_deal['deal_inclusions'] = deal_inclusions
-
-                  # Meal Plans
-                  st.markdown("**Meal Plans**")
-                  meal_plans = hot_deal.get('meal_plans', [])
-                  if not meal_plans:
-                      st.markdown("No meal plans found")
-                  else:
-                    for i, meal in enumerate(meal_plans):
-                        st.markdown(f"*Meal Plan {i+1}*")
-                        meal['name'] = st.text_input("Meal Plan Name", value=meal.get('name', ''), key=f"meal_name_{idx}_{i}")
-                        meal['adult_price'] = st.number_input("Adult Price", value=meal.get('adult_price', 0.0) if meal.get('adult_price') is not None else 0.0, key=f"meal_adult_{idx}_{i}")
-                        meal['child_price'] = st.number_input("Child Price", value=meal.get('child_price', 0.0) if meal.get('child_price') is not None else 0.0, key=f"meal_child_{idx}_{i}")
-                        meal['infant_free'] = st.checkbox("Infant Free", value=meal.get('infant_free', False), key=f"meal_infant_{idx}_{i}")
-                        meal['description'] = st.text_area("Meal Plan Description", value=meal.get('description', ''), key=f"meal_desc_{idx}_{i}")
-                    hot_deal['meal_plans'] = meal_plans
-
-                  # Special Offers
-                  st.markdown("**Special Offers**")
-                  special_offers = hot_deal.get('special_offers', [])
-                  for i, offer in enumerate(special_offers):
-                      st.markdown(f"*Special Offer {i+1}*")
-                      offer['code'] = st.text_input("Offer Code", value=offer.get('code', ''), key=f"offer_code_{idx}_{i}")
-                      offer['title'] = st.text_input("Offer Title", value=offer.get('title', ''), key=f"offer_title_{idx}_{i}")
-                      offer['description'] = st.text_area("Offer Description", value=offer.get('description', ''), key=f"offer_desc_{idx}_{i}")
-                      offer['min_nights'] = st.number_input("Min Nights", value=offer.get('min_nights', 1), key=f"offer_min_nights_{idx}_{i}", step=1)
-                      offer['max_free_nights'] = st.number_input("Max Free Nights", value=offer.get('max_free_nights', 0), key=f"offer_max_free_{idx}_{i}", step=1)
-                      offer['valid_from'] = st.text_input("Offer Valid From (YYYY-MM-DD)", value=offer.get('valid_from', ''), key=f"offer_valid_from_{idx}_{i}")
-                      offer['valid_until'] = st.text_input("Offer Valid Until (YYYY-MM-DD)", value=offer.get('valid_until', ''), key=f"offer_valid_until_{idx}_{i}")
-                  hot_deal['special_offers'] = special_offers
-
-                  # Wedding Packages
-                  st.markdown("**Wedding Packages**")
-                  wedding_packages = hot_deal.get('wedding_packages', [])
-                  for i, wedding in enumerate(wedding_packages):
-                      st.markdown(f"*Wedding Package {i+1}*")
-                      wedding['name'] = st.text_input("Wedding Package Name", value=wedding.get('name', ''), key=f"wed_name_{idx}_{i}")
-                      wedding['base_price'] = st.number_input("Base Price", value=wedding.get('base_price', 0.0) if wedding.get('base_price') is not None else 0.0, key=f"wed_base_{idx}_{i}")
-                      wedding['comissionable'] = st.checkbox("Comissionable", value=wedding.get('comissionable', False), key=f"wed_comm_{idx}_{i}")
-                      wedding['min_guests'] = st.number_input("Min Guests", value=wedding.get('min_guests', 2), key=f"wed_min_guests_{idx}_{i}", step=1)
-                      wedding['description'] = st.text_area("Wedding Description", value=wedding.get('description', ''), key=f"wed_desc_{idx}_{i}")
-                      wedding['code'] = st.text_input("Wedding Code", value=wedding.get('code', ''), key=f"wed_code_{idx}_{i}")
-                  hot_deal['wedding_packages'] = wedding_packages
-          
-          st.download_button(
-              label="Download as JSON",
-              data=json.dumps({"hot_deals": hot_deals_list}, indent=2),
-              file_name=f"{file_name}_hot_deals.json",
-              mime="application/json",
-              type="primary",  # This makes the button red in Streamlit
-          )
+    file_name = uploaded_file.name.rsplit(".", 1)[0]
+    file_bytes = uploaded_file.getvalue()
+    contract_key = hash_bytes(file_bytes)
+
+    track_versions = st.sidebar.checkbox("Track contract versions", value=True, key="track_versions",
+                                         help="Re-extract only the changed parts of a revised contract and keep your edits")
+
+    if st.session_state.get("contract_key") != contract_key:
+        revision, chunk_errors, reused_from, validation_errors = None, None, None, None
+        page_texts = contract_page_texts(contract_key, file_bytes)
+        # A known contract's revision is re-extracted incrementally, never replaced by a near-duplicate's deals
+        is_revision = track_versions and get_version_store().find_previous(
+            page_fingerprints(file_bytes, page_texts)[1], page_texts) is not None
+        duplicate_action = "extract" if is_revision else near_duplicate_prompt(contract_key, file_bytes, page_texts)
+        try:
+            if duplicate_action == "reuse":
+                match = st.session_state["duplicate_check"][1]
+                hot_deals_list, reused_from = match["result"].get("hot_deals", []), match["display_name"]
+            elif track_versions:
+                save_current_edits()
+                with st.spinner("Extracting changed sections..."):
+                    data = extract_contract_version(google_client, file_bytes, get_version_store(),
+                                                    display_name=uploaded_file.name,
+                                                    page_texts=page_texts,
+                                                    extract=section_extractor(file_bytes, page_texts))
+                if "error" in data:
+                    raise ValueError(data["error"])
+                hot_deals_list, revision = data["hot_deals"], data["revision"]
+                chunk_errors, validation_errors = data.get("chunk_errors"), data.get("validation_errors")
+            else:
+                data = extract_with_preview(file_bytes, uploaded_file.name, page_texts)
+                hot_deals_list, validation_errors = data.get("hot_deals", []), data.get("validation_errors")
+        except (ValueError, RequestFailedError) as e:
+            # Model errors surface here once the scheduler's retries, fallback and deadline are exhausted
+            st.error(f"Failed to extract hot deals: {e}")
+            st.stop()
+        if duplicate_action == "extract" and not chunk_errors:
+            index_extraction(file_bytes, uploaded_file.name, hot_deals_list, page_texts)
+        # A new contract: forget the previous contract's deals and widget state
+        for key in list(st.session_state.keys()):
+            if key not in PERSISTENT_STATE_KEYS:
+                del st.session_state[key]
+        st.session_state["contract_key"] = contract_key
+        # Edits go to a private copy, never to the cached extraction
+        st.session_state["hot_deals"] = copy.deepcopy(hot_deals_list)
+        st.session_state["revision"] = revision
+        st.session_state["reused_from"] = reused_from
+        st.session_state["chunk_errors"] = chunk_errors
+        st.session_state["validation_errors"] = validation_errors
+        st.session_state["download_options"] = {"fix": True,
+                                                "version_contract_id": revision["contract_id"] if revision else None}
+        st.rerun()
+
+    hot_deals_list = st.session_state["hot_deals"]
+    st.sidebar.write("Extraction cache", google_client.cache.stats())
+
+    if st.session_state.get("chunk_errors"):
+        st.warning(f"{len(st.session_state['chunk_errors'])} section(s) failed and will be retried on the next upload: "
+                   f"{st.session_state['chunk_errors'][0]}")
+
+    if st.session_state.get("reused_from"):
+        st.info(f"Showing the extraction of {st.session_state['reused_from']}; nothing was sent to Gemini.")
+
+    revision = st.session_state.get("revision")
+    if revision and revision.get("unchanged"):
+        st.info(f"This is version {revision['version']} of a contract extracted before; showing your saved edits.")
+    elif revision and revision.get("previous_version"):
+        deals = revision["deals"]
+        st.info(
+            f"Revision {revision['version']} of a known contract: {len(revision['changed_pages'])} page(s) changed, "
+            f"{revision['reextracted_sections']}/{revision['sections']} section(s) re-extracted. "
+            f"Deals kept: {deals['kept']}, updated: {deals['updated']}, added: {deals['added']}, "
+            f"removed: {deals['removed']}."
+        )
+
+    validation_errors = st.session_state.get("validation_errors")
+    if validation_errors:
+        with st.expander(f"{len(validation_errors)} deal(s) were repaired or rejected during validation"):
+            st.json(validation_errors)
+
+    if hot_deals_list:
+        st.subheader("Extracted Hot Deals (Editable)")
+        bulk_editor_fragment()
+
+        page_size = st.selectbox("Deals per page", PAGE_SIZE_OPTIONS, index=1, key="page_size")
+        page_count = math.ceil(len(hot_deals_list) / page_size)
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key="page")
+        # Only the current page's deals get detail widgets, so widget count is bounded by the page size
+        for idx in range((page - 1) * page_size, min(page * page_size, len(hot_deals_list))):
+            deal_editor_fragment(idx)
+
+        consistency_checks_fragment(st.session_state["download_options"])
+
+        st.download_button(
+            label="Download as JSON",
+            data=partial(download_payload, hot_deals_list, st.session_state["download_options"]),
+            file_name=f"{file_name}_hot_deals.json",
+            mime="application/json",
+            on_click="ignore",
+            type="primary",  # This makes the button red in Streamlit
+        )
+        st.button("Save to deal store", on_click=save_to_deal_store,
+                  help="Add these deals to the searchable deal store, replacing this contract's earlier ones")
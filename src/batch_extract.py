@@ -0,0 +1,237 @@
+"""
+Headless bulk extraction over a folder (or manifest) of hotel contracts.
+
+Usage:
+    python src/batch_extract.py contracts/ -o hot_deals.jsonl --concurrency 8 --rpm 60
+
+Each finished contract is appended to the JSONL output as soon as it completes.
+Rerunning with the same output file skips contracts that already succeeded.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import copy
+import json
+import os
+import sys
+import threading
+import time
+
+from clients.extraction_cache import hash_bytes
+from clients.google_client import GoogleGeminiClient, marketing_copy_failures
+from clients.rate_limiter import RateLimiter
+from clients.scheduler import RequestScheduler
+from clients.telemetry import JsonLogSink, PrometheusTextSink, Telemetry, format_report
+from compact_models import CompactDeals
+from deal_store import DealStore, import_file
+from near_duplicates import DUPLICATE_THRESHOLD, NearDuplicateIndex
+from pdf_preprocess import extract_hot_deals_chunked, extract_page_texts
+from postprocess import postprocess_hot_deals
+
+def find_contracts(source):
+    """
+    Resolves the batch input into a sorted list of PDF paths.
+    :param source: A directory (searched recursively for PDFs) or a manifest file with one path per line.
+    :return: List of PDF file paths.
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+        return sorted(paths)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [line if os.path.isabs(line) else os.path.join(base_dir, line)
+            for line in lines if line and not line.startswith("#")]
+
+
+def load_completed(output_path):
+    """
+    Reads an existing JSONL output and returns the hashes of contracts that succeeded.
+    :param output_path: Path of the JSONL results file.
+    :return: Set of SHA-256 digests.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partially written last line from an interrupted run
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["sha256"])
+    return completed
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def run_batch(client, paths, output_path, concurrency=4, prompt=None, model=None, log=print,
+              fix=False, near_duplicates=None, duplicate_threshold=DUPLICATE_THRESHOLD):
+    """
+    Extracts every contract in ``paths`` concurrently and streams results to ``output_path``.
+    :param client: GoogleGeminiClient used for uploads and extraction.
+    :param paths: PDF file paths to process.
+    :param output_path: JSONL file results are appended to.
+    :param concurrency: Maximum number of contracts in flight.
+    :param prompt: The prompt to use for extraction.
+    :param model: The Gemini model to use.
+    :param log: Callable receiving progress messages.
+    :param fix: Fix inverted ranges and recompute savings in each result before writing it.
+    :param near_duplicates: Optional NearDuplicateIndex. A contract at least
+                            ``duplicate_threshold`` similar to an indexed one, whose offer
+                            and rate pages hold the same figures and are near-identical,
+                            reuses its result instead of being extracted; extracted
+                            contracts are indexed.
+    :param duplicate_threshold: Minimum estimated similarity for reuse.
+    :return: Dict with ok/incomplete/error/skipped counts, wall-clock seconds and the client's
+             telemetry report (per-stage timings, tokens and estimated cost).
+    """
+    completed = load_completed(output_path)
+    write_lock = threading.Lock()
+    summary = {"ok": 0, "incomplete": 0, "error": 0, "skipped": 0}
+
+    def process(path):
+        with open(path, "rb") as f:
+            file_bytes = f.read()
+        digest = hash_bytes(file_bytes)
+        if digest in completed:
+            return None
+
+        started = time.perf_counter()
+        record = {"path": path, "sha256": digest}
+        try:
+            data = client.cached_hot_deal_packages(file_bytes, prompt=prompt, model=model)
+            page_texts = None
+            if data is None and near_duplicates is not None:
+                # Extracted once, for the near-duplicate lookup, chunking and indexing
+                page_texts = extract_page_texts(file_bytes)
+                match = near_duplicates.find(file_bytes, duplicate_threshold, page_texts=page_texts)
+                if match is not None:
+                    data = match["result"]
+                    record["near_duplicate_of"] = {key: match[key] for key in (
+                        "sha256", "display_name", "similarity", "deal_pages_similarity")}
+            if data is None:
+                data = extract_hot_deals_chunked(
+                    client, file_bytes, display_name=os.path.basename(path), prompt=prompt, model=model,
+                    page_texts=page_texts,
+                )
+                if near_duplicates is not None and "error" not in data and not data.get("chunk_errors") \
+                        and not marketing_copy_failures(data):
+                    near_duplicates.add_contract(file_bytes, data, display_name=os.path.basename(path),
+                                                 page_texts=page_texts)
+            if "error" in data:
+                record.update(status="error", error=data["error"])
+            else:
+                if fix:
+                    # Results may be shared with the client's in-memory cache
+                    data = copy.deepcopy(data)
+                issues = postprocess_hot_deals(data, fix=fix)
+                # Deals with empty marketing copy are written but retried on the next run
+                copy_failures = marketing_copy_failures(data)
+                record.update(status="incomplete" if copy_failures else "ok", result=data,
+                              issues=issues[["deal_index", "issues"]].to_dict("records"))
+                if copy_failures:
+                    record["marketing_copy_failures"] = copy_failures
+        except Exception as e:
+            record.update(status="error", error=str(e))
+        record["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        return record
+
+    started = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # An interrupted run can leave a partial last line; the next record must not be appended to it
+        if out.tell() and not _ends_with_newline(output_path):
+            out.write("\n")
+        futures = {pool.submit(process, path): path for path in paths}
+        for future in as_completed(futures):
+            record = future.result()
+            if record is None:
+                summary["skipped"] += 1
+                continue
+            summary[record["status"]] += 1
+            with write_lock:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+            log(f"[{record['status']}] {record['path']} ({record['elapsed_seconds']}s)")
+
+    summary["wall_seconds"] = round(time.perf_counter() - started, 3)
+    summary["telemetry"] = client.telemetry.flush()
+    return summary
+
+
+def write_compact(output_path, compact_path):
+    """
+    Collects every successful result of a JSONL output into one CompactDeals file,
+    with hotels and deals interned across contracts.
+    :param output_path: Path of the JSONL results file.
+    :param compact_path: Path of the column-oriented JSON file to write.
+    :return: The CompactDeals instance.
+    """
+    compact = CompactDeals()
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") == "ok":
+                compact.add_extraction(record["result"], source=record["sha256"])
+    with open(compact_path, "w", encoding="utf-8") as f:
+        json.dump(compact.to_dict(), f)
+    return compact
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract hot deal packages from a folder of hotel contracts.")
+    parser.add_argument("source", help="Directory of PDFs or a manifest file with one PDF path per line")
+    parser.add_argument("-o", "--output", default="hot_deals.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Maximum contracts in flight")
+    parser.add_argument("--rpm", type=int, default=None, help="Requests-per-minute budget")
+    parser.add_argument("--tpm", type=int, default=None, help="Input tokens-per-minute budget")
+    parser.add_argument("--model", default=None, help="Gemini model to use")
+    parser.add_argument("--fix", action="store_true", help="Fix inverted ranges and recompute savings in results")
+    parser.add_argument("--compact", default=None, help="Also write all results as one normalized, columnar JSON file")
+    parser.add_argument("--near-duplicates", default=None,
+                        help="MinHash index of past contracts; near-duplicates reuse the earlier result")
+    parser.add_argument("--duplicate-threshold", type=float, default=DUPLICATE_THRESHOLD,
+                        help="Minimum similarity for a near-duplicate to be reused")
+    parser.add_argument("--store", default=None, help="Also upsert all results into this SQLite deal store")
+    parser.add_argument("--metrics-log", default=None, help="Append every timing/usage event as a JSON line here")
+    parser.add_argument("--prometheus", default=None, help="Write the final metrics here in Prometheus text format")
+    args = parser.parse_args(argv)
+
+    sinks = []
+    if args.metrics_log:
+        sinks.append(JsonLogSink(args.metrics_log))
+    if args.prometheus:
+        sinks.append(PrometheusTextSink(args.prometheus))
+    paths = find_contracts(args.source)
+    # Every request (chunks, retries, marketing copy) takes from the quota through the scheduler
+    limiter = RateLimiter(args.rpm, args.tpm) if args.rpm or args.tpm else None
+    telemetry = Telemetry(sinks)
+    scheduler = RequestScheduler(telemetry=telemetry, rate_limiter=limiter)
+    near_duplicates = NearDuplicateIndex(args.near_duplicates) if args.near_duplicates else None
+    summary = run_batch(GoogleGeminiClient(telemetry=telemetry, scheduler=scheduler), paths, args.output,
+                        concurrency=args.concurrency, model=args.model, fix=args.fix,
+                        near_duplicates=near_duplicates, duplicate_threshold=args.duplicate_threshold)
+    if args.compact:
+        write_compact(args.output, args.compact)
+    if args.store:
+        store = DealStore(args.store)
+        summary["stored_deals"] = import_file(store, args.output)
+        store.close()
+    print(format_report(summary["telemetry"]), file=sys.stderr)
+    print(json.dumps(summary))
+    return 0 if summary["error"] == 0 and summary["incomplete"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
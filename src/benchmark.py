@@ -0,0 +1,303 @@
+"""
+End-to-end performance benchmarks for the extraction pipeline, run offline
+against the deterministic FakeBackend.
+
+Usage:
+    python src/benchmark.py --contracts 20 --deal-counts 1,10,50 --latency 0.05 -o bench.json
+    python src/benchmark.py --corpus samples/contracts --responses samples/responses
+
+Measures per-contract latency, streaming time-to-first-deal, batch throughput,
+peak memory, marketing copy regeneration latency and response parse time, and writes a stable JSON report (sorted keys,
+fixed metric names) so runs can be diffed to track regressions.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pypdf import PdfWriter
+
+from batch_extract import find_contracts, run_batch
+from clients.backends import FakeBackend
+from clients.extraction_cache import ExtractionCache
+from clients.file_registry import FileRegistry
+from clients.google_client import GoogleGeminiClient, parse_hot_deals_response
+from clients.scheduler import RequestScheduler
+from clients.stream_parser import IncrementalDealParser
+
+REPORT_VERSION = 1
+
+SAMPLE_DEAL = {
+    "name": "Stay 7 Pay 5 Island Escape",
+    "deal_type": "extended_stay",
+    "hotel": {
+        "name": "Coral Coast Resort",
+        "address": "Queens Road, Sigatoka, Fiji",
+        "rating": 4.5,
+        "price": 420.0,
+        "image": "https://example.com/placeholder.jpg",
+        "url": "https://example.com",
+        "description": "Beachfront resort on the Coral Coast.",
+    },
+    "description": "Stay seven nights and only pay for five in an ocean-view bure.",
+    "marketing_headline": "Escape to Paradise - 2 Nights Free",
+    "marketing_subtitle": "Save 28% on a week of sun, sand and sea",
+    "urgency_message": "Limited availability - book by Sunday!",
+    "original_display_price": 2940.0,
+    "discounted_display_price": 2100.0,
+    "savings_percentage": 28.57,
+    "valid_from": "2026-01-01",
+    "valid_until": "2026-12-31",
+    "booking_deadline": "2026-11-30",
+    "minimum_nights": 7,
+    "maximum_nights": 14,
+    "travel_dates_from": "2026-01-15",
+    "travel_dates_until": "2026-12-20",
+    "deal_inclusions": [
+        {"title": "Daily breakfast", "description": "Buffet breakfast for two", "category": "meal"},
+        {"title": "Sunset cruise", "description": "Complimentary sunset cruise", "category": "activity"},
+    ],
+    "meal_plans": [
+        {"name": "Half board", "adult_price": 85.0, "child_price": 42.5, "infant_free": True,
+         "description": "Breakfast and dinner daily"},
+    ],
+    "special_offers": [
+        {"code": "S7P5", "title": "Stay 7 Pay 5", "description": "Two free nights on 7-night stays",
+         "min_nights": 7, "max_free_nights": 2, "valid_from": "2026-01-01", "valid_until": "2026-12-31"},
+    ],
+    "wedding_packages": [],
+}
+
+
+def synthetic_response(deal_count):
+    """
+    Builds a recorded-style model response holding ``deal_count`` deals.
+    """
+    deals = [dict(SAMPLE_DEAL, name=f"{SAMPLE_DEAL['name']} #{i + 1}") for i in range(deal_count)]
+    return "```json\n" + json.dumps({"hot_deals": deals}, indent=2) + "\n```"
+
+
+def synthetic_contracts(count, pages=4):
+    """
+    Builds ``count`` distinct blank PDFs of ``pages`` pages.
+    """
+    contracts = []
+    for i in range(count):
+        writer = PdfWriter()
+        for _ in range(pages):
+            writer.add_blank_page(width=612, height=792)
+        writer.add_metadata({"/Title": f"Synthetic contract {i}"})
+        output = io.BytesIO()
+        writer.write(output)
+        contracts.append(output.getvalue())
+    return contracts
+
+
+def summarize_ms(samples):
+    """
+    Summarises a list of durations (seconds) as millisecond statistics.
+    """
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def make_client(responses, workdir, options):
+    """
+    Builds a GoogleGeminiClient on a fresh FakeBackend with empty cache and file registry.
+    """
+    backend = FakeBackend(
+        responses,
+        latency_seconds=options.latency,
+        jitter_seconds=options.jitter,
+        upload_latency_seconds=options.upload_latency,
+        stream_chunk_chars=options.chunk_chars,
+        chunk_latency_seconds=options.chunk_latency,
+        failure_rate=options.failure_rate,
+        seed=options.seed,
+    )
+    run_dir = tempfile.mkdtemp(dir=workdir)
+    registry = FileRegistry(backend.get_file, backend.delete_file, path=os.path.join(run_dir, "files.json"))
+    # Start the adaptive limit at the benchmark's concurrency so throughput is not capped by warm-up
+    scheduler = RequestScheduler(initial_concurrency=options.concurrency,
+                                 max_concurrency=max(16, options.concurrency * 2), seed=options.seed)
+    return GoogleGeminiClient(cache=ExtractionCache(os.path.join(run_dir, "cache")), file_registry=registry,
+                              backend=backend, scheduler=scheduler)
+
+
+def bench_contract_latency(contracts, responses, workdir, options):
+    client = make_client(responses, workdir, options)
+    samples, errors = [], 0
+    for file_bytes in contracts:
+        started = time.perf_counter()
+        try:
+            data = client.extract_hot_deal_packages_from_bytes(file_bytes)
+            errors += "error" in data
+        except Exception:
+            errors += 1
+        samples.append(time.perf_counter() - started)
+    return dict(summarize_ms(samples), errors=errors)
+
+
+def bench_streaming(contracts, responses, workdir, options):
+    client = make_client(responses, workdir, options)
+    first_deal, total, errors = [], [], 0
+    for file_bytes in contracts:
+        started = time.perf_counter()
+        try:
+            for index, _ in enumerate(client.stream_hot_deal_packages_from_bytes(file_bytes)):
+                if index == 0:
+                    first_deal.append(time.perf_counter() - started)
+        except Exception:
+            errors += 1
+            continue
+        total.append(time.perf_counter() - started)
+    return {
+        "errors": errors,
+        "first_deal": summarize_ms(first_deal) if first_deal else None,
+        "total": summarize_ms(total) if total else None,
+    }
+
+
+def bench_batch(contract_dir, responses, workdir, options):
+    client = make_client(responses, workdir, options)
+    output_path = os.path.join(tempfile.mkdtemp(dir=workdir), "batch.jsonl")
+    paths = find_contracts(contract_dir)
+    tracemalloc.start()
+    started = time.perf_counter()
+    summary = run_batch(client, paths, output_path, concurrency=options.concurrency, log=lambda message: None)
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "concurrency": options.concurrency,
+        "contracts": len(paths),
+        "errors": summary["error"],
+        "wall_seconds": round(wall, 3),
+        "contracts_per_second": round(len(paths) / wall, 3) if wall else None,
+        "peak_memory_bytes": peak,
+    }
+
+
+def bench_parse(response, repeats):
+    full, incremental = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        parse_hot_deals_response(response)
+        full.append(time.perf_counter() - started)
+
+        parser = IncrementalDealParser()
+        started = time.perf_counter()
+        for start in range(0, len(response), 256):
+            parser.feed(response[start:start + 256])
+        incremental.append(time.perf_counter() - started)
+    return {
+        "response_bytes": len(response.encode("utf-8")),
+        "full_parse": summarize_ms(full),
+        "incremental_parse": summarize_ms(incremental),
+    }
+
+
+def bench_copy_regeneration(responses, workdir, options):
+    client = make_client(responses, workdir, options)
+    samples, errors = [], 0
+    for _ in range(options.parse_repeats):
+        started = time.perf_counter()
+        try:
+            client.generate_marketing_copy(SAMPLE_DEAL, refresh=True)
+        except Exception:
+            errors += 1
+        samples.append(time.perf_counter() - started)
+    return dict(summarize_ms(samples), errors=errors)
+
+
+def run_benchmarks(options, workdir):
+    """
+    Runs every benchmark scenario and returns the report dict.
+    :param options: Parsed command-line options.
+    :param workdir: Scratch directory for contracts, caches and batch output.
+    """
+    if options.corpus:
+        contract_dir = options.corpus
+        contracts = []
+        for path in find_contracts(options.corpus):
+            with open(path, "rb") as f:
+                contracts.append(f.read())
+    else:
+        contract_dir = os.path.join(workdir, "contracts")
+        os.makedirs(contract_dir)
+        contracts = synthetic_contracts(options.contracts)
+        for i, file_bytes in enumerate(contracts):
+            with open(os.path.join(contract_dir, f"contract_{i:04d}.pdf"), "wb") as f:
+                f.write(file_bytes)
+
+    if options.responses:
+        response_sets = {"recorded": FakeBackend.from_directory(options.responses).responses}
+    else:
+        response_sets = {f"deals_{count}": [synthetic_response(count)]
+                         for count in (int(c) for c in options.deal_counts.split(","))}
+
+    results = []
+    for set_name, responses in response_sets.items():
+        params = {"responses": set_name, "contracts": len(contracts)}
+        results.append({"name": "contract_latency", "params": params,
+                        "metrics": bench_contract_latency(contracts, responses, workdir, options)})
+        results.append({"name": "streaming", "params": params,
+                        "metrics": bench_streaming(contracts, responses, workdir, options)})
+        results.append({"name": "batch", "params": params,
+                        "metrics": bench_batch(contract_dir, responses, workdir, options)})
+        results.append({"name": "copy_regeneration", "params": {"responses": set_name},
+                        "metrics": bench_copy_regeneration(responses, workdir, options)})
+        for index, response in enumerate(responses):
+            results.append({"name": "parse", "params": {"responses": set_name, "response_index": index},
+                            "metrics": bench_parse(response, options.parse_repeats)})
+
+    return {
+        "report_version": REPORT_VERSION,
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "config": {key: value for key, value in sorted(vars(options).items()) if key != "output"},
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the hot deal extraction pipeline offline.")
+    parser.add_argument("--corpus", default=None, help="Directory of sample contract PDFs (default: synthetic)")
+    parser.add_argument("--contracts", type=int, default=20, help="Number of synthetic contracts")
+    parser.add_argument("--responses", default=None, help="Directory of recorded responses (*.json/*.txt)")
+    parser.add_argument("--deal-counts", default="1,10,50", help="Synthetic response sizes, in deals")
+    parser.add_argument("--latency", type=float, default=0.05, help="Backend time to first token, seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Uniform latency jitter, seconds")
+    parser.add_argument("--upload-latency", type=float, default=0.01, help="Backend upload latency, seconds")
+    parser.add_argument("--chunk-chars", type=int, default=256, help="Characters per streamed chunk")
+    parser.add_argument("--chunk-latency", type=float, default=0.001, help="Delay between streamed chunks, seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of generations that fail")
+    parser.add_argument("--concurrency", type=int, default=8, help="Batch worker count")
+    parser.add_argument("--parse-repeats", type=int, default=20, help="Repetitions of the parse benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency jitter and failures")
+    parser.add_argument("-o", "--output", default=None, help="Write the JSON report here instead of stdout")
+    options = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="hot-deals-bench-") as workdir:
+        report = json.dumps(run_benchmarks(options, workdir), indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import glob
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+
+from google.generativeai import GenerativeModel, configure
+from google.generativeai.types import HarmCategory, HarmBlockThreshold
+import google.generativeai as genai
+
+SAFETY_SETTINGS = {
+    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+}
+
+
+class ModelBackend(ABC):
+    """
+    The model provider operations the extraction pipeline depends on.
+
+    ``generate`` returns a response object exposing ``text`` and ``usage_metadata``;
+    with ``stream=True`` it returns an iterable of chunks exposing ``text``.
+    """
+
+    @abstractmethod
+    def upload(self, file_bytes, display_name, mime_type="application/pdf"):
+        """
+        Uploads a file and returns the remote file object.
+        """
+
+    @abstractmethod
+    def get_file(self, name):
+        """
+        Returns the current remote file object for ``name``.
+        """
+
+    @abstractmethod
+    def delete_file(self, name):
+        """
+        Deletes the remote file ``name``.
+        """
+
+    @abstractmethod
+    def generate(self, model, contents, stream=False, timeout=None, **options):
+        """
+        Generates content for ``contents`` (uploaded files and prompt strings) with ``model``.
+        ``timeout`` bounds the request in seconds.
+        """
+
+class GeminiBackend(ModelBackend):
+    """
+    ModelBackend backed by the google.generativeai SDK.
+    """
+
+    def __init__(self, api_key=None):
+        configure(api_key=api_key or os.getenv("GOOGLE_API_KEY"))
+
+    def upload(self, file_bytes, display_name, mime_type="application/pdf"):
+        return genai.upload_file(io.BytesIO(file_bytes), display_name=display_name, mime_type=mime_type)
+
+    def get_file(self, name):
+        return genai.get_file(name)
+
+    def delete_file(self, name):
+        genai.delete_file(name)
+
+    def generate(self, model, contents, stream=False, timeout=None, **options):
+        if timeout is not None:
+            options["request_options"] = {"timeout": timeout}
+        return GenerativeModel(model).generate_content(
+            contents,
+            safety_settings=SAFETY_SETTINGS,
+            stream=stream,
+            **options,
+        )
+
+FAKE_MARKETING_COPY = {
+    "marketing_headline": "Escape to Paradise - Limited Offer",
+    "marketing_subtitle": "Sun, sand and savings on your next island holiday",
+    "urgency_message": "Only a few rooms left - book now!",
+}
+
+
+class FakeBackendError(RuntimeError):
+    """
+    Failure injected by FakeBackend, reported as a 503 like an overloaded model.
+    """
+    code = 503
+
+
+class FakeRateLimitError(FakeBackendError):
+    """
+    Injected 429 (quota exhausted).
+    """
+    code = 429
+
+
+class FakeBackend(ModelBackend):
+    """
+    Deterministic, offline stand-in for Gemini that replays recorded responses.
+
+    Each uploaded document is mapped to one of ``responses`` by its content hash, so
+    a given contract always gets the same response regardless of call order. Requests
+    without a document (marketing copy generation) are answered from ``copy_responses``
+    by prompt hash. Latency, jitter, streaming chunk size and failure rate are
+    configurable, and all randomness comes from a seeded generator.
+    """
+
+    def __init__(self, responses, latency_seconds=0.0, jitter_seconds=0.0, upload_latency_seconds=0.0,
+                 stream_chunk_chars=256, chunk_latency_seconds=0.0, failure_rate=0.0,
+                 failure_exception=FakeBackendError, seed=0, copy_responses=None):
+        if not responses:
+            raise ValueError("FakeBackend needs at least one recorded response")
+        self.responses = list(responses)
+        self.copy_responses = list(copy_responses) if copy_responses else [json.dumps(FAKE_MARKETING_COPY)]
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.upload_latency_seconds = upload_latency_seconds
+        self.stream_chunk_chars = stream_chunk_chars
+        self.chunk_latency_seconds = chunk_latency_seconds
+        self.failure_rate = failure_rate
+        self.failure_exception = failure_exception
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._files = {}
+        self.calls = {"upload": 0, "get_file": 0, "delete_file": 0, "generate": 0, "failures": 0}
+
+    @classmethod
+    def from_directory(cls, path, **kwargs):
+        """
+        Builds a FakeBackend replaying every ``*.json``/``*.txt`` response recorded in ``path``.
+        """
+        responses = []
+        for response_path in sorted(glob.glob(os.path.join(path, "*.json")) + glob.glob(os.path.join(path, "*.txt"))):
+            with open(response_path, "r", encoding="utf-8") as f:
+                responses.append(f.read())
+        return cls(responses, **kwargs)
+
+    def _count(self, call):
+        with self._lock:
+            self.calls[call] += 1
+
+    def _sleep(self, base, timeout=None):
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_seconds, self.jitter_seconds) if self.jitter_seconds else 0.0
+            fail = self.failure_rate and self._random.random() < self.failure_rate
+        delay = max(base + jitter, 0.0)
+        if timeout is not None and delay > timeout:
+            time.sleep(max(timeout, 0.0))
+            raise TimeoutError("Injected backend timeout")
+        time.sleep(delay)
+        if fail:
+            with self._lock:
+                self.calls["failures"] += 1
+            raise self.failure_exception("Injected backend failure")
+
+    def upload(self, file_bytes, display_name, mime_type="application/pdf"):
+        self._count("upload")
+        time.sleep(self.upload_latency_seconds)
+        digest = hashlib.sha256(file_bytes).hexdigest()
+        remote_file = SimpleNamespace(
+            name=f"files/{digest[:16]}",
+            display_name=display_name,
+            mime_type=mime_type,
+            size_bytes=len(file_bytes),
+            sha256=digest,
+            state=SimpleNamespace(name="ACTIVE"),
+            expiration_time=datetime.now(timezone.utc) + timedelta(hours=48),
+        )
+        with self._lock:
+            self._files[remote_file.name] = remote_file
+        return remote_file
+
+    def get_file(self, name):
+        self._count("get_file")
+        with self._lock:
+            if name not in self._files:
+                raise KeyError(name)
+            return self._files[name]
+
+    def delete_file(self, name):
+        self._count("delete_file")
+        with self._lock:
+            self._files.pop(name, None)
+
+    def _response_text(self, contents):
+        remote_file = next((c for c in contents if hasattr(c, "sha256")), None)
+        if remote_file is None:
+            prompt = "".join(c for c in contents if isinstance(c, str))
+            return self.copy_responses[int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16) % len(self.copy_responses)]
+        return self.responses[int(remote_file.sha256, 16) % len(self.responses)]
+
+    def _tokens(self, contents):
+        return sum(len(c) // 4 if isinstance(c, str) else getattr(c, "size_bytes", 0) // 16 for c in contents)
+
+    def _usage(self, contents, text):
+        prompt_tokens = self._tokens(contents)
+        output_tokens = len(text) // 4
+        return SimpleNamespace(prompt_token_count=prompt_tokens, cached_content_token_count=0,
+                               candidates_token_count=output_tokens, total_token_count=prompt_tokens + output_tokens)
+
+    def generate(self, model, contents, stream=False, timeout=None, **options):
+        self._count("generate")
+        text = self._response_text(contents)
+        usage = self._usage(contents, text)
+        if not stream:
+            self._sleep(self.latency_seconds, timeout)
+            return SimpleNamespace(text=text, usage_metadata=usage)
+
+        def chunks():
+            # Time to first chunk is the configured latency; each further chunk adds chunk latency
+            self._sleep(self.latency_seconds, timeout)
+            for start in range(0, len(text), self.stream_chunk_chars):
+                if start:
+                    time.sleep(self.chunk_latency_seconds)
+                yield SimpleNamespace(text=text[start:start + self.stream_chunk_chars], usage_metadata=usage)
+
+        return chunks()
@@ -0,0 +1,181 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def hash_bytes(data):
+    """
+    Returns the SHA-256 hex digest of the given bytes (or str, encoded as UTF-8).
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_cache_key(file_bytes, model_name, prompt):
+    """
+    Builds a content-addressed cache key for an extraction.
+    :param file_bytes: Bytes of the PDF file.
+    :param model_name: Name of the Gemini model used for the extraction.
+    :param prompt: Prompt sent with the file.
+    :return: Hex digest identifying the (document, model, prompt) triple.
+    """
+    return hash_bytes(f"{hash_bytes(file_bytes)}:{model_name}:{hash_bytes(prompt)}")
+
+
+class ExtractionCache:
+    """
+    Two-tier cache for extraction results.
+
+    The memory tier is a small LRU dict that makes Streamlit reruns free. It holds the
+    serialised JSON, so every ``get`` returns a fresh copy that callers may modify
+    without corrupting the cache. The disk tier stores one JSON file per key so results
+    survive process restarts; it is evicted least-recently-used first (file mtime is
+    touched on read) once it grows past ``max_disk_bytes``, and entries older than
+    ``max_age_seconds`` are dropped. Its total size is tracked as entries are written,
+    so the directory is only scanned when the budget is exceeded.
+    """
+
+    def __init__(self, cache_dir=None, max_memory_entries=64, max_disk_bytes=256 * 1024 * 1024,
+                 max_age_seconds=30 * 24 * 3600):
+        self.cache_dir = cache_dir or os.getenv("EXTRACTION_CACHE_DIR", os.path.join(".cache", "extractions"))
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age_seconds = max_age_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._disk_bytes = self._scan_disk()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """
+        Returns a copy of the cached value for ``key`` or None.
+        :param key: Key built with make_cache_key.
+        :return: Cached extraction result, or None on a miss.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                text = self._memory[key]
+            else:
+                path = self._path(key)
+                try:
+                    if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                        self._remove(path)
+                        raise FileNotFoundError(path)
+                    with open(path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                    value = json.loads(text)
+                    os.utime(path)
+                except (OSError, ValueError):
+                    self.misses += 1
+                    return None
+                self.disk_hits += 1
+                self._remember(key, text)
+                return value
+        return json.loads(text)
+
+    def set(self, key, value):
+        """
+        Stores ``value`` (JSON-serialisable) in both tiers and evicts old disk entries
+        once the disk tier is over budget.
+        :param key: Key built with make_cache_key.
+        :param value: Extraction result to cache.
+        """
+        text = json.dumps(value)
+        path = self._path(key)
+        # Written outside the lock; only the rename and the size accounting are serialised
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            self._remember(key, text)
+            try:
+                previous = os.path.getsize(path)
+            except OSError:
+                previous = 0
+            os.replace(tmp_path, path)
+            self._disk_bytes += size - previous
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        self._disk_bytes -= size
+
+    def _scan_disk(self, entries=None):
+        # Drops expired entries; returns the total size of the rest (and lists them in ``entries``)
+        total = 0
+        now = time.time()
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                stat = entry.stat()
+                if now - stat.st_mtime > self.max_age_seconds:
+                    os.remove(entry.path)
+                    continue
+            except OSError:
+                continue
+            total += stat.st_size
+            if entries is not None:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return total
+
+    def _evict_disk(self):
+        entries = []
+        self._disk_bytes = self._scan_disk(entries)
+        # Evict down to 90% of the budget so the next few writes do not trigger another scan
+        target = self.max_disk_bytes * 0.9
+        for _, size, path in sorted(entries):
+            if self._disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+
+    def clear(self):
+        """
+        Removes every entry from both tiers.
+        """
+        with self._lock:
+            self._memory.clear()
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".json"):
+                    os.remove(entry.path)
+            self._disk_bytes = 0
+
+    def stats(self):
+        """
+        Returns hit/miss counters for both tiers.
+        """
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
@@ -0,0 +1,216 @@
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: processes are not serialised, threads still are
+    fcntl = None
+
+# Gemini keeps uploaded files for 48 hours
+DEFAULT_FILE_TTL_SECONDS = 48 * 3600
+
+
+def file_state(remote_file):
+    """
+    Returns the processing state of a remote file as a string (PROCESSING, ACTIVE, FAILED).
+    """
+    state = getattr(remote_file, "state", None)
+    return getattr(state, "name", str(state))
+
+
+class FileRegistry:
+    """
+    Persistent map from PDF content hash to the Gemini file already holding it.
+
+    Lets the client reuse a live remote file instead of uploading the same bytes
+    again, and garbage-collects remote files once they expire or have not been used
+    for ``idle_ttl_seconds``. Entries are saved to a local JSON file so handles
+    survive process restarts. The file is shared by every process using it (the app
+    and batch runs): each change re-reads it and is written under a file lock, so
+    processes never drop each other's entries.
+    """
+
+    def __init__(self, get_file, delete_file, path=None, idle_ttl_seconds=6 * 3600, expiry_margin_seconds=600,
+                 poll_interval_seconds=2.0, processing_timeout_seconds=300.0):
+        self._get_file = get_file
+        self._delete_file = delete_file
+        self.path = path or os.getenv("GEMINI_FILE_REGISTRY", os.path.join(".cache", "gemini_files.json"))
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.expiry_margin_seconds = expiry_margin_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.processing_timeout_seconds = processing_timeout_seconds
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stop_sweeper = threading.Event()
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries):
+        # A temp file of its own, so concurrent writers never replace each other's half-written file
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    @contextmanager
+    def _locked(self):
+        # Serialises this process's threads, then other processes through a lock file next to the registry
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _update(self, change):
+        # Applies ``change`` to the entries as currently saved and writes them back
+        with self._locked():
+            entries = self._load()
+            result = change(entries)
+            self._save(entries)
+            self._entries = entries
+        return result
+
+    def lookup(self, digest):
+        """
+        Returns a live, ACTIVE remote file for the given content hash, or None if it must be uploaded.
+        Files registered by other processes sharing the registry are found too.
+        :param digest: SHA-256 of the PDF bytes.
+        :return: Remote file object, or None.
+        """
+        with self._lock:
+            self._entries = self._load()
+            entry = self._entries.get(digest)
+        if entry is None or entry["expires_at"] - self.expiry_margin_seconds <= time.time():
+            return None
+
+        def same_file(entries):
+            # Another process may have re-registered the hash with a new upload meanwhile
+            current = entries.get(digest)
+            return current if current is not None and current["name"] == entry["name"] else None
+
+        def drop(entries):
+            if same_file(entries) is not None:
+                del entries[digest]
+
+        def touch(entries):
+            current = same_file(entries)
+            if current is not None:
+                current["last_used"] = time.time()
+
+        try:
+            remote_file = self.wait_until_active(self._get_file(entry["name"]))
+        except Exception:
+            # Deleted remotely, failed processing or otherwise unusable
+            self._update(drop)
+            return None
+        self._update(touch)
+        return remote_file
+
+    def register(self, digest, remote_file, display_name=None):
+        """
+        Records a freshly uploaded remote file under its content hash.
+        :param digest: SHA-256 of the PDF bytes.
+        :param remote_file: The uploaded file object.
+        :param display_name: Display name the file was uploaded with.
+        """
+        expiration = getattr(remote_file, "expiration_time", None)
+        now = time.time()
+        expires_at = expiration.timestamp() if isinstance(expiration, datetime) else now + DEFAULT_FILE_TTL_SECONDS
+
+        def add(entries):
+            entries[digest] = {
+                "name": remote_file.name,
+                "display_name": display_name,
+                "expires_at": expires_at,
+                "last_used": now,
+            }
+        self._update(add)
+
+    def forget(self, name):
+        """
+        Drops every entry pointing at the remote file ``name`` (e.g. after it was deleted).
+        """
+        def drop(entries):
+            for digest in [d for d, entry in entries.items() if entry["name"] == name]:
+                del entries[digest]
+        self._update(drop)
+
+    def wait_until_active(self, remote_file):
+        """
+        Polls a remote file until Gemini has finished processing it.
+        :param remote_file: The file object to check.
+        :return: The refreshed, ACTIVE file object.
+        """
+        deadline = time.monotonic() + self.processing_timeout_seconds
+        while file_state(remote_file) == "PROCESSING":
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"File {remote_file.name} is still processing")
+            time.sleep(self.poll_interval_seconds)
+            remote_file = self._get_file(remote_file.name)
+        if file_state(remote_file) == "FAILED":
+            raise RuntimeError(f"File {remote_file.name} failed processing")
+        return remote_file
+
+    def sweep(self):
+        """
+        Deletes remote files that have expired or have been idle longer than ``idle_ttl_seconds``.
+        :return: Names of the removed files.
+        """
+        now = time.time()
+
+        def drop_stale(entries):
+            stale = {digest: entry for digest, entry in entries.items()
+                     if entry["expires_at"] <= now or now - entry["last_used"] > self.idle_ttl_seconds}
+            for digest in stale:
+                del entries[digest]
+            return stale
+        stale = self._update(drop_stale)
+
+        for entry in stale.values():
+            if entry["expires_at"] > now:
+                try:
+                    self._delete_file(entry["name"])
+                except Exception:
+                    # Already gone remotely; it would have expired on its own anyway
+                    pass
+        return [entry["name"] for entry in stale.values()]
+
+    def start_sweeper(self, interval_seconds=900):
+        """
+        Starts a daemon thread that runs sweep() every ``interval_seconds``.
+        """
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+
+        def run():
+            while not self._stop_sweeper.wait(interval_seconds):
+                self.sweep()
+
+        self._stop_sweeper.clear()
+        self._sweeper = threading.Thread(target=run, name="gemini-file-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        """
+        Stops the background sweeper thread, if running.
+        """
+        self._stop_sweeper.set()
@@ -1,40 +1,31 @@
-from google.generativeai import GenerativeModel, configure
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
-import google.generativeai as genai
-import io
-import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
 
 from dotenv import load_dotenv
 
-load_dotenv()
-
-class GoogleGeminiClient:
-    def __init__(self):
-        configure(api_key=os.getenv("GOOGLE_API_KEY"))
-        self.model_name = "gemini-1.5-pro"
-        self.model = GenerativeModel(self.model_name)
+from clients.backends import GeminiBackend
+from clients.extraction_cache import ExtractionCache, hash_bytes, make_cache_key
+from clients.file_registry import FileRegistry
+from clients.rate_limiter import estimate_pdf_tokens, estimate_text_tokens
+from clients.scheduler import RequestScheduler
+from clients.stream_parser import IncrementalDealParser
+from clients.telemetry import Telemetry
+from clients.structured_output import (
+    DEAL_FACTS_RESPONSE_SCHEMA,
+    HOT_DEALS_RESPONSE_SCHEMA,
+    MARKETING_COPY_SCHEMA,
+    MARKETING_FIELDS,
+    schema_fingerprint,
+    validate_hot_deal,
+    validate_hot_deals,
+)
+from models import MarketingCopy
 
-    def upload_pdf(self, file_bytes, display_name="Uploaded PDF"):
-        """
-        Uploads a PDF file to Gemini and returns the uploaded file object.
-        :param file_bytes: Bytes of the PDF file.
-        :param display_name: Display name for the uploaded file.
-        :return: Uploaded file object.
-        """
-        doc_io = io.BytesIO(file_bytes)
-        uploaded_file = genai.upload_file(doc_io, display_name=display_name, mime_type="application/pdf")
-        return uploaded_file
+load_dotenv()
 
-    def extract_hot_deal_packages(self, uploaded_file, prompt=None, model=None):
-        """
-        Extracts hot deal packages from the uploaded PDF using Gemini.
-        :param uploaded_file: The file object returned by upload_pdf.
-        :param prompt: The prompt to use for summarization.
-        :param model: The Gemini model to use.
-        :return: The summary text.
-        """
-        if prompt is None:
-            prompt = """
+HOT_DEALS_PROMPT = """
             You are a travel deals expert and marketing copywriter. 
             You are given one or more hotel contracts. Each contract may contain:
             - Hotel details (name, address, star rating, description, price points, validity, room types).
@@ -135,40 +126,495 @@ class GoogleGeminiClient:
 
             ---
             """
-        model_to_use = model if model else self.model_name
-        model_instance = GenerativeModel(model_to_use)
-        response = model_instance.generate_content(
-            [uploaded_file, prompt],
-            safety_settings={
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            }
+
+STRUCTURED_HOT_DEALS_PROMPT = """
+            You are a travel deals expert and marketing copywriter.
+            You are given one or more hotel contracts. Each contract may contain:
+            - Hotel details (name, address, star rating, description, price points, validity, room types).
+            - Discounts, promotions, special offers.
+            - Inclusions such as meals, transfers, activities, honeymoon bonuses.
+            - Wedding or event packages.
+
+            [Note]: Hot deal packages are generated from special offers, and wedding packages. Special offers and wedding packages
+            cannot be combined in the same deal. If its a special offer, make the wedding_packages array empty and vice versa.
+
+            Your task is to extract structured deal data and generate attractive marketing packages.
+            The output format is enforced by the response schema. Dates are YYYY-MM-DD. Use a placeholder for
+            hotel image and url when none are given.
+
+            **Generation Rules**
+            - Infer missing details where possible (e.g., if rating not given, estimate from contract context).
+            - Prices must be consistent (original_display_price > discounted_display_price).
+            - Calculate `savings_percentage` as `(original - discounted) / original * 100`.
+            - Marketing fields must be attractive, persuasive, and aligned with travel/holiday promotions.
+            - Inclusions must be classified into the proper category.
+            - For each deal, check if meal plans are included or if they have to added with additional costs. In any case, if meal plans apply, include them in the deal.
+            - Hot deals are generated from special offers, and wedding packages. Sometimes there can be multiple types of wedding packages, so ensure
+            not to combine them in the same deal. If there are multiple types of wedding packages, create multiple deals. E.g vowel renewal, wedding, etc.
+            - If there are multiple types of special offers, create multiple deals. Dont combine offers when the duration is different.
+
+            **Creativity**
+            - Make the marketing copy engaging and aligned with travel campaigns.
+            - Headlines and urgency messages must create FOMO.
+            - Deals should feel diverse (not all the same deal_type).
+            """
+
+
+# Phase one of two-phase extraction: static instructions, cached with the contract file
+DEAL_FACTS_PROMPT = """
+            You are a travel deals expert.
+            You are given one or more hotel contracts. Each contract may contain:
+            - Hotel details (name, address, star rating, description, price points, validity, room types).
+            - Discounts, promotions, special offers.
+            - Inclusions such as meals, transfers, activities, honeymoon bonuses.
+            - Wedding or event packages.
+
+            [Note]: Hot deal packages are generated from special offers, and wedding packages. Special offers and wedding packages
+            cannot be combined in the same deal. If its a special offer, make the wedding_packages array empty and vice versa.
+
+            Your task is to extract structured, factual deal data. Marketing copy is written separately.
+            The output format is enforced by the response schema. Dates are YYYY-MM-DD. Use a placeholder for
+            hotel image and url when none are given.
+
+            **Extraction Rules**
+            - Infer missing details where possible (e.g., if rating not given, estimate from contract context).
+            - Prices must be consistent (original_display_price > discounted_display_price).
+            - Calculate `savings_percentage` as `(original - discounted) / original * 100`.
+            - Inclusions must be classified into the proper category.
+            - For each deal, check if meal plans are included or if they have to added with additional costs. In any case, if meal plans apply, include them in the deal.
+            - Hot deals are generated from special offers, and wedding packages. Sometimes there can be multiple types of wedding packages, so ensure
+            not to combine them in the same deal. If there are multiple types of wedding packages, create multiple deals. E.g vowel renewal, wedding, etc.
+            - If there are multiple types of special offers, create multiple deals. Dont combine offers when the duration is different.
+            - Deals should feel diverse (not all the same deal_type).
+            """
+
+# Phase two: per-deal copy, sent with the deal's facts as JSON
+MARKETING_COPY_PROMPT = """
+            You are a marketing copywriter for travel and holiday promotions.
+            Write the marketing copy for the hot deal described by the JSON below.
+            - marketing_headline: short catchy title (e.g., 'Escape to Paradise – 30% Off').
+            - marketing_subtitle: engaging subtitle with savings and appeal.
+            - urgency_message: short FOMO message (e.g., 'Limited availability – Book by Sunday!').
+            Only mention facts present in the deal: prices, savings, dates, nights and inclusions.
+            """
+
+
+def parse_hot_deals_response(response):
+    """
+    Parses the JSON block out of a model response.
+    :param response: The response text.
+    :return: The parsed dict, or a dict with ``error`` and ``raw_response`` if parsing fails.
+    """
+    # Extract JSON from the response string
+    try:
+        # Find the first '{' and last '}' to extract the JSON block
+        start_idx = response.find('{')
+        end_idx = response.rfind('}')
+        if start_idx != -1 and end_idx != -1:
+            json_str = response[start_idx:end_idx+1]
+            data = json.loads(json_str)
+        else:
+            # Fallback: try to load the whole response
+            data = json.loads(response)
+    except Exception as e:
+        # If extraction or parsing fails, return the raw response in a dict
+        data = {"error": str(e), "raw_response": response}
+
+    return data
+
+
+# Prefix of the validation note left on a deal whose marketing copy could not be generated
+MARKETING_COPY_ERROR = "marketing copy"
+
+
+def marketing_copy_failures(data):
+    """
+    Returns the positions in ``hot_deals`` of the deals of an extraction whose marketing
+    copy failed (and was left empty).
+    """
+    return [report["deal_index"] for report in data.get("validation_errors", [])
+            if report.get("deal_index") is not None
+            and any(str(note).startswith(f"{MARKETING_COPY_ERROR}:") for note in report.get("errors", []))]
+
+
+class GoogleGeminiClient:
+    def __init__(self, cache=None, file_registry=None, backend=None, structured_output=True, two_phase=True,
+                 copy_workers=8, telemetry=None, scheduler=None):
+        self.backend = backend if backend is not None else GeminiBackend()
+        # Per-stage timings, token usage and cost of every call made through this client
+        self.telemetry = telemetry if telemetry is not None else Telemetry()
+        # Deadlines, retries, adaptive concurrency, hedging and model fallback for every generate call
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler(telemetry=self.telemetry)
+        # Versioned names, so a provider alias moving to a new model does not change extraction behaviour
+        self.model_name = "gemini-1.5-pro-002"
+        self.copy_model_name = "gemini-1.5-flash-002"
+        # Constrain the response to the schema derived from models.HotDealsResponse
+        self.structured_output = structured_output
+        # Extract facts first, then write each deal's marketing copy with the lightweight model
+        self.two_phase = two_phase and structured_output
+        self.copy_workers = copy_workers
+        # Estimated input tokens of each uploaded file, charged to the scheduler's rate limiter
+        self._file_tokens = {}
+        self.cache = cache if cache is not None else ExtractionCache()
+        self.file_registry = file_registry if file_registry is not None else FileRegistry(
+            self.backend.get_file, self.backend.delete_file
         )
-        response = response.text
-        import json
 
-        # Extract JSON from the response string
-        try:
-            # Find the first '{' and last '}' to extract the JSON block
-            start_idx = response.find('{')
-            end_idx = response.rfind('}')
-            if start_idx != -1 and end_idx != -1:
-                json_str = response[start_idx:end_idx+1]
-                data = json.loads(json_str)
+    def _resolve(self, prompt, model):
+        if prompt is None:
+            if self.two_phase:
+                prompt = DEAL_FACTS_PROMPT
             else:
-                # Fallback: try to load the whole response
-                data = json.loads(response)
+                prompt = STRUCTURED_HOT_DEALS_PROMPT if self.structured_output else HOT_DEALS_PROMPT
+        return prompt, model if model else self.model_name
+
+    def _response_schema(self):
+        return DEAL_FACTS_RESPONSE_SCHEMA if self.two_phase else HOT_DEALS_RESPONSE_SCHEMA
+
+    def _generation_options(self):
+        if not self.structured_output:
+            return {}
+        return {"generation_config": {
+            "response_mime_type": "application/json",
+            "response_schema": self._response_schema(),
+        }}
+
+    def _cache_key(self, file_bytes, prompt, model):
+        prompt, model_to_use = self._resolve(prompt, model)
+        if self.structured_output:
+            prompt += schema_fingerprint(self._response_schema())
+        if self.two_phase:
+            prompt += self.copy_model_name
+        return make_cache_key(file_bytes, model_to_use, prompt)
+
+    def _parse_response(self, text):
+        if not self.structured_output:
+            return parse_hot_deals_response(text)
+        try:
+            data = json.loads(text)
+        except ValueError:
+            # Truncated or wrapped output: recover the JSON block, then validate what survived
+            data = parse_hot_deals_response(text)
+            if "error" in data:
+                return data
+        if self.two_phase:
+            # Deals are validated once their marketing copy has been added
+            return data
+        return validate_hot_deals(data)
+
+    def _request(self, uploaded_file, prompt, model, stream=False):
+        options = self._generation_options()
+
+        def request(model_to_use, timeout):
+            return self.backend.generate(model_to_use, [uploaded_file, prompt], stream=stream, timeout=timeout,
+                                         **options)
+        return request
+
+    def _request_tokens(self, uploaded_file, prompt):
+        return self._file_tokens.get(uploaded_file.name, 0) + estimate_text_tokens(prompt)
+
+    def _generate(self, uploaded_file, prompt, model):
+        request = self._request(uploaded_file, prompt, model)
+        with self.telemetry.span("generation", model=model):
+            response, served_by = self.scheduler.call(request, model,
+                                                      tokens=self._request_tokens(uploaded_file, prompt))
+        self.telemetry.record_usage(served_by, getattr(response, "usage_metadata", None))
+        return response, served_by
+
+    def _generate_stream(self, uploaded_file, prompt, model):
+        # Generation time only counts waiting on the backend, not the consumer's work between chunks
+        request = self._request(uploaded_file, prompt, model, stream=True)
+        started = time.perf_counter()
+        served_by, generating, usage_metadata, first_chunk, ok = model, 0.0, None, True, False
+        try:
+            response, served_by = self.scheduler.call(request, model, stream=True,
+                                                      tokens=self._request_tokens(uploaded_file, prompt))
+            generating = time.perf_counter() - started
+            while True:
+                waited = time.perf_counter()
+                try:
+                    chunk = next(response)
+                except StopIteration:
+                    break
+                generating += time.perf_counter() - waited
+                if first_chunk:
+                    self.telemetry.observe("time_to_first_token", time.perf_counter() - started, model=model)
+                    first_chunk = False
+                # Usage is cumulative; the last chunk carries the totals
+                usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+                yield chunk
+            ok = True
+        except GeneratorExit:
+            # The consumer stopped reading; the generation itself did not fail
+            ok = True
+            raise
+        finally:
+            self.telemetry.observe("generation", generating, ok=ok, model=served_by)
+            self.telemetry.record_usage(served_by, usage_metadata)
+
+    def _parsed_chunks(self, response, parser):
+        parsing = 0.0
+        try:
+            for chunk in response:
+                started = time.perf_counter()
+                hot_deals = parser.feed(chunk.text)
+                parsing += time.perf_counter() - started
+                yield hot_deals
+        finally:
+            self.telemetry.observe("parse", parsing)
+
+    def _with_marketing_copy(self, hot_deal):
+        # Copy failures leave the fields empty so the deal's facts are still returned
+        try:
+            return dict(hot_deal, **self.generate_marketing_copy(hot_deal)), None
         except Exception as e:
-            # If extraction or parsing fails, return the raw response in a dict
-            data = {"error": str(e), "raw_response": response}
+            return dict(hot_deal, **{field: "" for field in MARKETING_FIELDS}), f"{MARKETING_COPY_ERROR}: {e}"
+
+    def _validated(self, index, deal_index, hot_deal, copy_error, validation_errors):
+        # ``index`` is the deal's position in the response, ``deal_index`` the one it takes in hot_deals
+        deal, notes = validate_hot_deal(hot_deal)
+        if copy_error:
+            notes = [copy_error] + notes
+        if notes and validation_errors is not None:
+            report = {"index": index, "salvaged": deal is not None, "errors": notes}
+            if deal is not None:
+                report["deal_index"] = deal_index
+            validation_errors.append(report)
+        return deal.model_dump(mode="json") if deal is not None else None
+
+    def add_marketing_copy(self, data):
+        """
+        Phase two of two-phase extraction: generates the marketing copy of every
+        extracted deal in parallel, then validates the completed deals.
+        :param data: Parsed phase-one response (``{"hot_deals": [...]}``).
+        :return: Dict with the validated ``hot_deals`` and, if any, ``validation_errors``.
+        """
+        raw_deals = data.get("hot_deals", []) if isinstance(data, dict) else data
+        raw_deals = [hot_deal if isinstance(hot_deal, dict) else {} for hot_deal in (raw_deals or [])]
+        with ThreadPoolExecutor(max_workers=self.copy_workers) as executor:
+            completed = list(executor.map(self._with_marketing_copy, raw_deals))
+
+        hot_deals, validation_errors = [], []
+        for index, (hot_deal, copy_error) in enumerate(completed):
+            hot_deal = self._validated(index, len(hot_deals), hot_deal, copy_error, validation_errors)
+            if hot_deal is not None:
+                hot_deals.append(hot_deal)
+        result = {"hot_deals": hot_deals}
+        if validation_errors:
+            result["validation_errors"] = validation_errors
+        return result
+
+    def generate_marketing_copy(self, hot_deal, model=None, refresh=False):
+        """
+        Writes the marketing headline, subtitle and urgency message for one deal from its
+        facts alone, without the contract. Results are cached by the deal's facts.
+        :param hot_deal: Deal dict; existing marketing fields are ignored.
+        :param model: The Gemini model to use (default: the lightweight copy model).
+        :param refresh: Generate new copy even if cached copy exists.
+        :return: Dict with the three marketing fields.
+        """
+        model_to_use = model if model else self.copy_model_name
+        facts = json.dumps({key: value for key, value in hot_deal.items() if key not in MARKETING_FIELDS},
+                           sort_keys=True, default=str)
+        cache_key = make_cache_key(facts.encode("utf-8"), model_to_use,
+                                   MARKETING_COPY_PROMPT + schema_fingerprint(MARKETING_COPY_SCHEMA))
+        if not refresh:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        generation_config = {
+            "response_mime_type": "application/json",
+            "response_schema": MARKETING_COPY_SCHEMA,
+            # Regenerated copy should read differently from what the user is replacing
+            "temperature": 1.2 if refresh else 0.8,
+        }
+        with self.telemetry.span("marketing_copy", model=model_to_use):
+            response, served_by = self.scheduler.call(
+                lambda copy_model, timeout: self.backend.generate(copy_model, [MARKETING_COPY_PROMPT, facts],
+                                                                  timeout=timeout, generation_config=generation_config),
+                model_to_use,
+                tokens=estimate_text_tokens(MARKETING_COPY_PROMPT, facts),
+            )
+        self.telemetry.record_usage(served_by, getattr(response, "usage_metadata", None), stage="marketing_copy")
+        copy = MarketingCopy.model_validate_json(response.text).model_dump()
+        self.cache.set(cache_key, copy)
+        return copy
+
+    def upload_pdf(self, file_bytes, display_name="Uploaded PDF"):
+        """
+        Uploads a PDF file to Gemini and returns the uploaded file object. If Gemini
+        already holds a live copy of the same bytes, that file is reused instead.
+        The returned file has finished processing and is ready to use.
+        :param file_bytes: Bytes of the PDF file.
+        :param display_name: Display name for the uploaded file.
+        :return: Uploaded file object.
+        """
+        digest = hash_bytes(file_bytes)
+        uploaded_file = self.file_registry.lookup(digest)
+        if uploaded_file is not None:
+            self._file_tokens[uploaded_file.name] = estimate_pdf_tokens(file_bytes)
+            return uploaded_file
+
+        with self.telemetry.span("upload"):
+            uploaded_file = self.backend.upload(file_bytes, display_name=display_name, mime_type="application/pdf")
+        with self.telemetry.span("file_processing"):
+            uploaded_file = self.file_registry.wait_until_active(uploaded_file)
+        self.file_registry.register(digest, uploaded_file, display_name=display_name)
+        self._file_tokens[uploaded_file.name] = estimate_pdf_tokens(file_bytes)
+        return uploaded_file
 
+    def extract_hot_deal_packages(self, uploaded_file, prompt=None, model=None):
+        """
+        Extracts hot deal packages from the uploaded PDF using Gemini. In structured
+        output mode the response is constrained to the deal schema and validated deal
+        by deal; deals that cannot be salvaged are reported under ``validation_errors``.
+        In two-phase mode the facts are extracted first and the marketing copy is then
+        written per deal in parallel.
+        :param uploaded_file: The file object returned by upload_pdf.
+        :param prompt: The prompt to use for extraction.
+        :param model: The Gemini model to use.
+        :return: The extracted data as a dict.
+        """
+        prompt, model_to_use = self._resolve(prompt, model)
+        response, served_by = self._generate(uploaded_file, prompt, model_to_use)
+        with self.telemetry.span("parse"):
+            data = self._parse_response(response.text)
+        if self.two_phase and "error" not in data:
+            data = self.add_marketing_copy(data)
+        if served_by != model_to_use:
+            # The primary model was overloaded and a faster one answered instead
+            data["fallback_model"] = served_by
         return data
 
+    def extract_hot_deal_packages_from_bytes(self, file_bytes, display_name="Uploaded PDF", prompt=None, model=None):
+        """
+        Extracts hot deal packages from raw PDF bytes, skipping the upload and the
+        Gemini call entirely when the same (document, model, prompt) was already extracted.
+        :param file_bytes: Bytes of the PDF file.
+        :param display_name: Display name for the uploaded file.
+        :param prompt: The prompt to use for extraction.
+        :param model: The Gemini model to use.
+        :return: The extracted data as a dict.
+        """
+        cached = self.cached_hot_deal_packages(file_bytes, prompt=prompt, model=model)
+        if cached is not None:
+            return cached
+
+        uploaded_file = self.upload_pdf(file_bytes, display_name=display_name)
+        data = self.extract_hot_deal_packages(uploaded_file, prompt=prompt, model=model)
+        # Failed parses are not cached so the next attempt gets a fresh generation
+        if "error" not in data:
+            self.store_hot_deal_packages(file_bytes, data, prompt=prompt, model=model)
+        return data
+
+    def cached_hot_deal_packages(self, file_bytes, prompt=None, model=None):
+        """
+        Returns the cached extraction for these PDF bytes, or None if it was never extracted.
+        :param file_bytes: Bytes of the PDF file.
+        :param prompt: The prompt to use for extraction.
+        :param model: The Gemini model to use.
+        :return: The cached data as a dict, or None.
+        """
+        return self.cache.get(self._cache_key(file_bytes, prompt, model))
+
+    def store_hot_deal_packages(self, file_bytes, data, prompt=None, model=None):
+        """
+        Caches an extraction result for these PDF bytes. Results with deals whose marketing
+        copy failed are not cached, so the next extraction writes that copy again.
+        :param file_bytes: Bytes of the PDF file.
+        :param data: The extracted data as a dict.
+        :param prompt: The prompt used for extraction.
+        :param model: The Gemini model used.
+        """
+        if marketing_copy_failures(data):
+            return
+        self.cache.set(self._cache_key(file_bytes, prompt, model), data)
+
+    def stream_hot_deal_packages(self, uploaded_file, prompt=None, model=None, validation_errors=None):
+        """
+        Streams hot deal packages from the uploaded PDF, yielding each deal as soon as
+        it has been fully generated.
+        :param uploaded_file: The file object returned by upload_pdf.
+        :param prompt: The prompt to use for extraction.
+        :param model: The Gemini model to use.
+        :param validation_errors: Optional list that receives validation reports of
+                                  repaired or rejected deals (structured output mode).
+        :return: Generator of hot deal dicts.
+        """
+        prompt, model_to_use = self._resolve(prompt, model)
+        response = self._generate_stream(uploaded_file, prompt, model_to_use)
+        parser = IncrementalDealParser()
+        if self.two_phase:
+            yield from self._stream_with_marketing_copy(response, parser, validation_errors)
+        else:
+            index, yielded = 0, 0
+            for hot_deals in self._parsed_chunks(response, parser):
+                for hot_deal in hot_deals:
+                    if self.structured_output:
+                        hot_deal = self._validated(index, yielded, hot_deal, None, validation_errors)
+                    index += 1
+                    if hot_deal is not None:
+                        yielded += 1
+                        yield hot_deal
+
+        if not parser.found_array:
+            raise ValueError("Response did not contain a hot_deals array")
+        if parser.errors:
+            raise ValueError(f"Failed to parse {len(parser.errors)} streamed deal(s): {parser.errors[0]['error']}")
+
+    def _stream_with_marketing_copy(self, response, parser, validation_errors):
+        # Copy for each deal starts as soon as its facts are parsed; deals are yielded in order
+        with ThreadPoolExecutor(max_workers=self.copy_workers) as executor:
+            pending = deque()
+            index, yielded = 0, 0
+            for hot_deals in self._parsed_chunks(response, parser):
+                for hot_deal in hot_deals:
+                    pending.append((index, executor.submit(self._with_marketing_copy, hot_deal)))
+                    index += 1
+                while pending and pending[0][1].done():
+                    hot_deal = self._validated(pending[0][0], yielded, *pending.popleft()[1].result(),
+                                               validation_errors)
+                    if hot_deal is not None:
+                        yielded += 1
+                        yield hot_deal
+            while pending:
+                hot_deal = self._validated(pending[0][0], yielded, *pending.popleft()[1].result(), validation_errors)
+                if hot_deal is not None:
+                    yielded += 1
+                    yield hot_deal
+
+    def stream_hot_deal_packages_from_bytes(self, file_bytes, display_name="Uploaded PDF", prompt=None, model=None):
+        """
+        Streaming counterpart of extract_hot_deal_packages_from_bytes. Cached contracts
+        are replayed immediately; otherwise deals are yielded as they are generated and
+        the complete result is cached once the stream finishes.
+        :param file_bytes: Bytes of the PDF file.
+        :param display_name: Display name for the uploaded file.
+        :param prompt: The prompt to use for extraction.
+        :param model: The Gemini model to use.
+        :return: Generator of hot deal dicts.
+        """
+        cached = self.cached_hot_deal_packages(file_bytes, prompt=prompt, model=model)
+        if cached is not None:
+            yield from cached.get("hot_deals", [])
+            return
+
+        uploaded_file = self.upload_pdf(file_bytes, display_name=display_name)
+        hot_deals, validation_errors = [], []
+        for hot_deal in self.stream_hot_deal_packages(uploaded_file, prompt=prompt, model=model,
+                                                      validation_errors=validation_errors):
+            hot_deals.append(hot_deal)
+            yield hot_deal
+        data = {"hot_deals": hot_deals}
+        if validation_errors:
+            data["validation_errors"] = validation_errors
+        self.store_hot_deal_packages(file_bytes, data, prompt=prompt, model=model)
+
     def delete_file(self, uploaded_file):
         """
         Deletes the uploaded file from Gemini.
         :param uploaded_file: The file object to delete.
         """
-        genai.delete_file(uploaded_file.name)
\ No newline at end of file
+        self.backend.delete_file(uploaded_file.name)
+        self.file_registry.forget(uploaded_file.name)
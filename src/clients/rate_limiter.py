@@ -0,0 +1,86 @@
+from collections import deque
+import re
+import threading
+import time
+
+# Gemini bills each PDF page as a fixed number of input tokens
+TOKENS_PER_PDF_PAGE = 258
+PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?!s)")
+
+
+def estimate_pdf_tokens(file_bytes):
+    """
+    Estimates the input tokens of a PDF from its page count, without parsing it.
+    """
+    return max(len(PAGE_PATTERN.findall(file_bytes)), 1) * TOKENS_PER_PDF_PAGE
+
+
+def estimate_text_tokens(*texts):
+    """
+    Estimates the input tokens of text parts at about four characters per token.
+    """
+    return sum(len(text) for text in texts) // 4
+
+
+class RateLimiter:
+    """
+    Sliding one-minute window limiter for requests-per-minute and tokens-per-minute
+    quotas. Thread-safe; ``acquire`` blocks until the request fits in both budgets.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, window_seconds=60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window_seconds = window_seconds
+        self._events = deque()
+        self._tokens_in_window = 0
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        while self._events and now - self._events[0][0] >= self.window_seconds:
+            _, tokens = self._events.popleft()
+            self._tokens_in_window -= tokens
+
+    def _fits(self, tokens):
+        if not self._events:
+            # An empty window always admits one request, even if it alone exceeds the token budget
+            return True
+        if self.requests_per_minute and len(self._events) >= self.requests_per_minute:
+            return False
+        if self.tokens_per_minute and self._tokens_in_window + tokens > self.tokens_per_minute:
+            return False
+        return True
+
+    def try_acquire(self, tokens=0):
+        """
+        Records a request costing ``tokens`` only if it fits in the budgets right now.
+        :return: Whether the request was admitted.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._purge(now)
+            if not self._fits(tokens):
+                return False
+            self._events.append((now, tokens))
+            self._tokens_in_window += tokens
+            return True
+
+    def acquire(self, tokens=0):
+        """
+        Blocks until a request costing ``tokens`` can be sent, then records it.
+        :param tokens: Estimated tokens the request will consume.
+        :return: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._purge(now)
+                if self._fits(tokens):
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return waited
+                delay = self.window_seconds - (now - self._events[0][0])
+            delay = max(delay, 0.01)
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,380 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+import queue
+import random
+import threading
+import time
+
+# HTTP statuses worth retrying: timeouts, rate limiting and transient server errors
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+# Statuses meaning the model is saturated, which count towards falling back to another model
+OVERLOAD_STATUSES = {429, 503}
+
+_STREAM_END = object()
+
+
+def error_status(error):
+    """
+    Returns the HTTP status of a provider error (google.api_core exceptions carry it as
+    ``code``), or None.
+    """
+    code = getattr(error, "code", None)
+    try:
+        return int(code) if code is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    """
+    Whether a failed request may succeed if sent again.
+    """
+    return isinstance(error, (TimeoutError, ConnectionError)) or error_status(error) in RETRYABLE_STATUSES
+
+
+class QueueTimeoutError(TimeoutError):
+    """
+    Raised when a request waited too long locally for a free request slot before being
+    sent. Says nothing about the provider's load.
+    """
+
+
+class RequestFailedError(RuntimeError):
+    """
+    Raised when a scheduled request fails for good: a non-retryable error, no attempts
+    left or its deadline passed. The last underlying error is chained as ``__cause__``.
+    """
+
+    def __init__(self, message, attempts=0):
+        super().__init__(message)
+        self.attempts = attempts
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on requests in flight: each success raises the limit by ``1/limit``
+    (about one slot per round of requests), each throttling response halves it, at
+    most once per ``decrease_cooldown_seconds`` so one burst of 429s counts once.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16, decrease_factor=0.5, decrease_cooldown_seconds=1.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown_seconds = decrease_cooldown_seconds
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """
+        Blocks until a slot is free. Returns False if ``timeout`` seconds passed first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def try_acquire(self):
+        """
+        Takes a slot only if one is free right now.
+        """
+        return self.acquire(timeout=0)
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            self.limit = min(self.limit + 1.0 / self.limit, self.maximum)
+            self._condition.notify()
+
+    def on_throttle(self):
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_cooldown_seconds:
+                self.limit = max(self.limit * self.decrease_factor, self.minimum)
+                self._last_decrease = now
+
+
+def _spawn(fn, *args, on_done=None):
+    # Daemon threads, so an attempt abandoned after its deadline never blocks shutdown
+    future = Future()
+    if on_done is not None:
+        future.add_done_callback(lambda _: on_done())
+
+    def run():
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+class RequestScheduler:
+    """
+    Runs model requests under a per-call deadline with retries, adaptive concurrency,
+    hedging and model fallback.
+
+    - Each attempt gets the time left until the call's deadline; retryable errors are
+      retried with exponential backoff and full jitter while time and attempts remain.
+      Time spent waiting locally for the rate limiter or a request slot does not count
+      against the deadline; waiting for a slot is bounded by ``queue_timeout_seconds``.
+    - Requests in flight are capped by an AdaptiveConcurrency limit that shrinks on
+      429s and grows back on successes. A request keeps its slot until it actually
+      finishes, even when the call stopped waiting for it.
+    - A non-streaming attempt still running after the model's ``hedge_percentile``
+      latency gets a duplicate request (only if a concurrency slot is free); the first
+      success wins.
+    - After ``fallback_after_overloads`` overload errors from a model within one call,
+      the remaining attempts (and calls for the next ``overload_cooldown_seconds``) go
+      to its entry in ``fallback_models``.
+
+    With a ``rate_limiter``, every request sent (retries and hedges included) first takes
+    its estimated tokens from the requests/tokens-per-minute budget; hedges are skipped
+    rather than waited for.
+
+    Counters are available from ``stats()`` and, with ``telemetry``, as telemetry counters.
+    """
+
+    def __init__(self, timeout_seconds=180.0, stream_timeout_seconds=600.0, queue_timeout_seconds=600.0, max_attempts=4,
+                 backoff_base_seconds=1.0, backoff_max_seconds=20.0,
+                 initial_concurrency=4, min_concurrency=1, max_concurrency=16, hedge_percentile=0.95,
+                 hedge_min_samples=20, hedging=True, fallback_models=None, fallback_after_overloads=2,
+                 overload_cooldown_seconds=30.0, telemetry=None, seed=None, rate_limiter=None):
+        self.timeout_seconds = timeout_seconds
+        # A stream must finish within this long, so long generations are not cut at timeout_seconds
+        self.stream_timeout_seconds = stream_timeout_seconds
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedging = hedging
+        self.fallback_models = {"gemini-1.5-pro-002": "gemini-1.5-flash-002", "gemini-1.5-pro": "gemini-1.5-flash"} \
+            if fallback_models is None else fallback_models
+        self.fallback_after_overloads = fallback_after_overloads
+        self.overload_cooldown_seconds = overload_cooldown_seconds
+        self.telemetry = telemetry
+        self.rate_limiter = rate_limiter
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, min_concurrency, max_concurrency)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._overloaded_until = {}
+        self._counters = {"calls": 0, "attempts": 0, "retries": 0, "timeouts": 0, "queue_timeouts": 0, "throttled": 0,
+                          "hedges": 0, "hedge_wins": 0, "fallbacks": 0, "failures": 0}
+
+    def _count(self, name, **labels):
+        with self._lock:
+            self._counters[name] += 1
+        if self.telemetry is not None:
+            self.telemetry.increment(f"scheduler_{name}", **labels)
+
+    def stats(self):
+        """
+        Returns the scheduler's counters and its current concurrency limit and load.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        counters["concurrency_limit"] = int(self.concurrency.limit)
+        counters["in_flight"] = self.concurrency.in_flight
+        return counters
+
+    def _backoff(self, attempt):
+        with self._lock:
+            return self._random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+
+    def _observe_latency(self, model, seconds):
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=256)).append(seconds)
+
+    def hedge_delay(self, model):
+        """
+        Seconds after which a duplicate request is sent for ``model``, or None while
+        too few latencies have been observed.
+        """
+        with self._lock:
+            samples = sorted(self._latencies.get(model, ()))
+        if not self.hedging or len(samples) < self.hedge_min_samples:
+            return None
+        return samples[min(int(len(samples) * self.hedge_percentile), len(samples) - 1)]
+
+    def _model_for(self, model):
+        # Skip a model that was overloaded moments ago
+        with self._lock:
+            overloaded = self._overloaded_until.get(model, 0) > time.monotonic()
+        return self.fallback_models.get(model, model) if overloaded else model
+
+    def _mark_overloaded(self, model):
+        with self._lock:
+            self._overloaded_until[model] = time.monotonic() + self.overload_cooldown_seconds
+
+    def call(self, request, model, stream=False, timeout_seconds=None, tokens=0):
+        """
+        Sends a request with retries, hedging and fallback.
+        :param request: Callable ``request(model, timeout)`` performing one attempt; it
+                        returns the response, or an iterable of chunks when streaming.
+        :param model: Model to use first.
+        :param stream: Streaming request: attempts are retried until the first chunk
+                       arrives, and every later chunk must arrive before the deadline.
+        :param timeout_seconds: Deadline for the whole call, not counting local queueing
+                                (default timeout_seconds, or stream_timeout_seconds when streaming).
+        :param tokens: Estimated input tokens of one request, taken from the rate limiter
+                       for every request sent.
+        :return: Tuple of (response or chunk iterator, model that served the request).
+        """
+        deadline = time.monotonic() + (timeout_seconds or (self.stream_timeout_seconds if stream else self.timeout_seconds))
+        self._count("calls")
+        current = self._model_for(model)
+        if current != model:
+            self._count("fallbacks", model=model)
+        overloads, last_error = 0, None
+
+        for attempt in range(self.max_attempts):
+            if deadline - time.monotonic() <= 0:
+                break
+            queued = time.monotonic()
+            try:
+                self._acquire(tokens)
+            except QueueTimeoutError as e:
+                # Local congestion: neither retried nor held against the model
+                self._count("queue_timeouts", model=current)
+                last_error = e
+                break
+            # Time queued locally does not count against the deadline
+            deadline += time.monotonic() - queued
+            self._count("attempts", model=current)
+            started = time.monotonic()
+            try:
+                # The slot is released when the request finishes, not when the call stops waiting for it
+                if stream:
+                    result = self._first_chunk(request, current, deadline)
+                else:
+                    result = self._attempt(request, current, deadline, tokens)
+            except Exception as e:
+                last_error = e
+            else:
+                self.concurrency.on_success()
+                if stream:
+                    return self._rest_of_stream(result, deadline), current
+                # Only full responses inform the hedging threshold; streams only report their first chunk
+                self._observe_latency(current, time.monotonic() - started)
+                return result, current
+
+            status = error_status(last_error)
+            if isinstance(last_error, TimeoutError):
+                self._count("timeouts", model=current)
+            if status == 429:
+                self._count("throttled", model=current)
+                self.concurrency.on_throttle()
+            if not is_retryable(last_error):
+                break
+            if status in OVERLOAD_STATUSES or isinstance(last_error, TimeoutError):
+                overloads += 1
+                fallback = self.fallback_models.get(current)
+                if fallback and overloads >= self.fallback_after_overloads:
+                    self._mark_overloaded(current)
+                    self._count("fallbacks", model=current)
+                    current, overloads = fallback, 0
+                    continue
+            if attempt + 1 < self.max_attempts:
+                delay = min(self._backoff(attempt), deadline - time.monotonic())
+                if delay > 0:
+                    time.sleep(delay)
+                self._count("retries", model=current)
+
+        self._count("failures", model=current)
+        if last_error is None:
+            last_error = TimeoutError("Request deadline exceeded")
+        raise RequestFailedError(f"Request to {current} failed: {last_error}", attempts=attempt + 1) from last_error
+
+    def _acquire(self, tokens):
+        # Rate limiter budget (at most one window away), then a request slot
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(tokens)
+        if not self.concurrency.acquire(timeout=self.queue_timeout_seconds):
+            raise QueueTimeoutError("Timed out waiting for a free request slot")
+
+    def _attempt(self, request, model, deadline, tokens=0):
+        # Takes over the slot acquired by call()
+        primary = _spawn(request, model, deadline - time.monotonic(), on_done=self.concurrency.release)
+        futures = [primary]
+        delay = self.hedge_delay(model)
+        if delay is not None:
+            wait(futures, timeout=min(delay, max(deadline - time.monotonic(), 0)))
+            if not primary.done() and deadline - time.monotonic() > 0 and self._try_acquire_hedge(tokens):
+                self._count("hedges", model=model)
+                hedge = _spawn(request, model, deadline - time.monotonic(), on_done=self.concurrency.release)
+                futures.append(hedge)
+
+        first_error = None
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count("hedge_wins", model=model)
+                    return future.result()
+                first_error = first_error or future.exception()
+        if first_error is not None and not pending:
+            raise first_error
+        raise TimeoutError(f"No response from {model} before the deadline")
+
+    def _try_acquire_hedge(self, tokens):
+        if not self.concurrency.try_acquire():
+            return False
+        if self.rate_limiter is not None and not self.rate_limiter.try_acquire(tokens):
+            self.concurrency.release()
+            return False
+        return True
+
+    def _first_chunk(self, request, model, deadline):
+        # Chunks are pumped from a background thread so every wait can honour the deadline.
+        # The pump owns the slot acquired by call() and releases it once the stream has ended.
+        chunks = queue.Queue()
+
+        def pump():
+            try:
+                for chunk in request(model, deadline - time.monotonic()):
+                    chunks.put(chunk)
+                chunks.put(_STREAM_END)
+            except BaseException as e:
+                chunks.put(e)
+            finally:
+                self.concurrency.release()
+
+        threading.Thread(target=pump, daemon=True).start()
+        first = self._next_chunk(chunks, model, deadline)
+        return first, chunks, model
+
+    def _next_chunk(self, chunks, model, deadline):
+        try:
+            item = chunks.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            raise TimeoutError(f"Stream from {model} stalled past the deadline")
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def _rest_of_stream(self, started_stream, deadline):
+        first, chunks, model = started_stream
+        item = first
+        while item is not _STREAM_END:
+            yield item
+            item = self._next_chunk(chunks, model, deadline)
@@ -0,0 +1,109 @@
+import json
+import re
+
+STRUCTURAL_CHARS = re.compile(r'["{}\[\]]')
+STRING_SPECIAL_CHARS = re.compile(r'["\\]')
+
+
+class IncrementalDealParser:
+    """
+    Incremental parser for streamed ``{"hot_deals": [...]}`` responses.
+
+    Text is fed chunk by chunk and each ``hot_deals[i]`` object is returned as soon
+    as its closing brace arrives. Only the deal currently being received is
+    buffered, so the full response is never held or re-scanned. Anything before the
+    first brace (e.g. a markdown code fence) is ignored, and a bare top-level array
+    of deals is accepted as well.
+    """
+
+    def __init__(self, array_key="hot_deals"):
+        self.array_key = array_key
+        self.errors = []
+        self.found_array = False
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._key_chars = None
+        self._last_key = None
+        self._array_depth = None
+        self._capturing = False
+        self._buffer = []
+
+    def feed(self, text):
+        """
+        Consumes the next chunk of response text.
+        :param text: The chunk text.
+        :return: List of deal dicts completed within this chunk.
+        """
+        deals = []
+        capture_start = 0 if self._capturing else None
+        pos = 0
+        end = len(text)
+        while pos < end:
+            if self._escape:
+                self._escape = False
+                if self._key_chars is not None:
+                    self._key_chars.append(text[pos])
+                pos += 1
+                continue
+
+            if self._in_string:
+                match = STRING_SPECIAL_CHARS.search(text, pos)
+                stop = match.start() if match else end
+                if self._key_chars is not None:
+                    self._key_chars.append(text[pos:stop])
+                if match is None:
+                    break
+                pos = stop + 1
+                if text[stop] == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        self._last_key = "".join(self._key_chars)
+                        self._key_chars = None
+                continue
+
+            match = STRUCTURAL_CHARS.search(text, pos)
+            if match is None:
+                break
+            index = match.start()
+            char = text[index]
+            pos = index + 1
+
+            if char == '"':
+                self._in_string = True
+                # Only keys of the root object matter for locating the deals array
+                self._key_chars = [] if len(self._stack) == 1 and not self._capturing else None
+            elif char in "{[":
+                if char == "{" and not self._capturing and len(self._stack) == self._array_depth:
+                    self._capturing = True
+                    capture_start = index
+                self._stack.append(char)
+                if char == "[" and self._array_depth is None and (
+                    len(self._stack) == 1 or (len(self._stack) == 2 and self._last_key == self.array_key)
+                ):
+                    self._array_depth = len(self._stack)
+                    self.found_array = True
+            else:
+                if self._stack:
+                    self._stack.pop()
+                if self._capturing and len(self._stack) == self._array_depth:
+                    self._buffer.append(text[capture_start:pos])
+                    self._emit(deals)
+                    capture_start = None
+                elif self._array_depth is not None and len(self._stack) < self._array_depth:
+                    self._array_depth = -1
+
+        if self._capturing and capture_start is not None:
+            self._buffer.append(text[capture_start:])
+        return deals
+
+    def _emit(self, deals):
+        raw = "".join(self._buffer)
+        self._buffer = []
+        self._capturing = False
+        try:
+            deals.append(json.loads(raw))
+        except ValueError as e:
+            self.errors.append({"error": str(e), "raw_deal": raw})
@@ -0,0 +1,183 @@
+import json
+
+from pydantic import ValidationError
+
+from models import (
+    DealInclusionBase,
+    ExtractedHotDeal,
+    HotDealsResponse,
+    MarketingCopy,
+    MealPlanBase,
+    SpecialOfferBase,
+    WeddingPackageBase,
+)
+
+# Keys of the OpenAPI subset Gemini accepts in a response schema
+SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "items", "properties", "required"}
+
+CHILD_MODELS = {
+    "deal_inclusions": DealInclusionBase,
+    "meal_plans": MealPlanBase,
+    "special_offers": SpecialOfferBase,
+    "wedding_packages": WeddingPackageBase,
+}
+
+
+def response_schema(model_cls):
+    """
+    Derives a Gemini response schema from a Pydantic model: ``$ref``s are inlined,
+    ``Optional`` fields become ``nullable`` and unsupported keywords are dropped.
+    :param model_cls: The Pydantic model class.
+    :return: Schema dict suitable for ``generation_config["response_schema"]``.
+    """
+    schema = model_cls.model_json_schema()
+    return _convert(schema, schema.get("$defs", {}))
+
+
+def _convert(node, defs):
+    if "$ref" in node:
+        return _convert(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+
+    if "anyOf" in node:
+        variants = [variant for variant in node["anyOf"] if variant.get("type") != "null"]
+        converted = _convert(variants[0], defs)
+        if len(variants) < len(node["anyOf"]):
+            converted["nullable"] = True
+        return converted
+
+    converted = {}
+    if "enum" in node:
+        converted["type"] = "string"
+        converted["enum"] = [str(value) for value in node["enum"]]
+    elif node.get("type") == "object" or "properties" in node:
+        converted["type"] = "object"
+        converted["properties"] = {name: _convert(value, defs) for name, value in node.get("properties", {}).items()}
+        if node.get("required"):
+            converted["required"] = list(node["required"])
+    elif node.get("type") == "array":
+        converted["type"] = "array"
+        converted["items"] = _convert(node.get("items", {"type": "string"}), defs)
+    else:
+        converted["type"] = node.get("type", "string")
+
+    # Gemini only accepts the date-time format on strings, so plain dates are described instead
+    if node.get("format") == "date":
+        converted["description"] = "Date in YYYY-MM-DD format"
+    elif node.get("format") == "date-time":
+        converted["format"] = "date-time"
+    if node.get("description"):
+        converted["description"] = node["description"]
+    return {key: value for key, value in converted.items() if key in SCHEMA_KEYS}
+
+
+def drop_deal_properties(schema, names):
+    """
+    Copies a hot deals response schema without the given deal properties.
+    :param schema: Schema dict from response_schema(HotDealsResponse).
+    :param names: Deal property names to remove.
+    :return: New schema dict.
+    """
+    schema = json.loads(json.dumps(schema))
+    deal = schema["properties"]["hot_deals"]["items"]
+    for name in names:
+        deal["properties"].pop(name, None)
+    if "required" in deal:
+        deal["required"] = [name for name in deal["required"] if name not in names]
+    return schema
+
+
+HOT_DEALS_RESPONSE_SCHEMA = response_schema(HotDealsResponse)
+
+MARKETING_FIELDS = list(MarketingCopy.model_fields)
+MARKETING_COPY_SCHEMA = response_schema(MarketingCopy)
+# Phase one of two-phase extraction asks for the contract facts only
+DEAL_FACTS_RESPONSE_SCHEMA = drop_deal_properties(HOT_DEALS_RESPONSE_SCHEMA, MARKETING_FIELDS)
+
+
+def _format_errors(error):
+    return [f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()]
+
+
+def validate_hot_deal(hot_deal):
+    """
+    Validates one extracted deal, salvaging what it can: child records that fail
+    validation on their own are dropped, as are invalid optional fields, instead of
+    rejecting the whole deal.
+    :param hot_deal: Deal dict as produced by the model.
+    :return: Tuple of (validated ExtractedHotDeal or None, list of error strings).
+    """
+    try:
+        return ExtractedHotDeal.model_validate(hot_deal), []
+    except ValidationError as e:
+        first_error = e
+    except Exception as e:
+        return None, [str(e)]
+
+    if not isinstance(hot_deal, dict):
+        return None, _format_errors(first_error)
+
+    salvaged = dict(hot_deal)
+    notes = []
+    for field, child_model in CHILD_MODELS.items():
+        items = salvaged.get(field)
+        if not isinstance(items, list):
+            if field in salvaged:
+                notes.append(f"{field}: dropped non-list value")
+                salvaged.pop(field)
+            continue
+        kept = []
+        for index, item in enumerate(items):
+            try:
+                kept.append(child_model.model_validate(item))
+            except ValidationError as e:
+                notes.append(f"{field}[{index}]: dropped ({e.error_count()} error(s))")
+        salvaged[field] = kept
+
+    try:
+        return ExtractedHotDeal.model_validate(salvaged), notes
+    except ValidationError as e:
+        second_error = e
+
+    # Drop top-level fields that have defaults but still fail, then give up
+    fields = ExtractedHotDeal.model_fields
+    for error in second_error.errors():
+        name = error["loc"][0] if error["loc"] else None
+        if name in fields and not fields[name].is_required():
+            salvaged.pop(name, None)
+            notes.append(f"{name}: reset to default")
+    try:
+        return ExtractedHotDeal.model_validate(salvaged), notes
+    except ValidationError as e:
+        return None, notes + _format_errors(e)
+
+
+def validate_hot_deals(data):
+    """
+    Validates a parsed ``{"hot_deals": [...]}`` response deal by deal.
+    :param data: The parsed response.
+    :return: Dict with the validated ``hot_deals`` (JSON-ready) and, if any deal was
+             repaired or rejected, ``validation_errors``.
+    """
+    hot_deals, errors = [], []
+    raw_deals = data.get("hot_deals", []) if isinstance(data, dict) else data
+    for index, raw_deal in enumerate(raw_deals if isinstance(raw_deals, list) else []):
+        deal, notes = validate_hot_deal(raw_deal)
+        if deal is not None:
+            hot_deals.append(deal.model_dump(mode="json"))
+        if notes:
+            # ``index`` is the deal's position in the response, ``deal_index`` its position in hot_deals
+            report = {"index": index, "salvaged": deal is not None, "errors": notes}
+            report.update({"deal_index": len(hot_deals) - 1} if deal is not None else {"raw_deal": raw_deal})
+            errors.append(report)
+
+    result = {"hot_deals": hot_deals}
+    if errors:
+        result["validation_errors"] = errors
+    return result
+
+
+def schema_fingerprint(schema):
+    """
+    Stable string form of a response schema, used to key cached structured extractions.
+    """
+    return json.dumps(schema, sort_keys=True)
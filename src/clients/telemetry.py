@@ -0,0 +1,298 @@
+from collections import deque
+from contextlib import contextmanager
+import json
+import os
+import sys
+import threading
+import time
+
+# USD per million tokens, for prompts up to 128k tokens. Models are matched by longest
+# name prefix, so versioned names (gemini-1.5-pro-002) use their family's price.
+MODEL_PRICING = {
+    "gemini-1.5-pro": {"input": 1.25, "cached_input": 0.3125, "output": 5.00},
+    "gemini-1.5-flash": {"input": 0.075, "cached_input": 0.01875, "output": 0.30},
+}
+
+STAGES = ("upload", "file_processing", "time_to_first_token", "generation", "parse", "marketing_copy")
+
+# Latency samples kept per stage for percentiles
+MAX_SAMPLES = 2048
+
+
+def usage_counts(usage_metadata):
+    """
+    Reads token counts from a response's ``usage_metadata``.
+    :return: Dict with prompt_tokens, cached_tokens and output_tokens.
+    """
+    return {
+        "prompt_tokens": getattr(usage_metadata, "prompt_token_count", 0) or 0,
+        "cached_tokens": getattr(usage_metadata, "cached_content_token_count", 0) or 0,
+        "output_tokens": getattr(usage_metadata, "candidates_token_count", 0) or 0,
+    }
+
+
+def estimate_cost(model, counts, pricing=None):
+    """
+    Estimates the USD cost of one call from its token counts.
+    :param model: Model name used for the call.
+    :param counts: Output of usage_counts.
+    :param pricing: Price table (default MODEL_PRICING).
+    :return: Cost in USD, or None if the model has no known price.
+    """
+    pricing = MODEL_PRICING if pricing is None else pricing
+    name = model.split("/")[-1]
+    family = max((key for key in pricing if name.startswith(key)), key=len, default=None)
+    if family is None:
+        return None
+    prices = pricing[family]
+    uncached = counts["prompt_tokens"] - counts["cached_tokens"]
+    return (uncached * prices["input"] + counts["cached_tokens"] * prices["cached_input"]
+            + counts["output_tokens"] * prices["output"]) / 1_000_000
+
+
+def format_report(report):
+    """
+    Formats a Telemetry report as a plain-text table for terminals and logs.
+    """
+    lines = [f"{'stage':<20} {'count':>7} {'errors':>6} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'total s':>9}"]
+    for stage, stats in report["stages"].items():
+        lines.append(f"{stage:<20} {stats['count']:>7} {stats['errors']:>6} {stats['mean_ms']:>10.1f} "
+                     f"{stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f} {stats['total_seconds']:>9.2f}")
+    lines.append("")
+    lines.append(f"{'model':<20} {'calls':>7} {'prompt tok':>11} {'cached tok':>11} {'output tok':>11} {'cost $':>9}")
+    for model, usage in list(report["models"].items()) + [("total", report["totals"])]:
+        lines.append(f"{model:<20} {usage['calls']:>7} {usage['prompt_tokens']:>11} {usage['cached_tokens']:>11} "
+                     f"{usage['output_tokens']:>11} {usage['cost_usd']:>9.4f}")
+    if report.get("counters"):
+        lines.append("")
+        lines += [f"{counter:<32} {value:>7}" for counter, value in report["counters"].items()]
+    return "\n".join(lines)
+
+
+class MetricsSink:
+    """
+    Receives telemetry. ``emit`` is called with every event as it is recorded and
+    ``flush`` with the aggregated report when the owner asks for one.
+    """
+
+    def emit(self, event):
+        pass
+
+    def flush(self, report):
+        pass
+
+
+class JsonLogSink(MetricsSink):
+    """
+    Writes every event as one JSON line, to a file (appended) or a stream (default stderr).
+    """
+
+    def __init__(self, path=None, stream=None):
+        self.path = path
+        self.stream = stream if stream is not None or path else sys.stderr
+        self._lock = threading.Lock()
+
+    def _write(self, value):
+        line = json.dumps(value, sort_keys=True, default=str) + "\n"
+        with self._lock:
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            else:
+                self.stream.write(line)
+                self.stream.flush()
+
+    def emit(self, event):
+        self._write(event)
+
+    def flush(self, report):
+        self._write({"event": "report", "ts": time.time(), **report})
+
+
+def prometheus_text(report, prefix="hot_deals"):
+    """
+    Renders a Telemetry report in the Prometheus text exposition format.
+    """
+    lines = [
+        f"# HELP {prefix}_stage_seconds Time spent per extraction stage.",
+        f"# TYPE {prefix}_stage_seconds summary",
+    ]
+    for stage, stats in report["stages"].items():
+        for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+            lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {stats[key] / 1000:.6f}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["total_seconds"]:.6f}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+    lines += [f"# HELP {prefix}_stage_errors_total Failed stage executions.",
+              f"# TYPE {prefix}_stage_errors_total counter"]
+    for stage, stats in report["stages"].items():
+        lines.append(f'{prefix}_stage_errors_total{{stage="{stage}"}} {stats["errors"]}')
+    lines += [f"# HELP {prefix}_tokens_total Tokens billed per model.",
+              f"# TYPE {prefix}_tokens_total counter"]
+    for model, usage in report["models"].items():
+        for kind in ("prompt", "cached", "output"):
+            lines.append(f'{prefix}_tokens_total{{model="{model}",kind="{kind}"}} {usage[f"{kind}_tokens"]}')
+    lines += [f"# HELP {prefix}_cost_usd_total Estimated cost per model.",
+              f"# TYPE {prefix}_cost_usd_total counter"]
+    for model, usage in report["models"].items():
+        lines.append(f'{prefix}_cost_usd_total{{model="{model}"}} {usage["cost_usd"]:.6f}')
+    lines += [f"# HELP {prefix}_events_total Pipeline event counters (retries, fallbacks...).",
+              f"# TYPE {prefix}_events_total counter"]
+    for counter, value in report.get("counters", {}).items():
+        lines.append(f'{prefix}_events_total{{event="{counter}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusTextSink(MetricsSink):
+    """
+    Writes the aggregated report to ``path`` in the Prometheus text format on every
+    flush, atomically, for the node exporter's textfile collector or a scrape endpoint.
+    """
+
+    def __init__(self, path, prefix="hot_deals"):
+        self.path = path
+        self.prefix = prefix
+
+    def flush(self, report):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(prometheus_text(report, self.prefix))
+        os.replace(tmp_path, self.path)
+
+
+class Telemetry:
+    """
+    Collects per-stage timings and per-model token usage and cost for the extraction
+    pipeline. Aggregates are kept in memory for ``report``; every event is also passed
+    to the configured sinks.
+    """
+
+    def __init__(self, sinks=None, pricing=None):
+        self.sinks = list(sinks or [])
+        self.pricing = MODEL_PRICING if pricing is None else pricing
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clears all aggregates.
+        """
+        with self._lock:
+            self._stages = {}
+            self._models = {}
+            self._counters = {}
+
+    def _emit(self, event):
+        for sink in self.sinks:
+            try:
+                sink.emit(event)
+            except Exception:
+                # Metrics must never break an extraction
+                pass
+
+    def observe(self, stage, seconds, ok=True, **labels):
+        """
+        Records one execution of a stage.
+        :param stage: Stage name (see STAGES).
+        :param seconds: Duration in seconds.
+        :param ok: Whether the stage succeeded.
+        :param labels: Extra event fields, e.g. ``model``.
+        """
+        with self._lock:
+            stats = self._stages.setdefault(stage, {"count": 0, "errors": 0, "total_seconds": 0.0,
+                                                    "samples": deque(maxlen=MAX_SAMPLES)})
+            stats["count"] += 1
+            stats["errors"] += not ok
+            stats["total_seconds"] += seconds
+            stats["samples"].append(seconds)
+        self._emit({"event": "span", "ts": time.time(), "stage": stage, "seconds": round(seconds, 6), "ok": ok,
+                    **labels})
+
+    def increment(self, counter, amount=1, **labels):
+        """
+        Adds to a named event counter (retries, fallbacks, cache hits...).
+        :param counter: Counter name.
+        :param amount: Amount to add.
+        :param labels: Extra event fields, e.g. ``model``.
+        """
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+        self._emit({"event": "counter", "ts": time.time(), "counter": counter, "amount": amount, **labels})
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """
+        Times the enclosed block as one execution of ``stage``; exceptions are recorded
+        as errors and re-raised.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(stage, time.perf_counter() - started, ok=False, **labels)
+            raise
+        self.observe(stage, time.perf_counter() - started, **labels)
+
+    def record_usage(self, model, usage_metadata, stage="generation"):
+        """
+        Records the token usage of one model call and its estimated cost.
+        :param model: Model name used for the call.
+        :param usage_metadata: The response's ``usage_metadata`` (ignored if None).
+        :param stage: Stage the call belongs to.
+        :return: Dict of token counts and ``cost_usd``.
+        """
+        if usage_metadata is None:
+            return None
+        counts = usage_counts(usage_metadata)
+        cost = estimate_cost(model, counts, self.pricing)
+        with self._lock:
+            usage = self._models.setdefault(model, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                                                    "output_tokens": 0, "cost_usd": 0.0})
+            usage["calls"] += 1
+            for key, value in counts.items():
+                usage[key] += value
+            usage["cost_usd"] += cost or 0.0
+        counts["cost_usd"] = cost
+        self._emit({"event": "usage", "ts": time.time(), "stage": stage, "model": model, **counts})
+        return counts
+
+    def report(self):
+        """
+        Returns the aggregates: per-stage count, errors and latency statistics, per-model
+        token counts and cost, totals and event counters.
+        """
+        with self._lock:
+            stages = {}
+            # Pipeline stages in pipeline order, then any custom ones
+            for stage in sorted(self._stages, key=lambda name: (STAGES.index(name) if name in STAGES else len(STAGES), name)):
+                stats = self._stages[stage]
+                ordered = sorted(stats["samples"])
+                stages[stage] = {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "total_seconds": round(stats["total_seconds"], 6),
+                    "mean_ms": round(stats["total_seconds"] / stats["count"] * 1000, 3),
+                    "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+                    "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 3),
+                    "max_ms": round(ordered[-1] * 1000, 3),
+                }
+            models = {model: dict(usage, cost_usd=round(usage["cost_usd"], 6)) for model, usage in self._models.items()}
+            counters = dict(sorted(self._counters.items()))
+        totals = {key: sum(usage[key] for usage in models.values())
+                  for key in ("calls", "prompt_tokens", "cached_tokens", "output_tokens")}
+        totals["cost_usd"] = round(sum(usage["cost_usd"] for usage in models.values()), 6)
+        return {"stages": stages, "models": models, "totals": totals, "counters": counters}
+
+    def flush(self):
+        """
+        Passes the current report to every sink and returns it.
+        """
+        report = self.report()
+        for sink in self.sinks:
+            try:
+                sink.flush(report)
+            except Exception:
+                pass
+        return report
@@ -0,0 +1,360 @@
+"""
+Normalized, compact in-memory representation for large sets of hot deals.
+
+The Pydantic models in ``models.py`` embed a full ``HotDeal`` in every child record
+and a full ``Hotel`` in every deal. ``CompactDeals`` interns hotels and deals once
+and refers to them by integer id: hotels and deals are held column-oriented (one
+list per field) and child records in ``__slots__`` classes that store a ``deal_id``.
+Memory and serialization therefore scale with the number of unique entities, and
+conversion to and from ``HotDealPackage`` lists or extraction dicts is lossless.
+Values are held in their JSON form (ISO dates, enum values), so a deal interns to
+the same id whether it came from a model or a dict.
+"""
+from datetime import date as date_type
+from enum import Enum
+
+from models import (
+    DealInclusion,
+    DealInclusionBase,
+    Hotel,
+    HotDeal,
+    HotDealPackage,
+    MealPlan,
+    MealPlanBase,
+    SpecialOffer,
+    SpecialOfferBase,
+    WeddingPackage,
+    WeddingPackageBase,
+)
+
+COMPACT_FORMAT_VERSION = 1
+
+HOTEL_FIELDS = tuple(Hotel.model_fields)
+DEAL_FIELDS = tuple(name for name in HotDeal.model_fields if name != "hotel")
+CHILD_COLLECTIONS = ("deal_inclusions", "meal_plans", "special_offers", "wedding_packages")
+
+
+def jsonable(value):
+    """
+    Converts a model field value (date, enum) to its JSON representation.
+    """
+    if isinstance(value, date_type):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _key(values):
+    return tuple(jsonable(value) for value in values)
+
+
+class _Record:
+    """
+    Base for child records: a fixed set of slots, ``deal_id`` first.
+    """
+    __slots__ = ("deal_id",)
+    fields = ()
+    defaults = {}
+
+    def __init__(self, deal_id, values):
+        self.deal_id = deal_id
+        for name in self.fields:
+            setattr(self, name, jsonable(values.get(name, self.defaults.get(name))))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.fields}
+
+
+def _record_class(name, base_model, extra_slots=()):
+    fields = tuple(base_model.model_fields)
+    defaults = {field: info.default for field, info in base_model.model_fields.items() if not info.is_required()}
+    return type(name, (_Record,), {"__slots__": fields + extra_slots, "fields": fields, "defaults": defaults})
+
+
+InclusionRecord = _record_class("InclusionRecord", DealInclusionBase)
+MealPlanRecord = _record_class("MealPlanRecord", MealPlanBase)
+WeddingPackageRecord = _record_class("WeddingPackageRecord", WeddingPackageBase)
+# Offers are interned too, so combined_with can refer to other offers by id;
+# ``listed`` marks offers that belong to a package rather than only being combined with one
+SpecialOfferRecord = _record_class("SpecialOfferRecord", SpecialOfferBase, ("combined_with", "listed"))
+
+RECORD_CLASSES = {
+    "deal_inclusions": InclusionRecord,
+    "meal_plans": MealPlanRecord,
+    "special_offers": SpecialOfferRecord,
+    "wedding_packages": WeddingPackageRecord,
+}
+
+
+class CompactDeals:
+    """
+    Interned, column-oriented store of hotels, deals and their child records.
+    """
+
+    def __init__(self):
+        self.hotels = {field: [] for field in HOTEL_FIELDS}
+        self.deals = {field: [] for field in DEAL_FIELDS + ("hotel_id", "source", "extra")}
+        self.children = {collection: [] for collection in CHILD_COLLECTIONS}
+        self._hotel_ids = {}
+        self._deal_ids = {}
+        self._offer_ids = {}
+        # Values of the child records stored per (collection, deal id), so a repeated deal
+        # does not add the same children again
+        self._child_keys = {}
+
+    def __len__(self):
+        return len(self.deals["hotel_id"])
+
+    def add_hotel(self, hotel):
+        """
+        Interns a hotel (``Hotel`` or dict) and returns its id.
+        """
+        values = hotel.model_dump() if isinstance(hotel, Hotel) else (hotel or {})
+        key = _key(values.get(field) for field in HOTEL_FIELDS)
+        hotel_id = self._hotel_ids.get(key)
+        if hotel_id is None:
+            hotel_id = self._hotel_ids[key] = len(self._hotel_ids)
+            for field, value in zip(HOTEL_FIELDS, key):
+                self.hotels[field].append(value)
+        return hotel_id
+
+    def add_deal(self, hot_deal, source=None):
+        """
+        Interns a deal (``HotDeal`` or extraction dict) and returns its id.
+        :param hot_deal: The deal; child collections on a dict are ignored here.
+        :param source: Optional identifier of the contract the deal came from.
+        """
+        if isinstance(hot_deal, HotDeal):
+            hotel_id = self.add_hotel(hot_deal.hotel)
+            values = _key(getattr(hot_deal, field) for field in DEAL_FIELDS)
+            extra = None
+        else:
+            hotel_id = self.add_hotel(hot_deal.get("hotel"))
+            values = _key(hot_deal.get(field) for field in DEAL_FIELDS)
+            known = set(DEAL_FIELDS).union(CHILD_COLLECTIONS, ("hotel",))
+            extra = {key: value for key, value in hot_deal.items() if key not in known} or None
+
+        key = (*values, hotel_id, source, repr(extra) if extra else None)
+        deal_id = self._deal_ids.get(key)
+        if deal_id is None:
+            deal_id = self._deal_ids[key] = len(self._deal_ids)
+            for field, value in zip(DEAL_FIELDS, values):
+                self.deals[field].append(value)
+            self.deals["hotel_id"].append(hotel_id)
+            self.deals["source"].append(source)
+            self.deals["extra"].append(extra)
+        return deal_id
+
+    def _add_children(self, collection, deal_id, records):
+        # Children of a deal's first occurrence are all kept; repeats of the deal only add
+        # children it did not have yet
+        keys = self._child_keys.setdefault((collection, deal_id), set())
+        repeated = bool(keys)
+        for record in records:
+            key = tuple(getattr(record, field) for field in record.fields)
+            if repeated and key in keys:
+                continue
+            keys.add(key)
+            self.children[collection].append(record)
+
+    def _add_offer(self, deal_id, offer, listed):
+        values = offer.model_dump(exclude={"hot_deal", "combined_with"}) if isinstance(offer, SpecialOffer) else offer
+        combined = tuple(
+            self._add_offer(self.add_deal(other.hot_deal), other, listed=False)
+            for other in getattr(offer, "combined_with", [])
+        )
+        key = (deal_id, _key(values.get(field) for field in SpecialOfferRecord.fields), combined)
+        offer_id = self._offer_ids.get(key)
+        if offer_id is None:
+            record = SpecialOfferRecord(deal_id, values)
+            record.combined_with = combined
+            record.listed = listed
+            offer_id = self._offer_ids[key] = len(self.children["special_offers"])
+            self.children["special_offers"].append(record)
+        elif listed:
+            self.children["special_offers"][offer_id].listed = True
+        return offer_id
+
+    def add_package(self, package, source=None):
+        """
+        Adds a ``HotDealPackage`` and returns the id of its deal. Child records are
+        attached to the deal their own ``hot_deal`` refers to.
+        """
+        deal_id = self.add_deal(package.hot_deal, source)
+
+        def child_deal_id(child):
+            if child.hot_deal is package.hot_deal or child.hot_deal == package.hot_deal:
+                return deal_id
+            return self.add_deal(child.hot_deal, source)
+
+        for collection in ("deal_inclusions", "meal_plans", "wedding_packages"):
+            record_class = RECORD_CLASSES[collection]
+            by_deal = {}
+            for child in getattr(package, collection):
+                values = {field: getattr(child, field) for field in record_class.fields}
+                child_id = child_deal_id(child)
+                by_deal.setdefault(child_id, []).append(record_class(child_id, values))
+            for child_id, records in by_deal.items():
+                self._add_children(collection, child_id, records)
+        for offer in package.special_offers:
+            self._add_offer(child_deal_id(offer), offer, listed=True)
+        return deal_id
+
+    def add_extraction(self, data, source=None):
+        """
+        Adds the deals of an extraction result (``{"hot_deals": [...]}``). Child
+        records missing optional fields get the model defaults, as validated
+        extractions already do.
+        :param data: The extraction result.
+        :param source: Optional identifier of the contract the deals came from.
+        :return: List of deal ids, in order.
+        """
+        deal_ids = []
+        for hot_deal in data.get("hot_deals", []):
+            deal_id = self.add_deal(hot_deal, source)
+            for collection in ("deal_inclusions", "meal_plans", "wedding_packages"):
+                record_class = RECORD_CLASSES[collection]
+                self._add_children(collection, deal_id,
+                                   [record_class(deal_id, child) for child in hot_deal.get(collection) or []])
+            for offer in hot_deal.get("special_offers") or []:
+                self._add_offer(deal_id, offer, listed=True)
+            deal_ids.append(deal_id)
+        return deal_ids
+
+    @classmethod
+    def from_packages(cls, packages, source=None):
+        compact = cls()
+        for package in packages:
+            compact.add_package(package, source)
+        return compact
+
+    @classmethod
+    def from_extraction(cls, data, source=None):
+        compact = cls()
+        compact.add_extraction(data, source)
+        return compact
+
+    def hotel(self, hotel_id):
+        """
+        Returns the hotel ``hotel_id`` as a dict.
+        """
+        return {field: self.hotels[field][hotel_id] for field in HOTEL_FIELDS}
+
+    def deal_values(self, deal_id):
+        """
+        Returns the deal ``deal_id`` as a dict with its hotel nested (no child records).
+        """
+        values = {field: self.deals[field][deal_id] for field in DEAL_FIELDS}
+        values["hotel"] = self.hotel(self.deals["hotel_id"][deal_id])
+        return values
+
+    def _children_by_deal(self):
+        grouped = [{collection: [] for collection in CHILD_COLLECTIONS} for _ in range(len(self))]
+        for collection in CHILD_COLLECTIONS:
+            for record in self.children[collection]:
+                if collection != "special_offers" or record.listed:
+                    grouped[record.deal_id][collection].append(record)
+        return grouped
+
+    def to_packages(self):
+        """
+        Rebuilds one ``HotDealPackage`` per deal. Every child of a deal shares the same
+        ``HotDeal`` instance and each hotel is built once.
+        """
+        hotels = [Hotel(**self.hotel(hotel_id)) for hotel_id in range(len(self._hotel_ids))]
+        deals = []
+        for deal_id in range(len(self)):
+            values = {field: self.deals[field][deal_id] for field in DEAL_FIELDS}
+            deals.append(HotDeal(hotel=hotels[self.deals["hotel_id"][deal_id]], **values))
+
+        offers = {}
+
+        def build_offer(offer_id):
+            if offer_id not in offers:
+                record = self.children["special_offers"][offer_id]
+                offers[offer_id] = SpecialOffer(hot_deal=deals[record.deal_id],
+                                                combined_with=[build_offer(other) for other in record.combined_with],
+                                                **record.as_dict())
+            return offers[offer_id]
+
+        offer_ids = {id(record): offer_id for offer_id, record in enumerate(self.children["special_offers"])}
+        packages = []
+        for deal_id, children in enumerate(self._children_by_deal()):
+            hot_deal = deals[deal_id]
+            packages.append(HotDealPackage(
+                hot_deal=hot_deal,
+                deal_inclusions=[DealInclusion(hot_deal=hot_deal, **r.as_dict()) for r in children["deal_inclusions"]],
+                meal_plans=[MealPlan(hot_deal=hot_deal, **r.as_dict()) for r in children["meal_plans"]],
+                special_offers=[build_offer(offer_ids[id(r)]) for r in children["special_offers"]],
+                wedding_packages=[WeddingPackage(hot_deal=hot_deal, **r.as_dict()) for r in children["wedding_packages"]],
+            ))
+        return packages
+
+    def to_extraction(self, source=None):
+        """
+        Rebuilds the nested ``{"hot_deals": [...]}`` extraction shape (JSON-ready).
+        :param source: Only include deals from this source, if given.
+        """
+        hot_deals = []
+        for deal_id, children in enumerate(self._children_by_deal()):
+            if source is not None and self.deals["source"][deal_id] != source:
+                continue
+            hot_deal = {key: jsonable(value) for key, value in self.deal_values(deal_id).items()}
+            for collection in CHILD_COLLECTIONS:
+                hot_deal[collection] = [{key: jsonable(value) for key, value in record.as_dict().items()}
+                                        for record in children[collection]]
+            if self.deals["extra"][deal_id]:
+                hot_deal.update(self.deals["extra"][deal_id])
+            hot_deals.append(hot_deal)
+        return {"hot_deals": hot_deals}
+
+    def to_dict(self):
+        """
+        Serialises to a column-oriented, JSON-ready dict.
+        """
+        data = {
+            "format_version": COMPACT_FORMAT_VERSION,
+            "hotels": self.hotels,
+            "deals": {field: [jsonable(value) for value in column] for field, column in self.deals.items()},
+        }
+        for collection, records in self.children.items():
+            record_class = RECORD_CLASSES[collection]
+            columns = ("deal_id",) + record_class.__slots__
+            data[collection] = {column: [jsonable(getattr(record, column)) for record in records]
+                                for column in columns}
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Loads a dict produced by to_dict.
+        """
+        compact = cls()
+        hotel_columns = [data["hotels"][field] for field in HOTEL_FIELDS]
+        for hotel_id, key in enumerate(zip(*hotel_columns)):
+            compact._hotel_ids[_key(key)] = hotel_id
+        compact.hotels = {field: list(column) for field, column in zip(HOTEL_FIELDS, hotel_columns)}
+
+        deal_columns = list(DEAL_FIELDS) + ["hotel_id", "source", "extra"]
+        compact.deals = {field: list(data["deals"][field]) for field in deal_columns}
+        for deal_id, row in enumerate(zip(*(compact.deals[field] for field in deal_columns))):
+            compact._deal_ids[(*_key(row[:-1]), repr(row[-1]) if row[-1] else None)] = deal_id
+
+        for collection, record_class in RECORD_CLASSES.items():
+            columns = data[collection]
+            records = []
+            for row in zip(*(columns[column] for column in ("deal_id",) + record_class.__slots__)):
+                values = dict(zip(record_class.__slots__, row[1:]))
+                record = record_class(row[0], values)
+                if record_class is SpecialOfferRecord:
+                    record.combined_with = tuple(values["combined_with"])
+                    record.listed = values["listed"]
+                    key = (row[0], _key(values[field] for field in record_class.fields), record.combined_with)
+                    compact._offer_ids[key] = len(records)
+                else:
+                    compact._child_keys.setdefault((collection, row[0]), set()).add(
+                        _key(values[field] for field in record_class.fields))
+                records.append(record)
+            compact.children[collection] = records
+        return compact
@@ -0,0 +1,371 @@
+"""
+Contract versioning and incremental re-extraction.
+
+Hotels send revised versions of the same contract that usually change a rate table
+or a single offer. Every page is fingerprinted by its text, deal-bearing pages are
+grouped into sections (with their rate/meal-plan context pages) and each section is
+fingerprinted by the pages it holds. When a revision arrives, only sections whose
+fingerprint was not seen in the previous version are sent to Gemini; the others reuse
+their previous results. The fresh deals are then merged into the previous ones field
+by field, so edits the user made survive wherever the contract did not change.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import copy
+import io
+import json
+import os
+import re
+import threading
+
+from pypdf import PdfReader
+
+from clients.extraction_cache import hash_bytes
+from pdf_preprocess import (
+    CHUNKING_MIN_PAGES,
+    IDENTITY_PAGES,
+    build_sub_pdf,
+    deal_key,
+    merge_hot_deals,
+    plan_chunks,
+    score_pages,
+)
+
+# Share of its distinctive pages (those not shared with other stored contracts) a new
+# upload must have in common with a stored contract to be treated as a revision of it
+REVISION_MIN_OVERLAP = 0.5
+
+
+def normalise_text(text):
+    """
+    Collapses whitespace and lower-cases text, so layout changes do not affect comparisons.
+    """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def hotel_names(hot_deals):
+    """
+    Returns the normalised hotel names of a list of deals.
+    """
+    return sorted({normalise_text(str((hot_deal.get("hotel") or {}).get("name") or "")) for hot_deal in hot_deals}
+                  - {""})
+
+
+def page_fingerprints(file_bytes, page_texts=None):
+    """
+    Extracts and fingerprints every page of a PDF. Text is whitespace- and
+    case-normalised so re-exports of unchanged pages keep their fingerprint; pages
+    without extractable text (scans) are fingerprinted by their content stream.
+    :param file_bytes: Bytes of the PDF file.
+    :param page_texts: The PDF's page texts, if already extracted.
+    :return: Tuple of (list of page texts, list of page fingerprints).
+    """
+    reader = PdfReader(io.BytesIO(file_bytes))
+    texts, fingerprints = [], []
+    for index, page in enumerate(reader.pages):
+        text = page_texts[index] if page_texts is not None else page.extract_text() or ""
+        normalised = normalise_text(text)
+        if normalised:
+            fingerprints.append(hash_bytes(normalised))
+        else:
+            contents = page.get_contents()
+            fingerprints.append(hash_bytes(contents.get_data() if contents is not None else b""))
+        texts.append(text)
+    return texts, fingerprints
+
+
+def plan_sections(page_scores, fingerprints, max_pages_per_section=6, max_context_pages=4,
+                  min_pages=CHUNKING_MIN_PAGES, identity_pages=IDENTITY_PAGES):
+    """
+    Splits a contract into independently extractable sections, planned like the chunks
+    of chunked extraction (plan_chunks). A section's fingerprint covers all of
+    its pages, so it changes whenever any page the model would read for it changes.
+    Contracts shorter than ``min_pages``, or without identifiable deal pages, form a
+    single section holding every page.
+    :param page_scores: Output of score_pages.
+    :param fingerprints: Page fingerprints, aligned with page_scores.
+    :param max_pages_per_section: Maximum offer/wedding pages per section.
+    :param max_context_pages: Maximum rate/meal-plan pages attached to every section.
+    :param min_pages: Page count from which a contract is split into sections.
+    :param identity_pages: Number of leading pages attached to every section.
+    :return: List of {"fingerprint", "pages"} dicts.
+    """
+    groups = plan_chunks(page_scores, max_pages_per_section, max_context_pages, identity_pages) \
+        if len(fingerprints) >= min_pages else []
+    if not groups:
+        groups = [list(range(len(fingerprints)))]
+
+    return [{"fingerprint": hash_bytes("\n".join(fingerprints[i] for i in pages)), "pages": pages}
+            for pages in groups]
+
+
+def merge_revision(base_deals, edited_deals, fresh_deals):
+    """
+    Three-way merge of a re-extraction into the previous, user-edited deals.
+
+    Deals are matched by deal_key on the previous extraction (so renaming a deal in the
+    editor does not break the match). For a matched deal, every field the contract did
+    not change (fresh value equals the previous extraction) keeps the user's value;
+    changed fields take the fresh value. Unmatched fresh deals are added and previous
+    deals missing from the revision are dropped.
+    :param base_deals: Deals as previously extracted.
+    :param edited_deals: The same deals after user edits, aligned with base_deals.
+    :param fresh_deals: Deals extracted from the revision.
+    :return: Tuple of (merged deal list, {"kept", "updated", "added", "removed"} counts).
+    """
+    if edited_deals is None or len(edited_deals) != len(base_deals):
+        edited_deals = base_deals
+    base_index = {}
+    for index, hot_deal in enumerate(base_deals):
+        base_index.setdefault(deal_key(hot_deal), index)
+
+    merged, matched = [], set()
+    counts = {"kept": 0, "updated": 0, "added": 0, "removed": 0}
+    for fresh in fresh_deals:
+        index = base_index.get(deal_key(fresh))
+        if index is None or index in matched:
+            merged.append(copy.deepcopy(fresh))
+            counts["added"] += 1
+            continue
+        matched.add(index)
+        base, edited = base_deals[index], edited_deals[index]
+        hot_deal, changed = {}, False
+        for field in list(fresh) + [field for field in edited if field not in fresh]:
+            if field in fresh and fresh.get(field) != base.get(field):
+                hot_deal[field] = copy.deepcopy(fresh[field])
+                changed = True
+            elif field in edited:
+                hot_deal[field] = copy.deepcopy(edited[field])
+        merged.append(hot_deal)
+        counts["updated" if changed else "kept"] += 1
+    counts["removed"] = len(base_deals) - len(matched)
+    return merged, counts
+
+
+class ContractVersionStore:
+    """
+    Persists the latest extracted version of each contract: its page and section
+    fingerprints, the extraction result of every section, the merged deals as
+    extracted and, once saved, the user's edited deals. One JSON file per contract,
+    plus an index of page fingerprints used to recognise revisions.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("CONTRACT_VERSIONS_DIR", os.path.join(".cache", "contract_versions"))
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self._index = self._read(os.path.join(self.path, "index.json")) or {}
+        # Number of stored contracts holding each page; pages held by several are boilerplate
+        self._page_counts = Counter(page for entry in self._index.values() for page in set(entry["pages"]))
+
+    def _read(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, value):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+
+    def _record_path(self, contract_id):
+        return os.path.join(self.path, f"{contract_id}.json")
+
+    def latest(self, contract_id):
+        """
+        Returns the latest stored version of a contract, or None.
+        """
+        with self._lock:
+            return self._read(self._record_path(contract_id))
+
+    def find_previous(self, fingerprints, page_texts=None, min_overlap=REVISION_MIN_OVERLAP):
+        """
+        Finds the stored contract a new upload revises. Pages found in more than one
+        stored contract (terms and conditions, legal boilerplate) are ignored; of the
+        rest, at least ``min_overlap`` must be found in the stored version, and the
+        upload must name one of the stored contract's hotels or keep its cover page.
+        :param fingerprints: Page fingerprints of the new upload.
+        :param page_texts: Page texts of the new upload, searched for the hotel names.
+        :param min_overlap: Minimum share of the new upload's distinctive pages found in the stored version.
+        :return: The contract id, or None if no stored contract matches.
+        """
+        text = normalise_text(" ".join(page_texts)) if page_texts is not None else ""
+        best_id, best_overlap = None, min_overlap
+        with self._lock:
+            pages = {page for page in fingerprints if self._page_counts[page] < 2}
+            if not pages:
+                return None
+            for contract_id, entry in self._index.items():
+                overlap = len(pages & set(entry["pages"])) / len(pages)
+                if overlap < best_overlap:
+                    continue
+                same_cover = bool(fingerprints) and entry.get("cover") == fingerprints[0]
+                same_hotel = any(name in text for name in entry.get("hotels", []))
+                if same_cover or same_hotel:
+                    best_id, best_overlap = contract_id, overlap
+        return best_id
+
+    def save(self, record):
+        """
+        Stores a new version record, replacing the previous version of the contract.
+        """
+        with self._lock:
+            self._write(self._record_path(record["contract_id"]), record)
+            previous = self._index.get(record["contract_id"])
+            if previous is not None:
+                self._page_counts.subtract(set(previous["pages"]))
+            self._page_counts.update(set(record["pages"]))
+            self._index[record["contract_id"]] = {
+                "version": record["version"],
+                "pages": record["pages"],
+                "cover": record["pages"][0] if record["pages"] else None,
+                "hotels": hotel_names(record["hot_deals"]),
+            }
+            self._write(os.path.join(self.path, "index.json"), self._index)
+
+    def save_edits(self, contract_id, hot_deals):
+        """
+        Stores the user's edited deals for the latest version of a contract, so the next
+        revision can be merged into them.
+        :param contract_id: Id of the contract.
+        :param hot_deals: Edited deals, aligned with the version's extracted deals.
+        """
+        with self._lock:
+            record = self._read(self._record_path(contract_id))
+            if record is None:
+                return
+            record["edited_hot_deals"] = hot_deals
+            self._write(self._record_path(contract_id), record)
+
+
+def extract_contract_version(client, file_bytes, store, contract_id=None, display_name="Uploaded PDF",
+                             edited_hot_deals=None, prompt=None, model=None, max_workers=4,
+                             max_pages_per_section=6, max_context_pages=4, min_pages=CHUNKING_MIN_PAGES,
+                             page_texts=None, extract=None):
+    """
+    Extracts a contract, re-using everything that did not change since its previous
+    version. The upload is matched to a stored contract by ``contract_id`` or, if not
+    given, by find_previous; only new or changed sections are extracted (in parallel) and
+    the result is merged into the previous deals with merge_revision. A matched contract
+    whose extracted hotels turn out to differ from the upload's is left untouched and
+    the upload is stored as a new contract.
+    :param client: GoogleGeminiClient used for the extraction.
+    :param file_bytes: Bytes of the PDF file.
+    :param store: ContractVersionStore holding previous versions.
+    :param contract_id: Id of the contract this upload revises, if known.
+    :param display_name: Display name for the uploaded file(s).
+    :param edited_hot_deals: The user's current edits of the previous version's deals
+                             (defaults to the edits saved in the store).
+    :param prompt: The prompt to use for extraction.
+    :param model: The Gemini model to use.
+    :param max_workers: Maximum sections extracted concurrently.
+    :param max_pages_per_section: Maximum offer/wedding pages per section.
+    :param max_context_pages: Maximum rate/meal-plan pages attached to every section.
+    :param min_pages: Page count from which a contract is split into sections.
+    :param page_texts: The PDF's page texts, if already extracted.
+    :param extract: Callable ``extract(section_bytes, display_name)`` returning the
+                    extraction result of one section (default: the client's
+                    extract_hot_deal_packages_from_bytes). A single pending section is
+                    extracted in the calling thread.
+    :return: The extracted data as a dict, with a ``revision`` summary.
+    """
+    digest = hash_bytes(file_bytes)
+    page_texts, fingerprints = page_fingerprints(file_bytes, page_texts)
+    matched = contract_id is None
+    if matched:
+        contract_id = store.find_previous(fingerprints, page_texts)
+    previous = store.latest(contract_id) if contract_id else None
+    extraction = {"prompt": prompt, "model": model}
+    if previous is not None and previous.get("extraction") != extraction:
+        # Results produced with another prompt or model cannot be reused
+        previous = dict(previous, section_results={})
+
+    if previous is not None and previous["sha256"] == digest:
+        data = {"hot_deals": copy.deepcopy(previous.get("edited_hot_deals") or previous["hot_deals"])}
+        data["revision"] = {"contract_id": contract_id, "version": previous["version"],
+                            "previous_version": previous["version"], "unchanged": True}
+        return data
+
+    sections = plan_sections(score_pages(page_texts), fingerprints, max_pages_per_section, max_context_pages,
+                             min_pages)
+    reusable = previous["section_results"] if previous is not None else {}
+    pending = [section for section in sections if section["fingerprint"] not in reusable]
+    if extract is None:
+        def extract(section_bytes, section_name):
+            return client.extract_hot_deal_packages_from_bytes(section_bytes, display_name=section_name,
+                                                               prompt=prompt, model=model)
+
+    def extract_section(numbered_section):
+        number, section = numbered_section
+        try:
+            if len(section["pages"]) == len(fingerprints):
+                # A section covering the whole contract is sent as is, which also hits the whole-contract cache
+                return extract(file_bytes, display_name)
+            return extract(build_sub_pdf(file_bytes, section["pages"]),
+                           f"{display_name} (section {number + 1}/{len(pending)})")
+        except Exception as e:
+            return {"error": str(e)}
+
+    if len(pending) == 1:
+        fresh_results = [extract_section((0, pending[0]))]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            fresh_results = list(pool.map(extract_section, enumerate(pending)))
+
+    errors = [result["error"] for result in fresh_results if "error" in result]
+    if pending and len(errors) == len(pending):
+        return fresh_results[0]
+
+    section_results = {section["fingerprint"]: reusable[section["fingerprint"]]
+                       for section in sections if section["fingerprint"] in reusable}
+    for section, result in zip(pending, fresh_results):
+        if "error" not in result:
+            section_results[section["fingerprint"]] = result
+    data = merge_hot_deals(section_results[section["fingerprint"]]
+                           for section in sections if section["fingerprint"] in section_results)
+    extracted_deals = data["hot_deals"]
+    if matched and previous is not None:
+        previous_hotels, hotels = set(hotel_names(previous["hot_deals"])), set(hotel_names(extracted_deals))
+        if previous_hotels and hotels and not previous_hotels & hotels:
+            # Another hotel's contract after all: its record is kept and this one is stored as new
+            contract_id, previous = None, None
+
+    previous_pages = set(previous["pages"]) if previous is not None else set()
+    revision = {
+        "contract_id": contract_id or digest[:16],
+        "version": previous["version"] + 1 if previous is not None else 1,
+        "previous_version": previous["version"] if previous is not None else None,
+        "sections": len(sections),
+        "reextracted_sections": len(pending),
+        "changed_pages": [i for i, fingerprint in enumerate(fingerprints) if fingerprint not in previous_pages],
+    }
+    if previous is not None:
+        if edited_hot_deals is None:
+            edited_hot_deals = previous.get("edited_hot_deals")
+        data["hot_deals"], revision["deals"] = merge_revision(previous["hot_deals"], edited_hot_deals,
+                                                              extracted_deals)
+    data["revision"] = revision
+
+    if errors:
+        # Failed sections are retried on the next upload instead of being recorded as empty
+        data["chunk_errors"] = errors
+        return data
+    store.save({
+        "contract_id": revision["contract_id"],
+        "version": revision["version"],
+        "sha256": digest,
+        "display_name": display_name,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "extraction": extraction,
+        "pages": fingerprints,
+        "sections": sections,
+        "section_results": section_results,
+        "hot_deals": extracted_deals,
+        # Merged deals carry the user's previous edits forward as this version's edits
+        "edited_hot_deals": data["hot_deals"] if previous is not None else None,
+    })
+    return data
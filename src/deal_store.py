@@ -0,0 +1,502 @@
+"""
+Persistent, indexed SQLite store for extracted hot deals.
+
+Usage:
+    python src/deal_store.py import hot_deals.jsonl              # batch output
+    python src/deal_store.py import contract_hot_deals.json --contract coral-coast-2026
+    python src/deal_store.py query --check-in 2026-12-01 --nights 5 --min-rating 4
+    python src/deal_store.py stats
+
+Hotels are stored once and deals refer to them; child records (inclusions, meal
+plans, offers, wedding packages) live in their own tables keyed by deal. Deals are
+identified by their contract and ``deal_key``, so importing a re-extraction updates
+deals in place. Dates are ISO strings, which SQLite compares in date order.
+
+Availability filters compare every deal against two bounds per range (travel window,
+night range, validity window), which a B-tree index can only narrow on one side. The
+ranges are therefore also kept in an R*Tree (``deal_ranges``, maintained by triggers)
+so a stay or booking date is matched as a point-in-box lookup, which stays in the
+milliseconds on hundreds of thousands of deals.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date as date_type
+from enum import Enum
+from types import NoneType, UnionType
+from typing import Union, get_args, get_origin
+
+from clients.extraction_cache import hash_bytes
+from clients.structured_output import CHILD_MODELS
+from compact_models import CHILD_COLLECTIONS, DEAL_FIELDS, jsonable
+from models import Hotel, HotDeal
+from pdf_preprocess import deal_key
+
+# Deal rows are written in batches of this many per executemany
+UPSERT_BATCH_SIZE = 500
+
+INDEXES = {
+    "idx_hotels_name": "hotels (name)",
+    "idx_hotels_rating": "hotels (rating)",
+    "idx_deals_contract": "deals (contract)",
+    "idx_deals_hotel": "deals (hotel_id)",
+    "idx_deals_type": "deals (deal_type)",
+    "idx_deals_validity": "deals (valid_from, valid_until)",
+    "idx_deals_travel": "deals (travel_dates_from, travel_dates_until)",
+    "idx_deals_nights": "deals (minimum_nights, maximum_nights)",
+    "idx_deals_savings": "deals (savings_percentage)",
+    "idx_deals_price": "deals (discounted_display_price)",
+}
+
+# Row of deal_ranges for the deal ``new``: dates as Julian day numbers, missing bounds
+# open-ended (such deals are then dropped by the exact filters in query_deals)
+RANGE_VALUES = ", ".join([
+    "new.id",
+    "coalesce(CAST(julianday(new.travel_dates_from) AS INTEGER), -2147483648)",
+    "coalesce(CAST(julianday(new.travel_dates_until) AS INTEGER), 2147483647)",
+    "coalesce(new.minimum_nights, -2147483648)",
+    "coalesce(new.maximum_nights, 2147483647)",
+    "coalesce(CAST(julianday(new.valid_from) AS INTEGER), -2147483648)",
+    "coalesce(CAST(julianday(new.valid_until) AS INTEGER), 2147483647)",
+])
+
+# Sort order for each ``order_by``, and the deals index that yields rows in that order
+ORDERINGS = {
+    "savings": ("d.savings_percentage DESC", "idx_deals_savings"),
+    "price": ("d.discounted_display_price ASC", "idx_deals_price"),
+    "travel": ("d.travel_dates_from ASC", "idx_deals_travel"),
+    "rating": ("h.rating DESC", None),
+}
+
+# Below this many R*Tree matches, range queries are answered from the R*Tree
+RANGE_PROBE_ROWS = 5000
+
+
+def _sql_type(annotation):
+    if get_origin(annotation) in (Union, UnionType):
+        annotation = next(arg for arg in get_args(annotation) if arg is not NoneType)
+    if annotation in (int, bool):
+        return "INTEGER"
+    if annotation is float:
+        return "REAL"
+    return "TEXT"
+
+
+def _columns(model_cls, skip=()):
+    return {name: _sql_type(info.annotation) for name, info in model_cls.model_fields.items() if name not in skip}
+
+
+HOTEL_COLUMNS = _columns(Hotel)
+DEAL_COLUMNS = _columns(HotDeal, skip=("hotel",))
+CHILD_COLUMNS = {collection: _columns(CHILD_MODELS[collection]) for collection in CHILD_COLLECTIONS}
+# SQLite stores booleans as integers; these are turned back into bools when read
+BOOL_COLUMNS = {collection: {name for name, info in CHILD_MODELS[collection].model_fields.items()
+                             if bool in (info.annotation, *get_args(info.annotation))}
+                for collection in CHILD_COLLECTIONS}
+
+
+def _column_defs(columns):
+    return ", ".join(f"{name} {sql_type}" for name, sql_type in columns.items())
+
+
+def _db_value(value):
+    if isinstance(value, (date_type, Enum)):
+        return jsonable(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _hotel_key(hot_deal):
+    hotel = hot_deal.get("hotel") or {}
+    return hotel.get("name") or "", hotel.get("address") or ""
+
+
+def deal_uid(contract, hot_deal):
+    """
+    Stable identity of a deal within a contract, used to update deals in place.
+    """
+    return hash_bytes(json.dumps([contract, *deal_key(hot_deal)], default=str))
+
+
+class DealStore:
+    """
+    SQLite-backed store of hotels, deals and their child records with a query API.
+    One connection is shared by all threads, serialised by a lock.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("DEAL_STORE_PATH", ".cache/hot_deals.sqlite")
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        statements = [
+            f"""CREATE TABLE IF NOT EXISTS hotels (
+                id INTEGER PRIMARY KEY, {_column_defs(HOTEL_COLUMNS)}, UNIQUE (name, address))""",
+            f"""CREATE TABLE IF NOT EXISTS deals (
+                id INTEGER PRIMARY KEY, uid TEXT NOT NULL UNIQUE, contract TEXT,
+                hotel_id INTEGER REFERENCES hotels (id), {_column_defs(DEAL_COLUMNS)}, updated_at REAL)""",
+        ]
+        for collection, columns in CHILD_COLUMNS.items():
+            statements.append(f"""CREATE TABLE IF NOT EXISTS {collection} (
+                id INTEGER PRIMARY KEY, deal_id INTEGER NOT NULL REFERENCES deals (id) ON DELETE CASCADE,
+                {_column_defs(columns)})""")
+            statements.append(f"CREATE INDEX IF NOT EXISTS idx_{collection}_deal ON {collection} (deal_id)")
+        statements += [f"CREATE INDEX IF NOT EXISTS {name} ON {target}" for name, target in INDEXES.items()]
+        statements += [
+            """CREATE VIRTUAL TABLE IF NOT EXISTS deal_ranges USING rtree_i32 (
+                id, travel_from, travel_until, nights_min, nights_max, valid_from, valid_until)""",
+            f"""CREATE TRIGGER IF NOT EXISTS deals_ranges_insert AFTER INSERT ON deals BEGIN
+                INSERT INTO deal_ranges VALUES ({RANGE_VALUES}); END""",
+            f"""CREATE TRIGGER IF NOT EXISTS deals_ranges_update AFTER UPDATE ON deals BEGIN
+                DELETE FROM deal_ranges WHERE id = old.id;
+                INSERT INTO deal_ranges VALUES ({RANGE_VALUES}); END""",
+            """CREATE TRIGGER IF NOT EXISTS deals_ranges_delete AFTER DELETE ON deals BEGIN
+                DELETE FROM deal_ranges WHERE id = old.id; END""",
+        ]
+        with self._lock, self._connection:
+            for statement in statements:
+                self._connection.execute(statement)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _upsert_hotels(self, hotels):
+        columns = list(HOTEL_COLUMNS)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in columns if name not in ("name", "address"))
+        # Name and address identify a hotel; missing ones are stored empty so they still match
+        unique = {}
+        for hotel in hotels:
+            values = {name: _db_value(hotel.get(name)) for name in columns}
+            values["name"], values["address"] = values["name"] or "", values["address"] or ""
+            unique[(values["name"], values["address"])] = values
+        self._connection.executemany(
+            f"INSERT INTO hotels ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (name, address) DO UPDATE SET {updates}",
+            [[values[name] for name in columns] for values in unique.values()],
+        )
+        return {key: self._connection.execute("SELECT id FROM hotels WHERE name = ? AND address = ?", key).fetchone()[0]
+                for key in unique}
+
+    def upsert_extraction(self, data, contract, replace=True):
+        """
+        Stores the deals of one extraction, updating deals already stored for the contract.
+        :param data: Extraction dict with a ``hot_deals`` list.
+        :param contract: Identifier of the contract (file hash, contract id...).
+        :param replace: Delete the contract's stored deals that are not in ``data``.
+                        Hotels no deal references any more are deleted either way.
+        :return: Number of deals written.
+        """
+        return self.upsert_many([(contract, data)], replace=replace)
+
+    def upsert_many(self, extractions, replace=True):
+        """
+        Bulk counterpart of upsert_extraction, in a single transaction.
+        :param extractions: Iterable of (contract, extraction dict) pairs.
+        :param replace: Delete each contract's stored deals that are not in its extraction.
+        :return: Number of deals written.
+        """
+        # A deal extracted twice within a contract is stored once, last one wins
+        by_uid, extracted = {}, set()
+        for contract, data in extractions:
+            # Contracts come from the extractions, so one that yielded no deals still replaces its stored ones
+            extracted.add(contract)
+            for hot_deal in data.get("hot_deals", []):
+                if isinstance(hot_deal, dict):
+                    by_uid[deal_uid(contract, hot_deal)] = (contract, hot_deal)
+        rows = [(contract, uid, hot_deal) for uid, (contract, hot_deal) in by_uid.items()]
+        contracts = extracted if replace else set()
+
+        deal_columns = list(DEAL_COLUMNS)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in deal_columns + ["contract", "hotel_id", "updated_at"])
+        now = time.time()
+        with self._lock, self._connection:
+            # Hotels the contracts referenced before, removed below if no deal references them any more
+            previous_hotel_ids = self._contract_hotel_ids(extracted)
+            hotel_ids = self._upsert_hotels([hot_deal.get("hotel") or {} for _, _, hot_deal in rows])
+            if replace:
+                uids_by_contract = {}
+                for contract, uid, _ in rows:
+                    uids_by_contract.setdefault(contract, set()).add(uid)
+                for contract in contracts:
+                    stale = [row["id"] for row in self._connection.execute(
+                        "SELECT id, uid FROM deals WHERE contract = ?", (contract,)
+                    ) if row["uid"] not in uids_by_contract.get(contract, ())]
+                    self._connection.executemany("DELETE FROM deals WHERE id = ?", [(deal_id,) for deal_id in stale])
+
+            for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                batch = rows[start:start + UPSERT_BATCH_SIZE]
+                self._connection.executemany(
+                    f"INSERT INTO deals (uid, contract, hotel_id, {', '.join(deal_columns)}, updated_at) "
+                    f"VALUES ({', '.join('?' * (len(deal_columns) + 4))}) "
+                    f"ON CONFLICT (uid) DO UPDATE SET {updates}",
+                    [[uid, contract, hotel_ids[_hotel_key(hot_deal)]]
+                     + [_db_value(hot_deal.get(name)) for name in deal_columns] + [now]
+                     for contract, uid, hot_deal in batch],
+                )
+                uids = [uid for _, uid, _ in batch]
+                deal_ids = dict(self._connection.execute(
+                    f"SELECT uid, id FROM deals WHERE uid IN ({', '.join('?' * len(uids))})", uids
+                ).fetchall())
+                # Child records are replaced wholesale with the deal's current ones
+                for collection, columns in CHILD_COLUMNS.items():
+                    self._connection.executemany(f"DELETE FROM {collection} WHERE deal_id = ?",
+                                                 [(deal_ids[uid],) for uid in uids])
+                    self._connection.executemany(
+                        f"INSERT INTO {collection} (deal_id, {', '.join(columns)}) "
+                        f"VALUES ({', '.join('?' * (len(columns) + 1))})",
+                        [[deal_ids[uid]] + [_db_value(item.get(name)) for name in columns]
+                         for _, uid, hot_deal in batch
+                         for item in hot_deal.get(collection) or [] if isinstance(item, dict)],
+                    )
+            self._delete_orphan_hotels(previous_hotel_ids)
+        return len(rows)
+
+    def _contract_hotel_ids(self, contracts):
+        contracts = list(contracts)
+        hotel_ids = set()
+        for start in range(0, len(contracts), UPSERT_BATCH_SIZE):
+            batch = contracts[start:start + UPSERT_BATCH_SIZE]
+            hotel_ids.update(row[0] for row in self._connection.execute(
+                f"SELECT DISTINCT hotel_id FROM deals WHERE contract IN ({', '.join('?' * len(batch))})", batch
+            ))
+        hotel_ids.discard(None)
+        return hotel_ids
+
+    def _delete_orphan_hotels(self, hotel_ids):
+        self._connection.executemany(
+            "DELETE FROM hotels WHERE id = ? AND NOT EXISTS (SELECT 1 FROM deals WHERE hotel_id = ?)",
+            [(hotel_id, hotel_id) for hotel_id in hotel_ids],
+        )
+
+    def delete_contract(self, contract):
+        """
+        Removes every deal stored for a contract, and the hotels only those deals referenced.
+        :return: Number of deals deleted.
+        """
+        with self._lock, self._connection:
+            hotel_ids = self._contract_hotel_ids([contract])
+            deleted = self._connection.execute("DELETE FROM deals WHERE contract = ?", (contract,)).rowcount
+            self._delete_orphan_hotels(hotel_ids)
+        return deleted
+
+    def query_deals(self, check_in=None, nights=None, booked_on=None, min_rating=None, max_rating=None,
+                    hotel=None, deal_type=None, max_price=None, contract=None, order_by="savings", limit=100,
+                    include_children=False):
+        """
+        Finds deals matching every given filter.
+        :param check_in: Stay start date (YYYY-MM-DD) that must fall in the travel window;
+                         with ``nights``, the check-out date must too.
+        :param nights: Stay length that must be within the deal's minimum/maximum nights.
+        :param booked_on: Booking date that must fall in the validity window and not be
+                          after the booking deadline.
+        :param min_rating: Minimum hotel star rating.
+        :param max_rating: Maximum hotel star rating.
+        :param hotel: Case-insensitive substring of the hotel name.
+        :param deal_type: Exact deal type.
+        :param max_price: Maximum discounted display price.
+        :param contract: Only deals of this contract.
+        :param order_by: One of ORDERINGS.
+        :param limit: Maximum number of deals returned (None for all).
+        :param include_children: Attach inclusions, meal plans, offers and wedding packages.
+        :return: List of deal dicts in the extraction format, with ``contract``.
+        """
+        clauses, params = [], []
+        ranges, range_params = [], []
+        if check_in is not None:
+            ranges.append("r.travel_from <= CAST(julianday(?) AS INTEGER)")
+            range_params.append(check_in)
+            ranges.append("r.travel_until >= CAST(julianday(?, ?) AS INTEGER)")
+            range_params += [check_in, f"+{int(nights or 0)} days"]
+        if nights is not None:
+            ranges.append("r.nights_min <= ? AND r.nights_max >= ?")
+            range_params += [nights, nights]
+        if booked_on is not None:
+            ranges.append("r.valid_from <= CAST(julianday(?) AS INTEGER) AND r.valid_until >= CAST(julianday(?) AS INTEGER)")
+            range_params += [booked_on, booked_on]
+        range_select = f"SELECT r.id FROM deal_ranges r WHERE {' AND '.join(ranges)}"
+        if check_in is not None:
+            clauses.append("d.travel_dates_from <= ?")
+            params.append(check_in)
+            if nights is not None:
+                clauses.append("d.travel_dates_until >= date(?, ?)")
+                params += [check_in, f"+{int(nights)} days"]
+            else:
+                clauses.append("d.travel_dates_until >= ?")
+                params.append(check_in)
+        if nights is not None:
+            clauses.append("d.minimum_nights <= ? AND d.maximum_nights >= ?")
+            params += [nights, nights]
+        if booked_on is not None:
+            clauses.append("d.valid_from <= ? AND d.valid_until >= ? "
+                           "AND (d.booking_deadline IS NULL OR d.booking_deadline >= ?)")
+            params += [booked_on, booked_on, booked_on]
+        if min_rating is not None:
+            clauses.append("h.rating >= ?")
+            params.append(min_rating)
+        if max_rating is not None:
+            clauses.append("h.rating <= ?")
+            params.append(max_rating)
+        if hotel:
+            clauses.append("h.name LIKE ?")
+            params.append(f"%{hotel}%")
+        if deal_type:
+            clauses.append("d.deal_type = ?")
+            params.append(deal_type)
+        if max_price is not None:
+            clauses.append("d.discounted_display_price <= ?")
+            params.append(max_price)
+        if contract is not None:
+            clauses.append("d.contract = ?")
+            params.append(contract)
+
+        order, order_index = ORDERINGS[order_by]
+        with self._lock:
+            # Walking the ordering index and stopping at ``limit`` matches beats sorting every
+            # candidate, unless a hotel or contract filter already narrows them to a handful
+            walk_order = limit is not None and order_index is not None and not hotel and contract is None
+            if ranges:
+                # Only a few range matches: fetch them through the R*Tree instead (the exact
+                # comparisons still apply)
+                probe = self._connection.execute(
+                    f"SELECT COUNT(*) FROM ({range_select} LIMIT {RANGE_PROBE_ROWS})", range_params
+                ).fetchone()[0]
+                if probe < RANGE_PROBE_ROWS or not walk_order:
+                    walk_order = False
+                    clauses.insert(0, f"d.id IN ({range_select})")
+                    params[:0] = range_params
+            source = f"deals d INDEXED BY {order_index}" if walk_order else "deals d"
+            hotel_select = ", ".join(f"h.{name} AS hotel_{name}" for name in HOTEL_COLUMNS)
+            sql = (f"SELECT d.*, {hotel_select} FROM {source} LEFT JOIN hotels h ON h.id = d.hotel_id"
+                   f"{' WHERE ' + ' AND '.join(clauses) if clauses else ''} ORDER BY {order}")
+            if limit is not None:
+                sql += " LIMIT ?"
+                params.append(limit)
+            rows = self._connection.execute(sql, params).fetchall()
+            deals = [self._row_to_deal(row) for row in rows]
+            if include_children and deals:
+                self._attach_children(deals, [row["id"] for row in rows])
+        return deals
+
+    def _row_to_deal(self, row):
+        hot_deal = {"contract": row["contract"]}
+        hot_deal.update({name: row[name] for name in DEAL_FIELDS})
+        hot_deal["hotel"] = {name: row[f"hotel_{name}"] for name in HOTEL_COLUMNS}
+        return hot_deal
+
+    def _attach_children(self, deals, deal_ids):
+        by_id = dict(zip(deal_ids, deals))
+        for hot_deal in deals:
+            for collection in CHILD_COLLECTIONS:
+                hot_deal[collection] = []
+        for collection, columns in CHILD_COLUMNS.items():
+            flags = BOOL_COLUMNS[collection]
+            for start in range(0, len(deal_ids), UPSERT_BATCH_SIZE):
+                ids = deal_ids[start:start + UPSERT_BATCH_SIZE]
+                for row in self._connection.execute(
+                    f"SELECT deal_id, {', '.join(columns)} FROM {collection} "
+                    f"WHERE deal_id IN ({', '.join('?' * len(ids))}) ORDER BY id", ids
+                ):
+                    item = {name: bool(row[name]) if name in flags and row[name] is not None else row[name]
+                            for name in columns}
+                    by_id[row["deal_id"]][collection].append(item)
+
+    def stats(self):
+        """
+        Returns row counts per table.
+        """
+        with self._lock:
+            return {table: self._connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in ("hotels", "deals") + CHILD_COLLECTIONS}
+
+
+def import_file(store, path, contract=None):
+    """
+    Imports a batch JSONL output (every ``ok`` record, keyed by its sha256) or a single
+    extraction JSON file (keyed by ``contract`` or the file name).
+    :return: Number of deals written.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            extractions = []
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("status") == "ok":
+                    extractions.append((record["sha256"], record["result"]))
+            return store.upsert_many(extractions)
+        data = json.load(f)
+    return store.upsert_extraction(data, contract or os.path.splitext(os.path.basename(path))[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Store and query extracted hot deals.")
+    parser.add_argument("--db", default=None, help="SQLite file (default: $DEAL_STORE_PATH or .cache/hot_deals.sqlite)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Import batch JSONL output or an extraction JSON file")
+    import_parser.add_argument("paths", nargs="+", help="*.jsonl batch outputs or *.json extractions")
+    import_parser.add_argument("--contract", default=None, help="Contract id for a single JSON file")
+
+    query_parser = commands.add_parser("query", help="Find deals")
+    query_parser.add_argument("--check-in", default=None, help="Stay start date, YYYY-MM-DD")
+    query_parser.add_argument("--nights", type=int, default=None, help="Stay length in nights")
+    query_parser.add_argument("--booked-on", default=None, help="Booking date, YYYY-MM-DD")
+    query_parser.add_argument("--min-rating", type=float, default=None, help="Minimum hotel star rating")
+    query_parser.add_argument("--max-rating", type=float, default=None, help="Maximum hotel star rating")
+    query_parser.add_argument("--hotel", default=None, help="Hotel name contains")
+    query_parser.add_argument("--deal-type", default=None, help="Deal type")
+    query_parser.add_argument("--max-price", type=float, default=None, help="Maximum discounted price")
+    query_parser.add_argument("--contract", default=None, help="Only deals of this contract")
+    query_parser.add_argument("--order-by", choices=sorted(ORDERINGS), default="savings")
+    query_parser.add_argument("--limit", type=int, default=20)
+    query_parser.add_argument("--children", action="store_true", help="Include child records")
+    query_parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+
+    commands.add_parser("stats", help="Show row counts")
+    args = parser.parse_args(argv)
+
+    store = DealStore(args.db)
+    if args.command == "import":
+        total = sum(import_file(store, path, args.contract) for path in args.paths)
+        print(json.dumps({"deals": total, **store.stats()}))
+    elif args.command == "stats":
+        print(json.dumps(store.stats()))
+    else:
+        started = time.perf_counter()
+        deals = store.query_deals(check_in=args.check_in, nights=args.nights, booked_on=args.booked_on,
+                                  min_rating=args.min_rating, max_rating=args.max_rating, hotel=args.hotel,
+                                  deal_type=args.deal_type, max_price=args.max_price, contract=args.contract,
+                                  order_by=args.order_by, limit=args.limit, include_children=args.children)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if args.json:
+            print(json.dumps(deals, indent=2))
+        else:
+            for hot_deal in deals:
+                print(f"{hot_deal['hotel']['name'] or '':<30.30} {hot_deal['name'] or '':<40.40} "
+                      f"{hot_deal['travel_dates_from']}..{hot_deal['travel_dates_until']} "
+                      f"{hot_deal['minimum_nights']}-{hot_deal['maximum_nights']}n "
+                      f"{hot_deal['discounted_display_price']}")
+            print(f"{len(deals)} deal(s) in {elapsed_ms:.1f} ms", file=sys.stderr)
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,6 +15,7 @@ class DealType(Enum):
   WEEKEND_ESCAPE = 'weekend_escape'
   EXTENDED_STAY = 'extended_stay'
   FLIGHT_PACKAGE = 'flight_package'
+  WEDDING = 'wedding'
 
 
 class DealInclusionType(Enum):
@@ -55,47 +56,60 @@ class HotDeal(BaseModel):
   travel_dates_until: date_type
 
 
-class DealInclusion(BaseModel):
-  hot_deal: HotDeal
+class DealInclusionBase(BaseModel):
   title: str
   description: str
   category: DealInclusionType
 
 
-class MealPlan(BaseModel):
-    hot_deal: HotDeal
+class DealInclusion(DealInclusionBase):
+  hot_deal: HotDeal
+
+
+class MealPlanBase(BaseModel):
     name: str
     adult_price: float | None = None
     child_price: float | None = None
     infant_free: bool = False
     description: str | None = None
 
+
+class MealPlan(MealPlanBase):
+    hot_deal: HotDeal
+
     def __str__(self):
         return f"{self.hot_deal.name} - {self.name}"
 
 
-class SpecialOffer(BaseModel):
-    hot_deal: HotDeal
+class SpecialOfferBase(BaseModel):
     code: str | None = None
     title: str | None = None
     description: str | None = None
     min_nights: int = 1
     max_free_nights: int = 0
-    combined_with: list['SpecialOffer'] = []
     valid_from: date_type | None = None
     valid_until: date_type | None = None
 
+
+class SpecialOffer(SpecialOfferBase):
+    hot_deal: HotDeal
+    combined_with: list['SpecialOffer'] = []
+
     def __str__(self):
         return f"{self.hot_deal.name} - {self.title}"
 
 
-class WeddingPackage(BaseModel):
-    hot_deal: HotDeal
+class WeddingPackageBase(BaseModel):
     name: str
     base_price: float | None = None
     comissionable: bool = False
     min_guests: int = 2
     description: str | None = None
+    code: str | None = None
+
+
+class WeddingPackage(WeddingPackageBase):
+    hot_deal: HotDeal
 
     def __str__(self):
         return f"{self.hot_deal.name} - {self.name}"
@@ -103,9 +117,36 @@ class WeddingPackage(BaseModel):
 
 class HotDealPackage(BaseModel):
   hot_deal: HotDeal
+  deal_inclusions: list[DealInclusion] = []
   meal_plans: list[MealPlan] = []
   special_offers: list[SpecialOffer] = []
   wedding_packages: list[WeddingPackage] = []
 
   def __str__(self):
-    return f"Hot Deal Package: {self.hot_deal}"
\ No newline at end of file
+    return f"Hot Deal Package: {self.hot_deal}"
+
+
+class ExtractedHotDeal(HotDeal):
+  """
+  A hot deal as returned by the extraction model, with its child records nested
+  under it instead of pointing back at it. ``deal_type`` is the enum here so the
+  response schema lists the allowed values.
+  """
+  deal_type: DealType
+  deal_inclusions: list[DealInclusionBase] = []
+  meal_plans: list[MealPlanBase] = []
+  special_offers: list[SpecialOfferBase] = []
+  wedding_packages: list[WeddingPackageBase] = []
+
+
+class HotDealsResponse(BaseModel):
+  hot_deals: list[ExtractedHotDeal] = []
+
+
+class MarketingCopy(BaseModel):
+  """
+  The promotional fields of a hot deal, generated separately from the contract facts.
+  """
+  marketing_headline: str
+  marketing_subtitle: str
+  urgency_message: str
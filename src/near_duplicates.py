@@ -0,0 +1,370 @@
+"""
+Near-duplicate contract detection ahead of extraction.
+
+Partners resend the same contract re-scanned, re-exported or with a new cover page;
+each copy has different bytes, so the extraction cache (keyed by the SHA-256 of the
+file) misses it. Here a contract's text is reduced to a MinHash signature over word
+shingles, whose agreement estimates the Jaccard similarity of two contracts'
+shingle sets. Signatures of extracted contracts are kept with their results in an
+SQLite index, split into LSH bands: contracts sharing any band bucket with a new
+upload are the only candidates compared, so a lookup touches a handful of rows
+however many contracts are indexed.
+
+A revision that only changes a rate table is still a near-duplicate by text, so a
+match is only reused when the offer and rate pages of both contracts hold the same
+figures and are near-identical by their own, stricter MinHash comparison, which a
+re-scan's OCR noise in the wording passes. Other matches are reported as differing
+for a user to decide; everything else must be extracted (or go through contract
+versioning).
+"""
+from datetime import datetime, timezone
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+
+from clients.extraction_cache import hash_bytes
+from pdf_preprocess import CONTEXT_CATEGORIES, DEAL_CATEGORIES, extract_page_texts, score_pages
+
+# Words per shingle: short enough that OCR noise only breaks a few shingles per error
+SHINGLE_WORDS = 4
+# Signature length and its split into LSH bands of NUM_PERM / LSH_BANDS rows. With 20
+# bands of 6 rows, contracts at similarity 0.8 become candidates 99.8% of the time and
+# unrelated ones (similarity 0.3) almost never.
+NUM_PERM = 120
+LSH_BANDS = 20
+# Estimated similarity from which an upload is offered the earlier contract's extraction
+DUPLICATE_THRESHOLD = 0.85
+# Estimated similarity of the offer and rate pages alone from which a match is reused
+DEAL_PAGES_THRESHOLD = 0.9
+
+# Version of the signature hash functions; indexes built with another one are emptied
+MINHASH_SCHEME = 2
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_FIGURE_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def _hash32(text):
+    # A cryptographic hash: CRC32 is linear, which skews MinHash towards the edited shingles
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "big")
+
+
+def shingle_hashes(page_texts, words=SHINGLE_WORDS):
+    """
+    Hashes every run of ``words`` consecutive words of a document. Text is lower-cased
+    and reduced to alphanumeric tokens, and pages are joined, so line breaks, layout
+    and pagination changes do not affect the shingles.
+    :param page_texts: Texts of the document's pages.
+    :return: Array of unique 32-bit shingle hashes (empty if the document has no text).
+    """
+    tokens = _TOKEN_PATTERN.findall(" ".join(page_texts).lower())
+    # A document shorter than one shingle is a single shingle
+    hashes = {_hash32(" ".join(tokens[i:i + words])) for i in range(max(len(tokens) - words + 1, 1)) if tokens}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def deal_page_texts(page_texts):
+    """
+    Returns the texts of the offer, wedding, rate and meal-plan pages of a document,
+    the pages its deals are extracted from.
+    """
+    categories = DEAL_CATEGORIES + CONTEXT_CATEGORIES
+    return [text for text, scores in zip(page_texts, score_pages(page_texts)) if any(scores[c] for c in categories)]
+
+
+def _pages_digest(texts):
+    pages = [" ".join(_TOKEN_PATTERN.findall(text.lower())) for text in texts]
+    return hashlib.sha256("\f".join(pages).encode("utf-8")).hexdigest()
+
+
+def _figures_digest(texts):
+    return hashlib.sha256(" ".join(_FIGURE_PATTERN.findall(" ".join(texts))).encode("utf-8")).hexdigest()
+
+
+def deal_pages_digest(page_texts):
+    """
+    Fingerprints the deal pages of a document. Text is normalised like shingles, so
+    re-exports keep the digest while any changed word, price or offer changes it.
+    :param page_texts: Texts of the document's pages.
+    :return: Hex digest.
+    """
+    return _pages_digest(deal_page_texts(page_texts))
+
+
+def deal_figures_digest(page_texts):
+    """
+    Fingerprints the figures (prices, dates, night counts) of a document's deal pages,
+    in order, so changed rates are told apart from reworded text.
+    :param page_texts: Texts of the document's pages.
+    :return: Hex digest.
+    """
+    return _figures_digest(deal_page_texts(page_texts))
+
+
+def _permutations(num_perm, seed):
+    # Coefficients span the whole field: with small ones a * hash + b barely wraps around
+    # the prime, so every function ranks shingles by their hash and the estimates are biased
+    rng = np.random.default_rng(seed)
+    return (rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64),
+            rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64))
+
+
+def minhash_signature(hashes, num_perm=NUM_PERM, seed=1, chunk_size=4096):
+    """
+    Computes the MinHash signature of a set of shingle hashes, using ``num_perm``
+    universal hash functions ``(a * x + b) mod (2**61 - 1)`` (the product wraps at
+    2**64, as in common MinHash implementations).
+    :param hashes: Output of shingle_hashes.
+    :param num_perm: Signature length.
+    :param seed: Seed of the hash functions; signatures are only comparable for equal seeds.
+    :return: uint32 array of length ``num_perm``, or None for an empty set.
+    """
+    if len(hashes) == 0:
+        return None
+    a, b = _permutations(num_perm, seed)
+    signature = np.full(num_perm, _MERSENNE_PRIME, dtype=np.uint64)
+    # In chunks, so a long contract never needs a num_perm x shingles matrix at once
+    for start in range(0, len(hashes), chunk_size):
+        chunk = hashes[start:start + chunk_size]
+        values = (np.outer(a, chunk) + b[:, None]) % _MERSENNE_PRIME
+        np.minimum(signature, values.min(axis=1), out=signature)
+    return (signature & 0xFFFFFFFF).astype(np.uint32)
+
+
+def estimate_similarity(signature, other):
+    """
+    Estimates the Jaccard similarity of two documents from their MinHash signatures.
+    """
+    return float(np.mean(signature == other))
+
+
+def band_buckets(signature, bands=LSH_BANDS):
+    """
+    Hashes each band of a signature into a bucket id. Two signatures share a bucket in
+    a band only if all rows of that band are equal.
+    :return: List of (band, bucket) pairs.
+    """
+    rows = len(signature) // bands
+    return [
+        (band, int.from_bytes(hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(),
+                                              digest_size=8).digest(), "big", signed=True))
+        for band in range(bands)
+    ]
+
+
+class NearDuplicateIndex:
+    """
+    On-disk MinHash/LSH index of extracted contracts and their extraction results.
+    One connection is shared by all threads, serialised by a lock.
+    """
+
+    def __init__(self, path=None, num_perm=NUM_PERM, bands=LSH_BANDS, seed=1):
+        self.path = path or os.getenv("NEAR_DUPLICATE_INDEX", os.path.join(".cache", "near_duplicates.sqlite"))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value INTEGER)")
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS contracts (
+                id INTEGER PRIMARY KEY, sha256 TEXT NOT NULL UNIQUE, display_name TEXT, pages INTEGER,
+                signature BLOB NOT NULL, result TEXT, indexed_at TEXT, deal_pages TEXT, deal_figures TEXT,
+                deal_signature BLOB)""")
+            # Indexes created before deal pages were fingerprinted: contracts without a digest are
+            # never reused, those without figures and a signature only when their deal pages are identical
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(contracts)")}
+            for column, column_type in (("deal_pages", "TEXT"), ("deal_figures", "TEXT"), ("deal_signature", "BLOB")):
+                if column not in columns:
+                    self._connection.execute(f"ALTER TABLE contracts ADD COLUMN {column} {column_type}")
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL, bucket INTEGER NOT NULL,
+                contract_id INTEGER NOT NULL REFERENCES contracts (id) ON DELETE CASCADE)""")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_buckets ON buckets (band, bucket)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_buckets_contract ON buckets (contract_id)")
+            # An existing index keeps the parameters its signatures were computed with
+            for name, value in (("num_perm", num_perm), ("bands", bands), ("seed", seed)):
+                self._connection.execute("INSERT OR IGNORE INTO settings VALUES (?, ?)", (name, value))
+            settings = dict(self._connection.execute("SELECT name, value FROM settings"))
+            # Signatures from other hash functions are not comparable with new ones
+            if settings.get("minhash_scheme") != MINHASH_SCHEME:
+                self._connection.execute("DELETE FROM buckets")
+                self._connection.execute("DELETE FROM contracts")
+                self._connection.execute("INSERT OR REPLACE INTO settings VALUES ('minhash_scheme', ?)",
+                                         (MINHASH_SCHEME,))
+        self.num_perm, self.bands, self.seed = settings["num_perm"], settings["bands"], settings["seed"]
+        if self.num_perm % self.bands:
+            raise ValueError(f"num_perm ({self.num_perm}) must be a multiple of bands ({self.bands})")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def signature(self, file_bytes=None, page_texts=None):
+        """
+        Computes a contract's signature from its PDF bytes or already extracted page texts.
+        :return: The signature, or None if the contract has no extractable text (e.g. an
+                 image-only scan).
+        """
+        if page_texts is None:
+            page_texts = extract_page_texts(file_bytes)
+        return minhash_signature(shingle_hashes(page_texts), self.num_perm, self.seed)
+
+    def deal_fingerprint(self, page_texts):
+        """
+        Fingerprints a contract's deal pages for comparison with indexed ones.
+        :param page_texts: Texts of the contract's pages.
+        :return: Dict with ``deal_pages`` (digest), ``deal_figures`` (digest) and
+                 ``deal_signature`` (signature of the deal pages, None without text).
+        """
+        texts = deal_page_texts(page_texts)
+        return {"deal_pages": _pages_digest(texts), "deal_figures": _figures_digest(texts),
+                "deal_signature": self.signature(page_texts=texts)}
+
+    def add(self, sha256, signature, result, display_name=None, pages=None, deal_pages=None, deal_figures=None,
+            deal_signature=None):
+        """
+        Indexes an extracted contract, replacing an earlier entry for the same bytes.
+        :param sha256: SHA-256 of the PDF bytes.
+        :param signature: Output of signature().
+        :param result: Extraction result to offer for near-duplicates of this contract.
+        :param display_name: File name shown when the contract is matched.
+        :param pages: Page count.
+        :param deal_pages: Output of deal_pages_digest; without it the result is never reused.
+        :param deal_figures: Output of deal_figures_digest.
+        :param deal_signature: Signature of the deal pages; without it and ``deal_figures``
+                               the result is only reused for identical deal pages.
+        """
+        if signature is None:
+            return
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM buckets WHERE contract_id IN "
+                                     "(SELECT id FROM contracts WHERE sha256 = ?)", (sha256,))
+            self._connection.execute("DELETE FROM contracts WHERE sha256 = ?", (sha256,))
+            contract_id = self._connection.execute(
+                "INSERT INTO contracts (sha256, display_name, pages, signature, result, indexed_at, deal_pages, "
+                "deal_figures, deal_signature) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (sha256, display_name, pages, signature.astype(np.uint32).tobytes(), json.dumps(result),
+                 datetime.now(timezone.utc).isoformat(), deal_pages, deal_figures,
+                 deal_signature.astype(np.uint32).tobytes() if deal_signature is not None else None),
+            ).lastrowid
+            self._connection.executemany(
+                "INSERT INTO buckets (band, bucket, contract_id) VALUES (?, ?, ?)",
+                [(band, bucket, contract_id) for band, bucket in band_buckets(signature, self.bands)],
+            )
+
+    def add_contract(self, file_bytes, result, display_name=None, page_texts=None):
+        """
+        Indexes an extracted contract from its PDF bytes (and page texts, if already extracted).
+        """
+        if page_texts is None:
+            page_texts = extract_page_texts(file_bytes)
+        self.add(hash_bytes(file_bytes), self.signature(page_texts=page_texts), result,
+                 display_name=display_name, pages=len(page_texts), **self.deal_fingerprint(page_texts))
+
+    def query(self, signature, threshold=DUPLICATE_THRESHOLD, exclude_sha256=None, limit=5):
+        """
+        Finds indexed contracts similar to a signature.
+        :param signature: Output of signature().
+        :param threshold: Minimum estimated similarity.
+        :param exclude_sha256: Contract to leave out (usually the upload itself).
+        :param limit: Maximum number of matches.
+        :return: Matches, most similar first, as dicts with sha256, display_name, pages,
+                 indexed_at, deal_pages and similarity (without the result).
+        """
+        if signature is None:
+            return []
+        buckets = band_buckets(signature, self.bands)
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT sha256, display_name, pages, indexed_at, deal_pages, signature FROM contracts WHERE id IN "
+                f"(SELECT contract_id FROM buckets WHERE {' OR '.join(['(band = ? AND bucket = ?)'] * len(buckets))})",
+                [value for pair in buckets for value in pair],
+            ).fetchall()
+        matches = []
+        for sha256, display_name, pages, indexed_at, deal_pages, blob in rows:
+            if sha256 == exclude_sha256:
+                continue
+            similarity = estimate_similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if similarity >= threshold:
+                matches.append({"sha256": sha256, "display_name": display_name, "pages": pages,
+                                "indexed_at": indexed_at, "deal_pages": deal_pages,
+                                "similarity": round(similarity, 3)})
+        matches.sort(key=lambda match: match["similarity"], reverse=True)
+        return matches[:limit]
+
+    def result(self, sha256):
+        """
+        Returns the stored extraction result of an indexed contract, or None.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT result FROM contracts WHERE sha256 = ?", (sha256,)).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def _compare_deal_pages(self, match, upload, deal_pages_threshold):
+        with self._lock:
+            deal_figures, blob = self._connection.execute(
+                "SELECT deal_figures, deal_signature FROM contracts WHERE sha256 = ?", (match["sha256"],)
+            ).fetchone()
+        similarity = None
+        if match["deal_pages"] is not None and match["deal_pages"] == upload["deal_pages"]:
+            similarity = 1.0
+        elif blob is not None and upload["deal_signature"] is not None:
+            similarity = round(estimate_similarity(upload["deal_signature"], np.frombuffer(blob, dtype=np.uint32)), 3)
+        figures_match = deal_figures == upload["deal_figures"] if deal_figures is not None else None
+        match["deal_pages_similarity"] = similarity
+        match["deal_figures_match"] = figures_match
+        # Identical deal pages, or near-identical wording around the same figures
+        match["deal_pages_differ"] = not (similarity == 1.0 or (
+            figures_match and similarity is not None and similarity >= deal_pages_threshold))
+
+    def find(self, file_bytes, threshold=DUPLICATE_THRESHOLD, page_texts=None, limit=5,
+             deal_pages_threshold=DEAL_PAGES_THRESHOLD, include_differing=False):
+        """
+        Finds the indexed contract most similar to a new upload whose result can be
+        reused: its offer and rate pages must hold the same figures as the upload's and
+        be at least ``deal_pages_threshold`` similar, so OCR noise in their wording does
+        not block reuse. The same bytes are ignored (those are served by the extraction
+        cache).
+        :param file_bytes: Bytes of the PDF file.
+        :param threshold: Minimum estimated similarity.
+        :param page_texts: The PDF's page texts, if already extracted.
+        :param limit: Number of most similar candidates checked.
+        :param deal_pages_threshold: Minimum estimated similarity of the deal pages.
+        :param include_differing: Without a reusable match, return the most similar one
+                                  whose deal pages differ, for a user to decide.
+        :return: The best match with its ``result``, ``deal_pages_similarity`` (None if
+                 the deal pages could not be compared), ``deal_figures_match`` and
+                 ``deal_pages_differ``; or None.
+        """
+        if page_texts is None:
+            page_texts = extract_page_texts(file_bytes)
+        upload = self.deal_fingerprint(page_texts)
+        differing = None
+        for match in self.query(self.signature(page_texts=page_texts), threshold,
+                                exclude_sha256=hash_bytes(file_bytes), limit=limit):
+            self._compare_deal_pages(match, upload, deal_pages_threshold)
+            if match["deal_pages_differ"] and (not include_differing or differing is not None):
+                continue
+            match["result"] = self.result(match["sha256"])
+            if match["result"] is None:
+                continue
+            if not match["deal_pages_differ"]:
+                return match
+            differing = match
+        return differing
+
+    def stats(self):
+        """
+        Returns the number of indexed contracts and the index parameters.
+        """
+        with self._lock:
+            contracts = self._connection.execute("SELECT COUNT(*) FROM contracts").fetchone()[0]
+        return {"contracts": contracts, "num_perm": self.num_perm, "bands": self.bands}
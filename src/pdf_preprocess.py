@@ -0,0 +1,230 @@
+"""
+Local PDF pre-processing and page-level map-reduce extraction.
+
+Large contracts are mostly terms and conditions, room descriptions and legal
+boilerplate around a few pages of rates and offers. Pages are scored locally for
+deal-relevant content, and only the relevant ones are sent to Gemini, in small
+sub-PDFs that are extracted in parallel and merged back into one ``hot_deals`` result.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import io
+import json
+import re
+
+from pypdf import PdfReader, PdfWriter
+
+PAGE_CATEGORIES = {
+    "rate": re.compile(r"\b(rates?|tariffs?|per (?:room|night|person)|single|double|triple|rack|net|usd|eur|fjd|aud)\b|[$€£]\s?\d", re.I),
+    "special_offer": re.compile(r"\b(special offers?|promotions?|early bird|stay \d+\s*pay \d+|free nights?|discount|% off|long stay|honeymoon|offer code)\b", re.I),
+    "meal_plan": re.compile(r"\b(meal plans?|breakfast|half board|full board|all inclusive|dinner|lunch|bed and breakfast|b&b)\b", re.I),
+    "wedding": re.compile(r"\b(wedding|vow renewal|ceremony|bridal|celebrant|reception)\b", re.I),
+}
+
+# Contracts with at least this many pages are extracted in chunks
+CHUNKING_MIN_PAGES = 20
+
+# Deals are generated from offers and wedding packages; rates and meal plans are context they need
+DEAL_CATEGORIES = ("special_offer", "wedding")
+CONTEXT_CATEGORIES = ("rate", "meal_plan")
+# Leading pages (the cover, naming the hotel) sent with every chunk of a contract
+IDENTITY_PAGES = 1
+
+
+def count_pages(file_bytes):
+    """
+    Returns the number of pages in a PDF without extracting any text.
+    """
+    return len(PdfReader(io.BytesIO(file_bytes)).pages)
+
+
+def extract_page_texts(file_bytes):
+    """
+    Extracts the text of every page of a PDF.
+    :param file_bytes: Bytes of the PDF file.
+    :return: List of page texts, in page order.
+    """
+    reader = PdfReader(io.BytesIO(file_bytes))
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def score_pages(page_texts):
+    """
+    Scores each page by the number of keyword hits per content category.
+    :param page_texts: List of page texts.
+    :return: List of {category: hits} dicts, one per page.
+    """
+    return [{category: len(pattern.findall(text)) for category, pattern in PAGE_CATEGORIES.items()}
+            for text in page_texts]
+
+
+def find_deal_pages(page_scores):
+    """
+    Returns the indices of pages with special-offer or wedding content, in page order.
+    """
+    return [i for i, scores in enumerate(page_scores) if any(scores[c] for c in DEAL_CATEGORIES)]
+
+
+def rank_context_pages(page_scores, exclude=()):
+    """
+    Returns the indices of rate/meal-plan pages, most relevant first.
+    :param page_scores: Output of score_pages.
+    :param exclude: Page indices to leave out (typically the deal pages).
+    """
+    excluded = set(exclude)
+    return sorted(
+        (i for i, scores in enumerate(page_scores)
+         if i not in excluded and any(scores[c] for c in CONTEXT_CATEGORIES)),
+        key=lambda i: -sum(page_scores[i][c] for c in CONTEXT_CATEGORIES),
+    )
+
+
+def plan_chunks(page_scores, max_pages_per_chunk=6, max_context_pages=4, identity_pages=IDENTITY_PAGES):
+    """
+    Groups deal-bearing pages into chunks: runs of consecutive offer/wedding pages, each
+    carrying the identity pages (the cover naming the hotel) and the best rate/meal-plan
+    pages as shared context, so the hotel, prices and meal plans can still be resolved.
+    Chunks are used both for chunked extraction and as contract revision sections.
+    :param page_scores: Output of score_pages.
+    :param max_pages_per_chunk: Maximum offer/wedding pages per chunk.
+    :param max_context_pages: Maximum rate/meal-plan pages attached to every chunk.
+    :param identity_pages: Number of leading pages attached to every chunk.
+    :return: List of sorted page-index lists, one per chunk (empty without deal pages).
+    """
+    deal_pages = find_deal_pages(page_scores)
+    shared_pages = set(range(min(identity_pages, len(page_scores))))
+    shared_pages.update(rank_context_pages(page_scores, exclude=deal_pages)[:max_context_pages])
+
+    runs = []
+    for index in deal_pages:
+        if runs and runs[-1][-1] == index - 1 and len(runs[-1]) < max_pages_per_chunk:
+            runs[-1].append(index)
+        else:
+            runs.append([index])
+    return [sorted(set(run) | shared_pages) for run in runs]
+
+
+def build_sub_pdf(file_bytes, page_indices):
+    """
+    Builds a new PDF holding only the given pages.
+    :param file_bytes: Bytes of the source PDF file.
+    :param page_indices: Zero-based page indices to keep.
+    :return: Bytes of the sub-PDF.
+    """
+    reader = PdfReader(io.BytesIO(file_bytes))
+    writer = PdfWriter()
+    for index in page_indices:
+        writer.add_page(reader.pages[index])
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def deal_key(hot_deal):
+    """
+    Identity used to recognise the same deal extracted from overlapping chunks.
+    """
+    hotel = hot_deal.get("hotel") or {}
+    return (
+        str(hot_deal.get("name", "")).strip().lower(),
+        str(hot_deal.get("deal_type", "")).strip().lower(),
+        str(hotel.get("name", "")).strip().lower(),
+        hot_deal.get("valid_from"),
+        hot_deal.get("valid_until"),
+    )
+
+
+def merge_hot_deals(results):
+    """
+    Merges per-chunk extraction results into one, deduplicating deals and their child records.
+    The results are left untouched (they may be held by the extraction cache); the
+    merged deals are copies. Validation reports are tagged with the number of their
+    chunk, and the ``deal_index`` of a salvaged deal is re-pointed at the merged list.
+    :param results: List of extraction dicts with a ``hot_deals`` list.
+    :return: Dict with the merged ``hot_deals`` list (and any chunk ``validation_errors``).
+    """
+    merged = {}
+    validation_errors = []
+    for number, result in enumerate(results):
+        hot_deals = result.get("hot_deals", [])
+        for hot_deal in hot_deals:
+            key = deal_key(hot_deal)
+            if key not in merged:
+                merged[key] = copy.deepcopy(hot_deal)
+                continue
+            existing = merged[key]
+            for field in ("deal_inclusions", "meal_plans", "special_offers", "wedding_packages"):
+                seen = {json.dumps(item, sort_keys=True) for item in existing.get(field, [])}
+                for item in hot_deal.get(field, []):
+                    marker = json.dumps(item, sort_keys=True)
+                    if marker not in seen:
+                        existing.setdefault(field, []).append(copy.deepcopy(item))
+                        seen.add(marker)
+        positions = {key: position for position, key in enumerate(merged)}
+        for report in result.get("validation_errors", []):
+            report = dict(report, chunk=number)
+            if report.get("deal_index") is not None:
+                report["deal_index"] = positions[deal_key(hot_deals[report["deal_index"]])]
+            validation_errors.append(report)
+    data = {"hot_deals": list(merged.values())}
+    if validation_errors:
+        data["validation_errors"] = validation_errors
+    return data
+
+
+def extract_hot_deals_chunked(client, file_bytes, display_name="Uploaded PDF", prompt=None, model=None,
+                              min_pages=CHUNKING_MIN_PAGES, max_workers=4, max_pages_per_chunk=6, max_context_pages=4,
+                              page_texts=None):
+    """
+    Extracts hot deals from a large contract by sending only its relevant pages,
+    in parallel chunks. Contracts shorter than ``min_pages``, or where no offer or
+    wedding pages can be identified locally, are extracted whole.
+    :param client: GoogleGeminiClient used for the extraction.
+    :param file_bytes: Bytes of the PDF file.
+    :param display_name: Display name for the uploaded file(s).
+    :param prompt: The prompt to use for extraction.
+    :param model: The Gemini model to use.
+    :param min_pages: Page count from which chunking is used.
+    :param max_workers: Maximum chunks extracted concurrently.
+    :param max_pages_per_chunk: Maximum offer/wedding pages per chunk.
+    :param max_context_pages: Maximum rate/meal-plan pages attached to every chunk.
+    :param page_texts: The PDF's page texts, if already extracted.
+    :return: The extracted data as a dict.
+    """
+    cached = client.cached_hot_deal_packages(file_bytes, prompt=prompt, model=model)
+    if cached is not None:
+        return cached
+
+    if page_texts is None:
+        page_texts = extract_page_texts(file_bytes)
+    chunks = plan_chunks(score_pages(page_texts), max_pages_per_chunk, max_context_pages) \
+        if len(page_texts) >= min_pages else []
+    if not chunks:
+        return client.extract_hot_deal_packages_from_bytes(file_bytes, display_name=display_name,
+                                                           prompt=prompt, model=model)
+
+    def extract_chunk(numbered_chunk):
+        number, pages = numbered_chunk
+        # A failed chunk is reported with the others' results instead of discarding them
+        try:
+            return client.extract_hot_deal_packages_from_bytes(
+                build_sub_pdf(file_bytes, pages),
+                display_name=f"{display_name} (part {number + 1}/{len(chunks)})",
+                prompt=prompt,
+                model=model,
+            )
+        except Exception as e:
+            return {"error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(extract_chunk, enumerate(chunks)))
+
+    errors = [result for result in results if "error" in result]
+    if len(errors) == len(results):
+        return errors[0]
+    data = merge_hot_deals(results)
+    if errors:
+        data["chunk_errors"] = [error["error"] for error in errors]
+    else:
+        client.store_hot_deal_packages(file_bytes, data, prompt=prompt, model=model)
+    return data
@@ -0,0 +1,171 @@
+"""
+Vectorized post-processing and consistency checks for extracted hot deals.
+
+The ``hot_deals`` of one or many contracts are loaded into a single DataFrame;
+derived pricing is recomputed and the prompt's business rules (prices, validity
+and travel date ranges, night ranges) are checked as column operations, in one
+pass. Violations are flagged per deal and can optionally be fixed in place.
+"""
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ["original_display_price", "discounted_display_price", "savings_percentage"]
+NIGHT_COLUMNS = ["minimum_nights", "maximum_nights"]
+DATE_COLUMNS = ["valid_from", "valid_until", "booking_deadline", "travel_dates_from", "travel_dates_until"]
+DATE_FORMAT = "%Y-%m-%d"
+
+# Absolute difference (percentage points) tolerated between stated and recomputed savings
+SAVINGS_TOLERANCE = 0.5
+
+ISSUE_FLAGS = [
+    "price_missing",
+    "price_inverted",
+    "savings_mismatch",
+    "date_invalid",
+    "validity_inverted",
+    "travel_inverted",
+    "booking_after_validity",
+    "nights_inverted",
+    "nights_fractional",
+]
+
+# (start, end) column pairs swapped when fixing an inverted range
+SWAPPABLE_PAIRS = {
+    "price_inverted": ("discounted_display_price", "original_display_price"),
+    "validity_inverted": ("valid_from", "valid_until"),
+    "travel_inverted": ("travel_dates_from", "travel_dates_until"),
+    "nights_inverted": ("minimum_nights", "maximum_nights"),
+}
+
+
+def deals_frame(results):
+    """
+    Loads the deals of one or many extractions into one DataFrame.
+    :param results: An extraction dict (``{"hot_deals": [...]}``), a list of them, or a
+                    dict mapping contract ids to them.
+    :return: Tuple of (DataFrame with ``contract`` and ``deal_index`` columns, list of the
+             underlying deal dicts aligned with the frame's rows).
+    """
+    if isinstance(results, dict) and "hot_deals" in results:
+        results = {None: results}
+    elif not isinstance(results, dict):
+        results = dict(enumerate(results))
+
+    deals, contracts, indexes = [], [], []
+    for contract, data in results.items():
+        for index, hot_deal in enumerate(data.get("hot_deals", [])):
+            deals.append(hot_deal)
+            contracts.append(contract)
+            indexes.append(index)
+
+    columns = PRICE_COLUMNS + NIGHT_COLUMNS + DATE_COLUMNS
+    frame = pd.DataFrame.from_records(
+        [[hot_deal.get(column) for column in columns] for hot_deal in deals],
+        columns=columns,
+    )
+    frame.insert(0, "contract", contracts)
+    frame.insert(1, "deal_index", indexes)
+    return frame, deals
+
+
+def check_deals(frame, fix=False):
+    """
+    Recomputes derived pricing and flags rule violations, column-wise.
+    :param frame: DataFrame from deals_frame.
+    :param fix: Swap inverted ranges and overwrite savings_percentage with the recomputed value.
+    :return: New DataFrame with typed columns, ``recomputed_savings``, one boolean column per
+             ISSUE_FLAGS entry, ``has_issues`` and an ``issues`` column listing the flags
+             raised per deal.
+    """
+    checked = frame.copy()
+    for column in PRICE_COLUMNS:
+        checked[column] = pd.to_numeric(checked[column], errors="coerce").astype("float64")
+    for column in NIGHT_COLUMNS:
+        # Float, so a fractional night count from the model does not break the swap below
+        checked[column] = pd.to_numeric(checked[column], errors="coerce").astype("float64")
+    raw_dates = checked[DATE_COLUMNS]
+    for column in DATE_COLUMNS:
+        checked[column] = pd.to_datetime(checked[column], format=DATE_FORMAT, errors="coerce")
+
+    original = checked["original_display_price"]
+    discounted = checked["discounted_display_price"]
+    checked["recomputed_savings"] = ((original - discounted) / original * 100).round(2)
+    checked.loc[~(original > 0), "recomputed_savings"] = np.nan
+
+    checked["price_missing"] = original.isna() | discounted.isna() | ~(original > 0)
+    checked["price_inverted"] = discounted >= original
+    checked["savings_mismatch"] = (
+        ~checked["price_missing"]
+        & ~checked["price_inverted"]
+        & ~((checked["savings_percentage"] - checked["recomputed_savings"]).abs() <= SAVINGS_TOLERANCE)
+    )
+    checked["date_invalid"] = (checked[DATE_COLUMNS].isna() & raw_dates.notna()).any(axis=1)
+    checked["validity_inverted"] = checked["valid_from"] > checked["valid_until"]
+    checked["travel_inverted"] = checked["travel_dates_from"] > checked["travel_dates_until"]
+    checked["booking_after_validity"] = checked["booking_deadline"] > checked["valid_until"]
+    checked["nights_inverted"] = checked["minimum_nights"] > checked["maximum_nights"]
+    nights = checked[NIGHT_COLUMNS]
+    checked["nights_fractional"] = (nights.notna() & (nights % 1 != 0)).any(axis=1)
+
+    flags = checked[ISSUE_FLAGS].to_numpy()
+    checked["has_issues"] = flags.any(axis=1)
+    names = np.array(ISSUE_FLAGS, dtype=object)
+    checked["issues"] = [list(names[row]) if any_issue else [] for row, any_issue in zip(flags, checked["has_issues"])]
+
+    if fix:
+        for flag, (start, end) in SWAPPABLE_PAIRS.items():
+            mask = checked[flag]
+            if flag == "nights_inverted":
+                # Fractional night counts are only reported; which value was meant is unclear
+                mask = mask & ~checked["nights_fractional"]
+            checked.loc[mask, [start, end]] = checked.loc[mask, [end, start]].to_numpy()
+        # Prices may have been swapped above, so savings are derived again from the fixed columns
+        original = checked["original_display_price"]
+        recomputed = ((original - checked["discounted_display_price"]) / original * 100).round(2)
+        valid = original > 0
+        checked.loc[valid, "recomputed_savings"] = recomputed[valid]
+        checked.loc[valid, "savings_percentage"] = recomputed[valid]
+    return checked
+
+
+def apply_fixes(checked, deals):
+    """
+    Writes fixed values back into the deal dicts, touching only deals that had issues.
+    :param checked: Output of check_deals(..., fix=True).
+    :param deals: Deal dicts aligned with the frame's rows (from deals_frame).
+    :return: Number of deals updated.
+    """
+    changed = checked["has_issues"]
+    if not changed.any():
+        return 0
+    columns = PRICE_COLUMNS + NIGHT_COLUMNS + DATE_COLUMNS
+    rows = checked.loc[changed, columns].copy()
+    for column in DATE_COLUMNS:
+        rows[column] = rows[column].dt.strftime(DATE_FORMAT)
+    for column in NIGHT_COLUMNS:
+        # Fractional counts become missing here, so the model's value is left in place
+        rows[column] = rows[column].where(rows[column] % 1 == 0).astype("Int64")
+    rows = rows.astype(object).where(rows.notna(), None)
+
+    for position, values in zip(np.flatnonzero(changed.to_numpy()), rows.to_dict("records")):
+        hot_deal = deals[position]
+        for column, value in values.items():
+            # Unparseable values stay as the model produced them for a human to fix
+            if value is not None:
+                hot_deal[column] = value.item() if isinstance(value, np.generic) else value
+    return int(changed.sum())
+
+
+def postprocess_hot_deals(results, fix=False):
+    """
+    Checks (and optionally fixes in place) the deals of one or many extractions.
+    :param results: Same as deals_frame.
+    :param fix: Apply fixes to the deal dicts.
+    :return: DataFrame report of the deals that raised at least one issue.
+    """
+    frame, deals = deals_frame(results)
+    checked = check_deals(frame, fix=fix)
+    if fix:
+        apply_fixes(checked, deals)
+    flagged = checked[checked["has_issues"]]
+    return flagged[["contract", "deal_index", "issues"] + PRICE_COLUMNS + ["recomputed_savings"]]
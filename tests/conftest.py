@@ -0,0 +1,68 @@
+import copy
+import os
+import sys
+
+import pytest
+
+# Modules under src/ import each other as top-level modules, as when the app is run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from benchmark import SAMPLE_DEAL  # noqa: E402
+from clients.backends import FakeBackend  # noqa: E402
+from clients.extraction_cache import ExtractionCache  # noqa: E402
+from clients.file_registry import FileRegistry  # noqa: E402
+from clients.google_client import GoogleGeminiClient  # noqa: E402
+from clients.scheduler import RequestScheduler  # noqa: E402
+
+
+def text_pdf(pages):
+    """
+    Builds a minimal PDF whose pages hold the given lines of extractable text.
+    :param pages: List of pages, each a list of text lines.
+    :return: Bytes of the PDF file.
+    """
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines]
+        stream = "BT /F1 9 Tf 40 760 Td 11 TL " + " ".join(f"({line}) '" for line in escaped) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R "
+                       "/Resources << /Font << /F1 3 0 R >> >> >>")
+        kids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>"
+    output, offsets = "%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n" + "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return output.encode("latin-1")
+
+
+def make_deal(name="Stay 7 Pay 5 Island Escape", hotel="Coral Coast Resort", **fields):
+    """
+    Returns a copy of the benchmark's sample deal with another name, hotel and fields.
+    """
+    hot_deal = copy.deepcopy(SAMPLE_DEAL)
+    hot_deal["name"] = name
+    hot_deal["hotel"]["name"] = hotel
+    hot_deal.update(fields)
+    return hot_deal
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    """
+    Builds GoogleGeminiClients on a FakeBackend, with a cache and file registry under tmp_path.
+    """
+    def build(responses, scheduler=None, **backend_options):
+        backend = FakeBackend(responses, **backend_options)
+        return GoogleGeminiClient(
+            backend=backend,
+            cache=ExtractionCache(str(tmp_path / "cache")),
+            file_registry=FileRegistry(backend.get_file, backend.delete_file, path=str(tmp_path / "files.json")),
+            scheduler=scheduler if scheduler is not None else RequestScheduler(hedging=False, seed=0),
+        )
+    return build
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from batch_extract import find_contracts, load_completed, run_batch
+from benchmark import synthetic_response
+from conftest import text_pdf
+
+
+@pytest.fixture
+def contracts(tmp_path):
+    folder = tmp_path / "contracts"
+    (folder / "nested").mkdir(parents=True)
+    paths = []
+    for i, name in enumerate(["a.pdf", "b.PDF", "nested/c.pdf"]):
+        path = folder / name
+        path.write_bytes(text_pdf([[f"Contract {i}", "Special offer: stay 7 pay 5"]]))
+        paths.append(str(path))
+    (folder / "notes.txt").write_text("not a contract")
+    return folder, sorted(paths)
+
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_find_contracts_in_folder_and_manifest(contracts, tmp_path):
+    folder, paths = contracts
+    assert find_contracts(str(folder)) == paths
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# contracts\ncontracts/a.pdf\n\n" + paths[2] + "\n")
+    assert find_contracts(str(manifest)) == [str(tmp_path / "contracts" / "a.pdf"), paths[2]]
+
+
+def test_run_batch_writes_every_contract(make_client, contracts, tmp_path):
+    _, paths = contracts
+    output = str(tmp_path / "out.jsonl")
+    summary = run_batch(make_client([synthetic_response(2)]), paths, output, concurrency=2, log=lambda _: None)
+    assert (summary["ok"], summary["error"], summary["skipped"]) == (3, 0, 0)
+    records = read_records(output)
+    assert sorted(record["path"] for record in records) == paths
+    assert all(len(record["result"]["hot_deals"]) == 2 for record in records)
+
+
+def test_rerun_skips_completed_contracts_and_retries_failures(make_client, contracts, tmp_path):
+    _, paths = contracts
+    output = tmp_path / "out.jsonl"
+    client = make_client([synthetic_response(1)])
+    run_batch(client, paths[:2], str(output), log=lambda _: None)
+    # An interrupted run leaves a partial last line and a failed contract
+    with open(output, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"path": paths[2], "sha256": "x", "status": "error", "error": "quota"}) + "\n")
+        f.write('{"path": "partial')
+    assert len(load_completed(str(output))) == 2
+
+    generated = client.backend.calls["generate"]
+    summary = run_batch(client, paths, str(output), log=lambda _: None)
+    assert (summary["ok"], summary["skipped"]) == (1, 2)
+    assert client.backend.calls["generate"] > generated
+    assert len(load_completed(str(output))) == 3
+
+
+def test_failed_extraction_is_recorded_as_error(make_client, contracts, tmp_path):
+    _, paths = contracts
+    output = str(tmp_path / "out.jsonl")
+    summary = run_batch(make_client(["not json at all"]), paths[:1], output, log=lambda _: None)
+    assert summary["error"] == 1
+    assert read_records(output)[0]["status"] == "error"
+    assert load_completed(output) == set()
@@ -0,0 +1,62 @@
+import json
+
+from compact_models import CompactDeals
+from conftest import make_deal
+
+
+def extraction(*hot_deals):
+    return json.loads(json.dumps({"hot_deals": list(hot_deals)}))
+
+
+def test_extraction_round_trip():
+    data = extraction(make_deal("A"), make_deal("B", hotel="Lagoon Lodge", wedding_packages=[]),
+                      make_deal("C", notes="kept as an extra field"))
+    compact = CompactDeals.from_extraction(data, source="contract.pdf")
+    assert compact.to_extraction() == data
+    assert len(compact.hotels["name"]) == 2
+
+
+def test_dict_round_trip_survives_json():
+    data = extraction(make_deal("A"), make_deal("B"))
+    compact = CompactDeals.from_extraction(data, source="a.pdf")
+    compact.add_extraction(extraction(make_deal("C")), source="b.pdf")
+    loaded = CompactDeals.from_dict(json.loads(json.dumps(compact.to_dict())))
+    assert loaded.to_extraction() == compact.to_extraction()
+    assert loaded.to_extraction(source="b.pdf") == extraction(make_deal("C"))
+
+
+def test_repeated_deal_does_not_duplicate_children():
+    data = extraction(make_deal("A"))
+    compact = CompactDeals.from_dict(json.loads(json.dumps(CompactDeals.from_extraction(data).to_dict())))
+    assert compact.add_extraction(data) == [0]
+    assert len(compact) == 1
+    assert {collection: len(records) for collection, records in compact.children.items()} \
+        == {"deal_inclusions": 2, "meal_plans": 1, "special_offers": 1, "wedding_packages": 0}
+    assert compact.to_extraction() == data
+
+
+def test_repeated_deal_adds_only_new_children():
+    compact = CompactDeals.from_extraction(extraction(make_deal("A")))
+    compact.add_extraction(extraction(make_deal("A", meal_plans=[{"name": "Full board"}])))
+    assert [plan["name"] for plan in compact.to_extraction()["hot_deals"][0]["meal_plans"]] \
+        == ["Half board", "Full board"]
+
+
+def test_packages_share_hotels_and_deals():
+    compact = CompactDeals.from_extraction(extraction(make_deal("A"), make_deal("B")))
+    first, second = compact.to_packages()
+    assert first.hot_deal.hotel is second.hot_deal.hotel
+    assert all(inclusion.hot_deal is first.hot_deal for inclusion in first.deal_inclusions)
+    assert CompactDeals.from_packages([first, second]).to_extraction() == compact.to_extraction()
+
+
+def test_packages_and_extractions_intern_the_same_deals():
+    data = extraction(make_deal("A"), make_deal("B"))
+    packages = CompactDeals.from_extraction(data).to_packages()
+    compact = CompactDeals.from_packages(packages)
+    assert compact.add_extraction(data) == [0, 1]
+    assert len(compact) == 2 and len(compact.children["meal_plans"]) == 2
+    # And the other way round, after a trip through to_dict
+    loaded = CompactDeals.from_dict(json.loads(json.dumps(CompactDeals.from_extraction(data).to_dict())))
+    assert [loaded.add_package(package) for package in packages] == [0, 1]
+    assert loaded.to_extraction() == data
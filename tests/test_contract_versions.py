@@ -0,0 +1,146 @@
+import json
+
+import pytest
+
+from benchmark import synthetic_response
+from conftest import make_deal, text_pdf
+from contract_versions import (
+    ContractVersionStore,
+    extract_contract_version,
+    merge_revision,
+    page_fingerprints,
+    plan_sections,
+)
+from pdf_preprocess import score_pages
+
+COVER = ["Coral Coast Resort", "Contract 2026"]
+OFFER = ["Special offer: stay 7 pay 5, early bird discount"]
+RATES = ["Rates per night in FJD: double 420, single 380"]
+TERMS = ["General terms and conditions"]
+
+
+def fingerprints_of(texts):
+    return [f"page-{i}-{text}" for i, text in enumerate(texts)]
+
+
+def test_merge_revision_keeps_edits_where_the_contract_did_not_change():
+    base = [make_deal("A", description="old"), make_deal("B"), make_deal("C")]
+    edited = [dict(base[0], marketing_headline="My headline"), dict(base[1], description="Edited"), base[2]]
+    fresh = [make_deal("A", description="new"), make_deal("B"), make_deal("D")]
+
+    merged, counts = merge_revision(base, edited, fresh)
+    assert counts == {"kept": 1, "updated": 1, "added": 1, "removed": 1}
+    assert merged[0]["description"] == "new"
+    assert merged[0]["marketing_headline"] == "My headline"
+    assert merged[1]["description"] == "Edited"
+    assert merged[2]["name"] == "D"
+
+
+def test_merge_revision_does_not_share_objects_with_its_inputs():
+    base = [make_deal("A")]
+    fresh = [make_deal("A", meal_plans=[{"name": "Full board"}]), make_deal("B")]
+    merged, _ = merge_revision(base, None, fresh)
+    merged[0]["meal_plans"].append({"name": "changed"})
+    merged[1]["hotel"]["name"] = "changed"
+    assert fresh[0]["meal_plans"] == [{"name": "Full board"}]
+    assert fresh[1]["hotel"]["name"] == "Coral Coast Resort"
+
+
+def test_plan_sections_keeps_short_contracts_whole():
+    texts = [" ".join(COVER)] + [" ".join(OFFER)] * 3 + [" ".join(RATES)]
+    sections = plan_sections(score_pages(texts), fingerprints_of(texts), min_pages=20)
+    assert [section["pages"] for section in sections] == [[0, 1, 2, 3, 4]]
+
+
+def test_plan_sections_attaches_cover_and_context_pages():
+    texts = [" ".join(COVER)] + [" ".join(OFFER)] * 3 + [" ".join(TERMS)] * 10 + [" ".join(OFFER)] * 2 \
+        + [" ".join(RATES)] + [" ".join(TERMS)] * 10
+    sections = plan_sections(score_pages(texts), fingerprints_of(texts), max_pages_per_section=2, min_pages=20)
+    assert [section["pages"] for section in sections] == [[0, 1, 2, 16], [0, 3, 16], [0, 14, 15, 16]]
+
+
+def test_plan_sections_fingerprints_follow_their_pages():
+    texts = [" ".join(COVER)] + [" ".join(OFFER)] * 2 + [" ".join(TERMS)] * 10 + [" ".join(OFFER)] \
+        + [" ".join(TERMS)] * 10
+    fingerprints = fingerprints_of(texts)
+    before = plan_sections(score_pages(texts), fingerprints, max_pages_per_section=2, min_pages=20)
+    fingerprints[13] = "changed"
+    after = plan_sections(score_pages(texts), fingerprints, max_pages_per_section=2, min_pages=20)
+    assert before[0]["fingerprint"] == after[0]["fingerprint"]
+    assert before[1]["fingerprint"] != after[1]["fingerprint"]
+
+
+def test_plan_sections_without_deal_pages_is_one_section():
+    texts = [" ".join(TERMS)] * 25
+    assert [section["pages"] for section in plan_sections(score_pages(texts), fingerprints_of(texts))] \
+        == [list(range(25))]
+
+
+def record(contract_id, pages, hotel):
+    return {"contract_id": contract_id, "version": 1, "pages": pages, "hot_deals": [make_deal(hotel=hotel)]}
+
+
+def test_find_previous_requires_the_same_hotel_or_cover(tmp_path):
+    store = ContractVersionStore(str(tmp_path))
+    store.save(record("a", ["cover-a", "offer-a", "terms-1", "terms-2"], "Ocean Resort"))
+    # Shares half of its pages (boilerplate), but is another hotel's contract
+    assert store.find_previous(["cover-b", "offer-b", "terms-1", "terms-2"], ["Coral Inn", "", "", ""]) is None
+    assert store.find_previous(["cover-a2", "offer-a", "terms-1", "terms-2"], ["OCEAN  Resort", "", "", ""]) == "a"
+    assert store.find_previous(["cover-a", "offer-a2", "terms-1", "terms-3"]) == "a"
+
+
+def test_find_previous_ignores_pages_shared_by_several_contracts(tmp_path):
+    store = ContractVersionStore(str(tmp_path))
+    store.save(record("a", ["cover-a", "offer-a", "terms-1", "terms-2"], "Ocean Resort"))
+    store.save(record("b", ["cover-b", "offer-b", "terms-1", "terms-2"], "Coral Inn"))
+    # Only the boilerplate matches, even though the upload names the hotel
+    assert store.find_previous(["cover-c", "offer-c", "terms-1", "terms-2"], ["Ocean Resort"]) is None
+    assert store.find_previous(["cover-a", "offer-a", "terms-1", "terms-2", "new"]) == "a"
+
+
+@pytest.fixture
+def contract_pdfs():
+    def build(offer):
+        return text_pdf([COVER, [offer], RATES, TERMS])
+    return build
+
+
+def test_revision_reuses_the_previous_version(make_client, contract_pdfs, tmp_path):
+    client = make_client([synthetic_response(2)])
+    store = ContractVersionStore(str(tmp_path / "versions"))
+    first = extract_contract_version(client, contract_pdfs(OFFER[0]), store, display_name="v1.pdf")
+    assert first["revision"]["version"] == 1
+    edited = json.loads(json.dumps(first["hot_deals"]))
+    edited[0]["marketing_headline"] = "Edited headline"
+    store.save_edits(first["revision"]["contract_id"], edited)
+
+    second = extract_contract_version(client, contract_pdfs("Special offer: stay 7 pay 4"), store,
+                                      display_name="v2.pdf")
+    revision = second["revision"]
+    assert (revision["contract_id"], revision["version"], revision["changed_pages"]) \
+        == (first["revision"]["contract_id"], 2, [1])
+    assert revision["deals"] == {"kept": 2, "updated": 0, "added": 0, "removed": 0}
+    assert second["hot_deals"][0]["marketing_headline"] == "Edited headline"
+
+
+def test_another_hotels_contract_is_stored_as_new(make_client, tmp_path):
+    store = ContractVersionStore(str(tmp_path / "versions"))
+    first = extract_contract_version(make_client([synthetic_response(1)]), text_pdf([COVER, OFFER, RATES, TERMS]),
+                                     store)
+    # Matched by name and shared pages, but the extraction finds another hotel
+    other_client = make_client([json.dumps({"hot_deals": [make_deal(hotel="Lagoon Lodge")]})])
+    other = extract_contract_version(other_client,
+                                     text_pdf([["Lagoon Lodge, sister of Coral Coast Resort"], ["2 for 1 offer"],
+                                               RATES, TERMS]),
+                                     store)
+    assert other["revision"]["contract_id"] != first["revision"]["contract_id"]
+    assert other["revision"]["version"] == 1
+    assert "deals" not in other["revision"]
+    assert store.latest(first["revision"]["contract_id"])["version"] == 1
+
+
+def test_page_fingerprints_ignore_layout(contract_pdfs):
+    texts, fingerprints = page_fingerprints(contract_pdfs(OFFER[0]))
+    assert len(texts) == 4
+    _, reflowed = page_fingerprints(text_pdf([[" ".join(COVER)], OFFER, RATES, TERMS]))
+    assert reflowed[0] == fingerprints[0]
@@ -0,0 +1,116 @@
+import pytest
+
+import deal_store
+from conftest import make_deal
+from deal_store import DealStore
+
+
+def lagoon_deal(name="Winter Escape", **fields):
+    hot_deal = make_deal(name, hotel="Lagoon Lodge", deal_type="seasonal", minimum_nights=2, maximum_nights=5,
+                         travel_dates_from="2026-06-01", travel_dates_until="2026-08-31",
+                         valid_from="2026-03-01", valid_until="2026-07-31", booking_deadline=None,
+                         discounted_display_price=900.0, savings_percentage=10.0, **fields)
+    hot_deal["hotel"].update(address="Lagoon Road", rating=3.0)
+    return hot_deal
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DealStore(str(tmp_path / "deals.sqlite"))
+    store.upsert_extraction({"hot_deals": [make_deal("Stay 7 Pay 5"), make_deal("Stay 14 Pay 10",
+                                                                              discounted_display_price=3000.0,
+                                                                              savings_percentage=30.0,
+                                                                              travel_dates_from="2026-02-01")]},
+                              "coral")
+    store.upsert_extraction({"hot_deals": [lagoon_deal()]}, "lagoon")
+    yield store
+    store.close()
+
+
+def names(deals):
+    return [hot_deal["name"] for hot_deal in deals]
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({}, ["Stay 14 Pay 10", "Stay 7 Pay 5", "Winter Escape"]),
+    ({"check_in": "2026-07-01", "nights": 3}, ["Winter Escape"]),
+    ({"check_in": "2026-08-30", "nights": 3}, []),
+    ({"check_in": "2026-07-01", "nights": 7}, ["Stay 14 Pay 10", "Stay 7 Pay 5"]),
+    ({"check_in": "2026-12-15"}, ["Stay 14 Pay 10", "Stay 7 Pay 5"]),
+    ({"booked_on": "2026-12-15"}, []),
+    ({"booked_on": "2026-08-15"}, ["Stay 14 Pay 10", "Stay 7 Pay 5"]),
+    ({"booked_on": "2026-04-01"}, ["Stay 14 Pay 10", "Stay 7 Pay 5", "Winter Escape"]),
+    ({"min_rating": 4}, ["Stay 14 Pay 10", "Stay 7 Pay 5"]),
+    ({"max_rating": 4}, ["Winter Escape"]),
+    ({"hotel": "lagoon"}, ["Winter Escape"]),
+    ({"deal_type": "extended_stay"}, ["Stay 14 Pay 10", "Stay 7 Pay 5"]),
+    ({"max_price": 2500}, ["Stay 7 Pay 5", "Winter Escape"]),
+    ({"contract": "coral", "max_price": 2500}, ["Stay 7 Pay 5"]),
+])
+def test_query_filters(store, filters, expected):
+    assert names(store.query_deals(**filters)) == expected
+
+
+@pytest.mark.parametrize("order_by, expected", [
+    ("price", ["Winter Escape", "Stay 7 Pay 5", "Stay 14 Pay 10"]),
+    ("travel", ["Stay 7 Pay 5", "Stay 14 Pay 10", "Winter Escape"]),
+])
+def test_query_order_and_limit(store, order_by, expected):
+    assert names(store.query_deals(order_by=order_by)) == expected
+    assert names(store.query_deals(order_by=order_by, limit=1)) == expected[:1]
+
+
+def test_query_by_rating(store):
+    assert [hot_deal["hotel"]["rating"] for hot_deal in store.query_deals(order_by="rating")] == [4.5, 4.5, 3.0]
+
+
+def test_range_queries_agree_when_walking_the_index(store, monkeypatch):
+    filters = {"check_in": "2026-07-01", "nights": 3, "booked_on": "2026-04-01"}
+    expected = names(store.query_deals(**filters))
+    monkeypatch.setattr(deal_store, "RANGE_PROBE_ROWS", 1)
+    assert names(store.query_deals(**filters)) == expected == ["Winter Escape"]
+
+
+def test_query_returns_hotel_and_children(store):
+    hot_deal = store.query_deals(hotel="coral", order_by="price", include_children=True)[0]
+    expected = make_deal("Stay 7 Pay 5")
+    assert hot_deal["contract"] == "coral"
+    assert hot_deal["hotel"] == expected["hotel"]
+    assert hot_deal["meal_plans"] == expected["meal_plans"]
+    assert [item["title"] for item in hot_deal["deal_inclusions"]] == ["Daily breakfast", "Sunset cruise"]
+
+
+def test_upsert_updates_in_place_and_replaces_stale_deals(store):
+    assert store.upsert_extraction({"hot_deals": [make_deal("Stay 7 Pay 5", meal_plans=[])]}, "coral") == 1
+    assert names(store.query_deals(contract="coral", include_children=True)) == ["Stay 7 Pay 5"]
+    assert store.stats()["meal_plans"] == 1
+
+    store.upsert_extraction({"hot_deals": [make_deal("Stay 3 Pay 2")]}, "coral", replace=False)
+    assert names(store.query_deals(contract="coral", order_by="travel")) == ["Stay 7 Pay 5", "Stay 3 Pay 2"]
+
+
+def test_hotels_no_deal_references_are_deleted(store):
+    store.upsert_extraction({"hot_deals": [make_deal("Stay 7 Pay 5", hotel="Renamed Resort")]}, "coral")
+    assert [hotel["name"] for hotel in store._connection.execute("SELECT name FROM hotels ORDER BY name")] \
+        == ["Lagoon Lodge", "Renamed Resort"]
+
+    assert store.delete_contract("lagoon") == 1
+    stats = store.stats()
+    assert (stats["hotels"], stats["deals"]) == (1, 1)
+    assert store.query_deals(hotel="lagoon") == []
+
+
+def test_shared_hotels_are_kept(store):
+    store.upsert_extraction({"hot_deals": [make_deal("Other contract deal")]}, "coral-2")
+    store.delete_contract("coral")
+    assert store.stats()["hotels"] == 2
+    assert names(store.query_deals(hotel="coral")) == ["Other contract deal"]
+
+
+def test_extraction_without_deals_replaces_the_contract(store):
+    assert store.upsert_extraction({"hot_deals": []}, "lagoon", replace=False) == 0
+    assert store.stats()["deals"] == 3
+    assert store.upsert_many([("lagoon", {"hot_deals": []}), ("coral", {"hot_deals": [make_deal("Stay 7 Pay 5")]})]) == 1
+    stats = store.stats()
+    assert (stats["hotels"], stats["deals"]) == (1, 1)
+    assert names(store.query_deals()) == ["Stay 7 Pay 5"]
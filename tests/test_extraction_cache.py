@@ -0,0 +1,89 @@
+import os
+import time
+
+from benchmark import synthetic_response
+from clients.extraction_cache import ExtractionCache, make_cache_key
+from conftest import make_deal
+from pdf_preprocess import merge_hot_deals
+
+
+def test_get_returns_copies(tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    cache.set("key", {"hot_deals": [make_deal()]})
+    cache.get("key")["hot_deals"][0]["name"] = "changed"
+    assert cache.get("key")["hot_deals"][0]["name"] == make_deal()["name"]
+    assert cache.stats()["memory_hits"] == 2
+
+
+def test_set_does_not_keep_a_reference_to_the_value(tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    value = {"hot_deals": [make_deal()]}
+    cache.set("key", value)
+    value["hot_deals"].clear()
+    assert len(cache.get("key")["hot_deals"]) == 1
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    ExtractionCache(str(tmp_path)).set("key", {"hot_deals": []})
+    cache = ExtractionCache(str(tmp_path))
+    assert cache.get("key") == {"hot_deals": []}
+    assert cache.get("missing") is None
+    assert (cache.stats()["disk_hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_disk_size_is_tracked_and_evicted_oldest_first(tmp_path):
+    value = {"text": "x" * 1000}
+    cache = ExtractionCache(str(tmp_path), max_memory_entries=1, max_disk_bytes=3500)
+    for i in range(3):
+        cache.set(f"key-{i}", value)
+        os.utime(cache._path(f"key-{i}"), (time.time() - 100 + i, time.time() - 100 + i))
+    size = os.path.getsize(cache._path("key-0"))
+    assert cache.stats()["disk_bytes"] == 3 * size
+    # Overwriting an entry does not count it twice
+    cache.set("key-2", value)
+    assert cache.stats()["disk_bytes"] == 3 * size
+
+    cache.set("key-3", value)
+    assert cache.get("key-0") is None
+    assert cache.get("key-3") == value
+    assert cache.stats()["disk_bytes"] == sum(os.path.getsize(entry.path) for entry in os.scandir(tmp_path))
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_memory_entries=0, max_age_seconds=60)
+    cache.set("key", {"hot_deals": []})
+    os.utime(cache._path("key"), (time.time() - 120, time.time() - 120))
+    assert cache.get("key") is None
+    assert cache.stats()["disk_bytes"] == 0
+
+
+def test_merge_hot_deals_leaves_its_inputs_untouched():
+    first = {"hot_deals": [make_deal(meal_plans=[{"name": "Half board"}])]}
+    report = {"index": 0, "salvaged": True, "errors": ["x"], "deal_index": 0}
+    second = {"hot_deals": [make_deal(meal_plans=[{"name": "Full board"}])], "validation_errors": [report]}
+    merged = merge_hot_deals([first, second])
+    assert [plan["name"] for plan in merged["hot_deals"][0]["meal_plans"]] == ["Half board", "Full board"]
+    assert merged["validation_errors"] == [dict(report, chunk=1)]
+    merged["hot_deals"][0]["meal_plans"][1]["name"] = "changed"
+    merged["hot_deals"][0]["hotel"]["name"] = "changed"
+    assert first["hot_deals"][0]["meal_plans"] == [{"name": "Half board"}]
+    assert first["hot_deals"][0]["hotel"]["name"] == "Coral Coast Resort"
+    assert second["hot_deals"][0]["meal_plans"] == [{"name": "Full board"}]
+    assert "chunk" not in report
+
+
+def test_client_results_do_not_share_the_cached_value(make_client):
+    client = make_client([synthetic_response(2)])
+    file_bytes = b"%PDF-1.4 contract"
+    first = client.extract_hot_deal_packages_from_bytes(file_bytes)
+    generated = client.backend.calls["generate"]
+    first["hot_deals"][0]["name"] = "changed"
+    assert client.cached_hot_deal_packages(file_bytes)["hot_deals"][0]["name"] != "changed"
+    assert client.extract_hot_deal_packages_from_bytes(file_bytes)["hot_deals"][0]["name"] != "changed"
+    assert client.backend.calls["generate"] == generated
+
+
+def test_cache_keys_depend_on_file_model_and_prompt():
+    keys = {make_cache_key(b"a", "pro", "p"), make_cache_key(b"b", "pro", "p"),
+            make_cache_key(b"a", "flash", "p"), make_cache_key(b"a", "pro", "q")}
+    assert len(keys) == 4
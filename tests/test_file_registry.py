@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from benchmark import synthetic_response
+from clients.backends import FakeBackend
+from clients.file_registry import FileRegistry
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend([synthetic_response(1)])
+
+
+def registry(backend, tmp_path, **options):
+    return FileRegistry(backend.get_file, backend.delete_file, path=str(tmp_path / "files.json"),
+                        poll_interval_seconds=0.01, **options)
+
+
+def upload(backend, registry, content):
+    remote_file = backend.upload(content, display_name="contract.pdf")
+    registry.register(f"digest-{content.decode()}", remote_file, display_name="contract.pdf")
+    return remote_file
+
+
+def test_clients_reuse_uploads_across_restarts(make_client, tmp_path):
+    client = make_client([synthetic_response(1)])
+    first = client.upload_pdf(b"%PDF-1.4 contract")
+    # A new process with the same registry file and remote storage
+    restarted = FileRegistry(client.backend.get_file, client.backend.delete_file, path=str(tmp_path / "files.json"))
+    client.file_registry = restarted
+    assert client.upload_pdf(b"%PDF-1.4 contract").name == first.name
+    assert client.backend.calls["upload"] == 1
+
+
+def test_expired_or_deleted_files_are_uploaded_again(backend, tmp_path):
+    files = registry(backend, tmp_path, expiry_margin_seconds=3600)
+    remote_file = upload(backend, files, b"a")
+    assert files.lookup("digest-a").name == remote_file.name
+
+    backend._files[remote_file.name].expiration_time = datetime.now(timezone.utc) + timedelta(minutes=30)
+    files.register("digest-a", backend._files[remote_file.name])
+    assert files.lookup("digest-a") is None
+
+    upload(backend, files, b"b")
+    backend.delete_file(files._entries["digest-b"]["name"])
+    assert files.lookup("digest-b") is None
+    assert "digest-b" not in files._load()
+
+
+def test_processing_files_are_awaited_and_failures_raise(backend, tmp_path):
+    files = registry(backend, tmp_path)
+    remote_file = backend.upload(b"c", display_name="c.pdf")
+    remote_file.state = SimpleNamespace(name="PROCESSING")
+    threading.Timer(0.05, lambda: setattr(remote_file, "state", SimpleNamespace(name="ACTIVE"))).start()
+    assert files.wait_until_active(remote_file).name == remote_file.name
+
+    remote_file.state = SimpleNamespace(name="FAILED")
+    with pytest.raises(RuntimeError):
+        files.wait_until_active(remote_file)
+
+
+def test_sweep_deletes_idle_files_only(backend, tmp_path):
+    files = registry(backend, tmp_path, idle_ttl_seconds=60)
+    idle, active = upload(backend, files, b"idle"), upload(backend, files, b"active")
+    entries = files._load()
+    entries["digest-idle"]["last_used"] = time.time() - 120
+    files._save(entries)
+
+    assert files.sweep() == [idle.name]
+    assert backend.calls["delete_file"] == 1
+    assert list(files._load()) == ["digest-active"]
+    assert files.lookup("digest-active").name == active.name
+
+
+def test_registries_sharing_a_file_keep_each_others_entries(backend, tmp_path):
+    app, batch = registry(backend, tmp_path), registry(backend, tmp_path)
+
+    def register_many(files, prefix):
+        for i in range(20):
+            upload(backend, files, f"{prefix}{i}".encode())
+    threads = [threading.Thread(target=register_many, args=(files, prefix))
+               for files, prefix in ((app, "app"), (batch, "batch"))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(tmp_path / "files.json", "r", encoding="utf-8") as f:
+        assert len(json.load(f)) == 40
+    # Each registry finds the other's uploads, and one's sweep keeps the other's live files
+    assert batch.lookup("digest-app0") is not None
+    app.sweep()
+    assert len(batch._load()) == 40
+    assert not list(tmp_path.glob("*.tmp"))
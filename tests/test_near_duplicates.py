@@ -0,0 +1,176 @@
+import random
+import sqlite3
+
+import numpy as np
+import pytest
+
+from conftest import text_pdf
+from near_duplicates import (
+    NearDuplicateIndex,
+    band_buckets,
+    deal_figures_digest,
+    deal_pages_digest,
+    estimate_similarity,
+    minhash_signature,
+    shingle_hashes,
+)
+
+WORDS = [f"word{i}" for i in range(2000)]
+
+
+def document(seed, length=600):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def edited(text, fraction, seed=0):
+    # Replaces a contiguous run of words, as a changed clause would
+    tokens = text.split()
+    start = random.Random(seed).randrange(len(tokens) // 2)
+    count = int(len(tokens) * fraction)
+    tokens[start:start + count] = [f"new{i}" for i in range(count)]
+    return " ".join(tokens)
+
+
+def jaccard(first, second):
+    first, second = set(shingle_hashes([first]).tolist()), set(shingle_hashes([second]).tolist())
+    return len(first & second) / len(first | second)
+
+
+@pytest.mark.parametrize("fraction", [0.02, 0.1, 0.3, 0.6])
+def test_similarity_estimate_is_close_to_jaccard(fraction):
+    text = document(1)
+    other = edited(text, fraction)
+    estimate = estimate_similarity(minhash_signature(shingle_hashes([text])), minhash_signature(shingle_hashes([other])))
+    assert estimate == pytest.approx(jaccard(text, other), abs=0.12)
+
+
+def test_shingles_ignore_case_layout_and_pagination():
+    text = document(2, 50)
+    pages = [text[:len(text) // 2], text[len(text) // 2:]]
+    reflowed = [pages[0].upper().replace(" ", "\n"), pages[1]]
+    assert np.array_equal(np.sort(shingle_hashes(pages)), np.sort(shingle_hashes(reflowed)))
+    assert minhash_signature(shingle_hashes([""])) is None
+
+
+def shared_bands(first, second):
+    return len(set(band_buckets(minhash_signature(shingle_hashes([first]))))
+               & set(band_buckets(minhash_signature(shingle_hashes([second])))))
+
+
+def test_lsh_makes_near_duplicates_candidates():
+    text = document(3)
+    assert shared_bands(text, text) == 20
+    assert shared_bands(text, edited(text, 0.02)) > 0
+    assert shared_bands(text, document(4)) == 0
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "index.sqlite"))
+    yield index
+    index.close()
+
+
+def test_query_applies_the_threshold(index):
+    text = document(5)
+    index.add("original", index.signature(page_texts=[text]), {"hot_deals": []})
+    close, far = index.signature(page_texts=[edited(text, 0.01)]), index.signature(page_texts=[edited(text, 0.5)])
+    assert [match["sha256"] for match in index.query(close, threshold=0.85)] == ["original"]
+    assert index.query(far, threshold=0.85) == []
+    assert index.query(close, threshold=0.85, exclude_sha256="original") == []
+
+
+def contract(cover, rates, terms):
+    return [[cover], ["Special offer: stay 7 pay 5, early bird discount"], [rates]] \
+        + [[terms[i:i + 90]] for i in range(0, len(terms), 90)]
+
+
+RATES = "Rates per night in FJD: double 420, single 380"
+
+
+def test_find_reuses_only_contracts_with_the_same_deal_pages(index):
+    terms = "Terms and conditions: " + document(6, 400)
+    original = text_pdf(contract("Coral Coast Resort 2026", RATES, terms))
+    index.add_contract(original, {"hot_deals": [{"name": "original"}]}, display_name="original.pdf")
+
+    new_cover = text_pdf(contract("Coral Coast Resort 2026 (re-issued)", RATES, terms))
+    match = index.find(new_cover)
+    assert match["display_name"] == "original.pdf"
+    assert match["result"] == {"hot_deals": [{"name": "original"}]}
+
+    new_rates = text_pdf(contract("Coral Coast Resort 2026", RATES.replace("420", "460"), terms))
+    assert index.query(index.signature(new_rates))
+    assert index.find(new_rates) is None
+    # The same bytes are left to the extraction cache
+    assert index.find(original) is None
+
+
+def prose(seed, length):
+    # Words without digits, so only the figures on a page are read as figures
+    rng = random.Random(seed)
+    return " ".join("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+                    for _ in range(length))
+
+
+def test_ocr_noise_on_deal_pages_does_not_block_reuse(index):
+    terms, offer = "Terms and conditions: " + document(9, 400), "Special offer: stay 7 pay 5. " + prose(10, 300)
+    index.add_contract(text_pdf(contract("Coral Coast Resort 2026", RATES, terms) + [[offer]]),
+                       {"hot_deals": [{"name": "original"}]}, display_name="original.pdf")
+
+    words = offer.split()
+    words[100] = words[100][::-1]
+    rescanned = text_pdf(contract("Coral Coast Resort 2026", RATES, terms) + [[" ".join(words)]])
+    match = index.find(rescanned)
+    assert match["display_name"] == "original.pdf"
+    assert not match["deal_pages_differ"] and match["deal_figures_match"]
+    assert 0.9 <= match["deal_pages_similarity"] < 1
+
+    # A changed rate is never reused, but can be shown to a user with the difference
+    new_rates = text_pdf(contract("Coral Coast Resort 2026", RATES.replace("420", "460"), terms) + [[offer]])
+    assert index.find(new_rates) is None
+    match = index.find(new_rates, include_differing=True)
+    assert match["deal_pages_differ"] and match["deal_figures_match"] is False
+    assert match["result"] == {"hot_deals": [{"name": "original"}]}
+
+
+def test_deal_pages_digest_ignores_other_pages():
+    pages = ["Cover", "Special offer: stay 7 pay 5", RATES, "Terms and conditions"]
+    assert deal_pages_digest(pages) == deal_pages_digest(["New cover"] + pages[1:3] + ["Other terms"])
+    assert deal_pages_digest(pages) != deal_pages_digest(pages[:2] + [RATES.replace("420", "460")] + pages[3:])
+    reworded = ["Cover", "Special offer: stay 7 nights, pay 5", RATES, "Terms and conditions"]
+    assert deal_figures_digest(reworded) == deal_figures_digest(pages)
+    assert deal_pages_digest(reworded) != deal_pages_digest(pages)
+    assert deal_figures_digest(pages) != deal_figures_digest(pages[:2] + [RATES.replace("420", "460")] + pages[3:])
+
+
+def test_old_indexes_are_migrated_and_never_reused(tmp_path):
+    path = str(tmp_path / "index.sqlite")
+    text = document(7)
+    index = NearDuplicateIndex(path)
+    index.add("old", index.signature(page_texts=[text]), {"hot_deals": []})
+    index.close()
+    with sqlite3.connect(path) as connection:
+        for column in ("deal_pages", "deal_figures", "deal_signature"):
+            connection.execute(f"ALTER TABLE contracts DROP COLUMN {column}")
+
+    index = NearDuplicateIndex(path, num_perm=60, bands=10)
+    assert (index.num_perm, index.bands) == (120, 20)
+    assert index.query(index.signature(page_texts=[text]))[0]["deal_pages"] is None
+    assert index.find(b"new upload", page_texts=[text]) is None
+    assert index.find(b"new upload", page_texts=[text], include_differing=True)["deal_pages_similarity"] is None
+    index.close()
+
+
+def test_indexes_from_other_hash_functions_are_emptied(tmp_path):
+    path = str(tmp_path / "index.sqlite")
+    index = NearDuplicateIndex(path)
+    index.add("old", index.signature(page_texts=[document(8)]), {"hot_deals": []})
+    index.close()
+    with sqlite3.connect(path) as connection:
+        connection.execute("DELETE FROM settings WHERE name = 'minhash_scheme'")
+
+    index = NearDuplicateIndex(path)
+    assert index.stats()["contracts"] == 0
+    assert index.query(index.signature(page_texts=[document(8)])) == []
+    index.close()
@@ -0,0 +1,97 @@
+import json
+
+from benchmark import synthetic_response
+from clients.google_client import marketing_copy_failures
+from clients.scheduler import RequestFailedError
+from conftest import make_deal, text_pdf
+from pdf_preprocess import extract_hot_deals_chunked, merge_hot_deals, plan_chunks, score_pages
+
+COVER = "Coral Coast Resort contract 2026"
+OFFER = "Special offer: stay 7 pay 5, early bird discount"
+RATES = "Rates per night in FJD: double 420, single 380"
+TERMS = "General terms and conditions"
+
+
+def contract_pages():
+    # Offers on pages 2-3 and 12, rates on page 20
+    return [COVER, TERMS, OFFER, OFFER] + [TERMS] * 8 + [OFFER] + [TERMS] * 7 + [RATES] + [TERMS] * 4
+
+
+def test_chunks_carry_the_cover_and_context_pages():
+    chunks = plan_chunks(score_pages(contract_pages()), max_pages_per_chunk=6)
+    assert chunks == [[0, 2, 3, 20], [0, 12, 20]]
+
+
+def test_long_runs_of_offer_pages_are_split():
+    pages = [COVER] + [OFFER] * 5 + [RATES]
+    assert plan_chunks(score_pages(pages), max_pages_per_chunk=2) == [[0, 1, 2, 6], [0, 3, 4, 6], [0, 5, 6]]
+    assert plan_chunks(score_pages(pages), max_pages_per_chunk=2, identity_pages=0)[0] == [1, 2, 6]
+
+
+def test_no_chunks_without_deal_pages():
+    assert plan_chunks(score_pages([COVER, RATES, TERMS])) == []
+
+
+def test_merge_deduplicates_deals_across_chunks():
+    first = {"hot_deals": [make_deal("A"), make_deal("B")]}
+    second = {"hot_deals": [make_deal("b", deal_inclusions=[{"title": "Spa credit"}]), make_deal("C")]}
+    merged = merge_hot_deals([first, second])
+    assert [hot_deal["name"] for hot_deal in merged["hot_deals"]] == ["A", "B", "C"]
+    assert [item["title"] for item in merged["hot_deals"][1]["deal_inclusions"]] \
+        == ["Daily breakfast", "Sunset cruise", "Spa credit"]
+    # Another hotel's deal of the same name is a different deal
+    assert len(merge_hot_deals([first, {"hot_deals": [make_deal("A", hotel="Lagoon Lodge")]}])["hot_deals"]) == 3
+
+
+def test_merge_points_validation_reports_at_the_merged_deals():
+    copy_failure = {"salvaged": True, "errors": ["marketing copy: quota"]}
+    first = {"hot_deals": [make_deal("A"), make_deal("B")],
+             "validation_errors": [dict(copy_failure, index=1, deal_index=1)]}
+    second = {"hot_deals": [make_deal("C"), make_deal("B")],
+              "validation_errors": [{"index": 0, "salvaged": False, "errors": ["name: missing"]},
+                                    dict(copy_failure, index=1, deal_index=0)]}
+    merged = merge_hot_deals([first, second])
+    assert [hot_deal["name"] for hot_deal in merged["hot_deals"]] == ["A", "B", "C"]
+    assert [(report["chunk"], report["index"], report.get("deal_index")) for report in merged["validation_errors"]] \
+        == [(0, 1, 1), (1, 0, None), (1, 1, 2)]
+    assert marketing_copy_failures(merged) == [1, 2]
+    assert first["validation_errors"][0]["deal_index"] == 1
+
+
+def chunk_client(make_client, fail_part=None):
+    client = make_client([json.dumps({"hot_deals": [make_deal("A")]}), json.dumps({"hot_deals": [make_deal("B")]})])
+    extract = client.extract_hot_deal_packages_from_bytes
+
+    def extract_part(file_bytes, display_name="Uploaded PDF", **options):
+        if fail_part is not None and f"(part {fail_part}/" in display_name:
+            raise RequestFailedError("quota exhausted", attempts=3)
+        return extract(file_bytes, display_name=display_name, **options)
+    client.extract_hot_deal_packages_from_bytes = extract_part
+    return client
+
+
+def test_chunked_extraction_sends_only_relevant_pages(make_client):
+    client = chunk_client(make_client)
+    file_bytes = text_pdf([[page] for page in contract_pages()])
+    data = extract_hot_deals_chunked(client, file_bytes, display_name="big.pdf")
+    assert "chunk_errors" not in data
+    assert client.backend.calls["upload"] == 2
+    assert {hot_deal["name"] for hot_deal in data["hot_deals"]} <= {"A", "B"}
+    # The merged result is cached for the whole contract
+    assert client.cached_hot_deal_packages(file_bytes) == data
+
+
+def test_failed_chunk_keeps_the_other_chunks(make_client):
+    client = chunk_client(make_client, fail_part=2)
+    file_bytes = text_pdf([[page] for page in contract_pages()])
+    data = extract_hot_deals_chunked(client, file_bytes, display_name="big.pdf")
+    assert data["hot_deals"]
+    assert len(data["chunk_errors"]) == 1 and "quota exhausted" in data["chunk_errors"][0]
+    assert client.cached_hot_deal_packages(file_bytes) is None
+
+
+def test_short_contracts_are_extracted_whole(make_client):
+    client = make_client([synthetic_response(1)])
+    data = extract_hot_deals_chunked(client, text_pdf([[COVER], [OFFER], [RATES]]))
+    assert len(data["hot_deals"]) == 1
+    assert client.backend.calls["upload"] == 1
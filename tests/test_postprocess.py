@@ -0,0 +1,63 @@
+from conftest import make_deal
+from postprocess import check_deals, deals_frame, postprocess_hot_deals
+
+
+def issues(*hot_deals):
+    return check_deals(deals_frame({"hot_deals": list(hot_deals)})[0])["issues"].tolist()
+
+
+def test_consistent_deals_raise_no_issues():
+    assert issues(make_deal("A"), make_deal("B")) == [[], []]
+
+
+def test_each_rule_is_flagged():
+    assert issues(
+        make_deal("price", original_display_price=None),
+        make_deal("inverted", original_display_price=2000.0),
+        make_deal("savings", savings_percentage=40.0),
+        make_deal("date", valid_until="31/12/2026"),
+        make_deal("validity", valid_from="2027-01-01", booking_deadline="2026-12-01"),
+        make_deal("travel", travel_dates_from="2026-12-31"),
+        make_deal("booking", booking_deadline="2027-01-31"),
+        make_deal("nights", minimum_nights=14, maximum_nights=7),
+        make_deal("fraction", minimum_nights=6.5),
+    ) == [["price_missing"], ["price_inverted"], ["savings_mismatch"], ["date_invalid"], ["validity_inverted"],
+          ["travel_inverted"], ["booking_after_validity"], ["nights_inverted"], ["nights_fractional"]]
+
+
+def test_results_of_many_contracts_share_one_frame():
+    frame, deals = deals_frame({"a.pdf": {"hot_deals": [make_deal("A")]},
+                                "b.pdf": {"hot_deals": [make_deal("B"), make_deal("C")]}})
+    assert frame[["contract", "deal_index"]].values.tolist() == [["a.pdf", 0], ["b.pdf", 0], ["b.pdf", 1]]
+    assert [hot_deal["name"] for hot_deal in deals] == ["A", "B", "C"]
+    assert deals_frame([{"hot_deals": [make_deal("A")]}])[0]["contract"].tolist() == [0]
+
+
+def test_fix_swaps_ranges_and_recomputes_savings():
+    data = {"hot_deals": [
+        make_deal("A"),
+        make_deal("B", original_display_price=2100.0, discounted_display_price=2940.0, savings_percentage=10,
+                  travel_dates_from="2026-12-20", travel_dates_until="2026-01-15", minimum_nights=14, maximum_nights=7),
+        make_deal("C", minimum_nights=9.5, maximum_nights=7, valid_from="soon"),
+    ]}
+    untouched = dict(data["hot_deals"][0])
+    report = postprocess_hot_deals(data, fix=True)
+    assert report["deal_index"].tolist() == [1, 2]
+
+    first, fixed, fractional = data["hot_deals"]
+    assert first == untouched
+    assert (fixed["original_display_price"], fixed["discounted_display_price"]) == (2940.0, 2100.0)
+    assert fixed["savings_percentage"] == 28.57
+    assert (fixed["travel_dates_from"], fixed["travel_dates_until"]) == ("2026-01-15", "2026-12-20")
+    assert (fixed["minimum_nights"], fixed["maximum_nights"]) == (7, 14)
+    assert isinstance(fixed["minimum_nights"], int)
+    # Values that cannot be fixed are left as the model produced them
+    assert (fractional["minimum_nights"], fractional["maximum_nights"], fractional["valid_from"]) == (9.5, 7, "soon")
+
+
+def test_report_without_fix_leaves_deals_alone():
+    data = {"hot_deals": [make_deal("A", savings_percentage=50.0)]}
+    report = postprocess_hot_deals(data)
+    assert report["issues"].tolist() == [["savings_mismatch"]]
+    assert report["recomputed_savings"].tolist() == [28.57]
+    assert data["hot_deals"][0]["savings_percentage"] == 50.0
@@ -0,0 +1,54 @@
+import threading
+import time
+
+from clients.rate_limiter import RateLimiter, estimate_pdf_tokens, estimate_text_tokens
+from conftest import text_pdf
+
+
+def test_requests_per_minute_window():
+    limiter = RateLimiter(requests_per_minute=2, window_seconds=0.2)
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == 0.0
+    assert not limiter.try_acquire()
+    started = time.monotonic()
+    assert limiter.acquire() > 0
+    assert 0.15 < time.monotonic() - started < 0.5
+
+
+def test_tokens_per_minute_window():
+    limiter = RateLimiter(tokens_per_minute=100, window_seconds=0.2)
+    assert limiter.try_acquire(60)
+    assert not limiter.try_acquire(60)
+    assert limiter.try_acquire(40)
+    time.sleep(0.25)
+    assert limiter.try_acquire(60)
+
+
+def test_oversized_request_is_admitted_into_an_empty_window():
+    limiter = RateLimiter(tokens_per_minute=100, window_seconds=0.2)
+    assert limiter.try_acquire(1000)
+    assert not limiter.try_acquire(1)
+
+
+def test_concurrent_acquires_respect_the_budget():
+    limiter = RateLimiter(requests_per_minute=3, window_seconds=0.3)
+    admitted = []
+
+    def worker():
+        limiter.acquire()
+        admitted.append(time.monotonic())
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    waits = sorted(at - started for at in admitted)
+    assert all(wait < 0.1 for wait in waits[:3])
+    assert all(wait >= 0.25 for wait in waits[3:])
+
+
+def test_token_estimates():
+    assert estimate_pdf_tokens(text_pdf([["a"], ["b"], ["c"]])) == 3 * 258
+    assert estimate_pdf_tokens(b"not a pdf") == 258
+    assert estimate_text_tokens("abcd" * 10, "efgh") == 11
@@ -0,0 +1,188 @@
+import threading
+import time
+
+import pytest
+
+from clients.backends import FakeBackend, FakeBackendError, FakeRateLimitError
+from clients.scheduler import AdaptiveConcurrency, QueueTimeoutError, RequestFailedError, RequestScheduler
+from benchmark import synthetic_response
+
+
+def scheduler(**options):
+    options = {"hedging": False, "seed": 0, "backoff_base_seconds": 0.001, "backoff_max_seconds": 0.001, **options}
+    return RequestScheduler(**options)
+
+
+def failing(errors, response="ok"):
+    """
+    A request raising the given errors in turn, then returning ``response``. Records
+    the model and timeout of every attempt.
+    """
+    errors = list(errors)
+    calls = []
+
+    def request(model, timeout):
+        calls.append((model, timeout))
+        if errors:
+            raise errors.pop(0)
+        return response
+    request.calls = calls
+    return request
+
+
+def test_deadline_fails_slow_request():
+    s = scheduler(timeout_seconds=0.1, max_attempts=1)
+    with pytest.raises(RequestFailedError) as raised:
+        s.call(lambda model, timeout: time.sleep(0.5), "m")
+    assert isinstance(raised.value.__cause__, TimeoutError)
+    assert s.stats()["timeouts"] == 1
+
+
+def test_attempts_get_the_remaining_time():
+    request = failing([FakeBackendError("busy")])
+    scheduler(timeout_seconds=10).call(request, "m")
+    first, second = (timeout for _, timeout in request.calls)
+    assert 0 < second < first <= 10
+
+
+def test_local_queueing_does_not_count_against_deadline():
+    s = scheduler(timeout_seconds=0.3, initial_concurrency=1, max_concurrency=1)
+    holder = threading.Thread(target=s.call, args=(lambda model, timeout: time.sleep(0.25), "m"))
+    holder.start()
+    time.sleep(0.05)
+    # Waits about 0.2 s for the slot, then needs 0.2 s of its own 0.3 s deadline
+    assert s.call(lambda model, timeout: (time.sleep(0.2), "done")[1], "m") == ("done", "m")
+    holder.join()
+
+
+def test_queue_timeout_is_local_and_not_an_overload():
+    s = scheduler(queue_timeout_seconds=0.05, initial_concurrency=1, max_concurrency=1,
+                  fallback_models={"pro": "flash"}, fallback_after_overloads=1)
+    holder = threading.Thread(target=s.call, args=(lambda model, timeout: time.sleep(0.3), "pro"))
+    holder.start()
+    time.sleep(0.05)
+    with pytest.raises(RequestFailedError) as raised:
+        s.call(lambda model, timeout: "ok", "pro")
+    holder.join()
+    assert isinstance(raised.value.__cause__, QueueTimeoutError)
+    stats = s.stats()
+    assert (stats["queue_timeouts"], stats["timeouts"], stats["fallbacks"], stats["retries"]) == (1, 0, 0, 0)
+    assert s.call(lambda model, timeout: "ok", "pro") == ("ok", "pro")
+
+
+def test_retryable_errors_are_retried():
+    request = failing([FakeBackendError("busy"), TimeoutError("slow")])
+    assert scheduler().call(request, "m") == ("ok", "m")
+    assert len(request.calls) == 3
+
+
+def test_non_retryable_errors_fail_at_once():
+    request = failing([ValueError("bad request")])
+    s = scheduler()
+    with pytest.raises(RequestFailedError) as raised:
+        s.call(request, "m")
+    assert isinstance(raised.value.__cause__, ValueError)
+    assert len(request.calls) == 1
+    assert s.stats()["failures"] == 1
+
+
+def test_attempts_are_limited():
+    request = failing([FakeBackendError("busy")] * 10)
+    with pytest.raises(RequestFailedError) as raised:
+        scheduler(max_attempts=3).call(request, "m")
+    assert raised.value.attempts == 3
+    assert len(request.calls) == 3
+
+
+def test_overloads_fall_back_to_the_next_model():
+    request = failing([FakeBackendError("busy"), FakeBackendError("busy")])
+    s = scheduler(fallback_models={"pro": "flash"}, fallback_after_overloads=2)
+    assert s.call(request, "pro") == ("ok", "flash")
+    assert [model for model, _ in request.calls] == ["pro", "pro", "flash"]
+    # The overloaded model is skipped for the cooldown
+    assert s.call(failing([]), "pro") == ("ok", "flash")
+
+
+def test_fallback_expires_after_cooldown():
+    s = scheduler(fallback_models={"pro": "flash"}, fallback_after_overloads=1, overload_cooldown_seconds=0.05)
+    assert s.call(failing([FakeBackendError("busy")]), "pro") == ("ok", "flash")
+    time.sleep(0.06)
+    assert s.call(failing([]), "pro") == ("ok", "pro")
+
+
+def test_abandoned_attempt_keeps_its_slot_until_it_finishes():
+    s = scheduler(timeout_seconds=0.05, max_attempts=1, initial_concurrency=2, max_concurrency=2)
+    with pytest.raises(RequestFailedError):
+        s.call(lambda model, timeout: time.sleep(0.3), "m")
+    assert s.stats()["in_flight"] == 1
+    time.sleep(0.4)
+    assert s.stats()["in_flight"] == 0
+
+
+def test_stream_releases_its_slot_when_it_ends():
+    s = scheduler()
+    chunks, model = s.call(lambda model, timeout: iter(["a", "b"]), "m", stream=True)
+    assert list(chunks) == ["a", "b"]
+    time.sleep(0.05)
+    assert s.stats()["in_flight"] == 0
+
+
+def test_hedge_wins_over_slow_primary():
+    s = scheduler(hedging=True, hedge_min_samples=1, initial_concurrency=2)
+    s.call(lambda model, timeout: "warm", "m")
+    delays = iter([0.5, 0.0])
+
+    def request(model, timeout):
+        time.sleep(next(delays))
+        return "ok"
+    started = time.monotonic()
+    assert s.call(request, "m") == ("ok", "m")
+    assert time.monotonic() - started < 0.4
+    assert s.stats()["hedge_wins"] == 1
+
+
+def test_aimd_limit():
+    concurrency = AdaptiveConcurrency(initial=8, minimum=1, maximum=10, decrease_cooldown_seconds=0)
+    concurrency.on_throttle()
+    assert concurrency.limit == 4
+    concurrency.on_success()
+    assert concurrency.limit == pytest.approx(4.25)
+    for _ in range(100):
+        concurrency.on_success()
+    assert concurrency.limit == 10
+    for _ in range(10):
+        concurrency.on_throttle()
+    assert concurrency.limit == 1
+
+
+def test_throttling_burst_halves_the_limit_once():
+    concurrency = AdaptiveConcurrency(initial=8, decrease_cooldown_seconds=60)
+    concurrency.on_throttle()
+    concurrency.on_throttle()
+    assert concurrency.limit == 4
+
+
+def test_rate_limit_errors_shrink_concurrency():
+    s = scheduler(initial_concurrency=8, max_concurrency=8)
+    s.call(failing([FakeRateLimitError("quota")]), "m")
+    stats = s.stats()
+    assert stats["throttled"] == 1
+    assert stats["concurrency_limit"] == 4
+
+
+def test_client_survives_injected_failures(make_client):
+    # With seed 3 the first request (phase one) fails
+    client = make_client([synthetic_response(2)], failure_rate=0.3, seed=3,
+                         scheduler=scheduler(max_attempts=8))
+    uploaded_file = client.upload_pdf(b"%PDF-1.4 contract")
+    data = client.extract_hot_deal_packages(uploaded_file)
+    assert len(data["hot_deals"]) == 2
+    assert client.scheduler.stats()["retries"] >= 1
+
+
+def test_fake_backend_times_out_within_the_attempt_timeout():
+    backend = FakeBackend([synthetic_response(1)], latency_seconds=1.0)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        backend.generate("m", ["prompt"], timeout=0.05)
+    assert time.monotonic() - started < 0.5
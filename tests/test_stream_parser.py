@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from clients.stream_parser import IncrementalDealParser
+from benchmark import SAMPLE_DEAL, synthetic_response
+
+TRICKY_DEALS = [
+    {"name": "Braces {inside} and [brackets]", "description": "Quote \" and backslash \\ and \"}\"", "n": 1},
+    {"name": "Unicode éè and escapes — \\u0041", "nested": {"list": [1, {"a": "}]"}], "empty": {}},
+     "inclusions": [{"title": "x"}, {"title": "y"}]},
+    {"name": "Escaped slash at the end \\", "tab": "a\tb\nc"},
+]
+
+
+def feed_in_chunks(text, size):
+    parser = IncrementalDealParser()
+    deals = []
+    for start in range(0, len(text), size):
+        deals.extend(parser.feed(text[start:start + size]))
+    return parser, deals
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_deals_survive_any_chunking(size):
+    text = json.dumps({"hot_deals": TRICKY_DEALS})
+    parser, deals = feed_in_chunks(text, size)
+    assert deals == TRICKY_DEALS
+    assert parser.found_array
+    assert parser.errors == []
+
+
+@pytest.mark.parametrize("split", ["\\", '\\"', '"}', "\\u00"])
+def test_chunk_boundary_inside_escape_or_string(split):
+    text = json.dumps({"hot_deals": TRICKY_DEALS})
+    position = text.index(split) + 1
+    parser = IncrementalDealParser()
+    deals = parser.feed(text[:position]) + parser.feed(text[position:])
+    assert deals == TRICKY_DEALS
+
+
+def test_deals_are_returned_as_soon_as_they_close():
+    text = json.dumps({"hot_deals": TRICKY_DEALS[:2]})
+    first_end = text.index(json.dumps(TRICKY_DEALS[0])) + len(json.dumps(TRICKY_DEALS[0]))
+    parser = IncrementalDealParser()
+    assert parser.feed(text[:first_end]) == [TRICKY_DEALS[0]]
+    assert parser.feed(text[first_end:]) == [TRICKY_DEALS[1]]
+
+
+def test_keys_before_the_array_are_ignored():
+    text = json.dumps({"summary": {"hot_deals": "not this"}, "notes": ["{", "}"], "hot_deals": TRICKY_DEALS[:1]})
+    assert feed_in_chunks(text, 5)[1] == TRICKY_DEALS[:1]
+
+
+def test_code_fence_and_bare_array():
+    _, deals = feed_in_chunks(synthetic_response(3), 11)
+    assert [deal["name"] for deal in deals] == [f"{SAMPLE_DEAL['name']} #{i}" for i in (1, 2, 3)]
+    assert feed_in_chunks("```json\n" + json.dumps(TRICKY_DEALS) + "\n```", 4)[1] == TRICKY_DEALS
+
+
+def test_missing_array_is_reported():
+    parser, deals = feed_in_chunks(json.dumps({"error": "no deals"}), 4)
+    assert deals == []
+    assert not parser.found_array
@@ -0,0 +1,49 @@
+from clients.structured_output import (
+    DEAL_FACTS_RESPONSE_SCHEMA,
+    HOT_DEALS_RESPONSE_SCHEMA,
+    validate_hot_deal,
+    validate_hot_deals,
+)
+from conftest import make_deal
+from models import DealType
+
+
+def deal_properties(schema):
+    return schema["properties"]["hot_deals"]["items"]["properties"]
+
+
+def test_schemas_list_the_deal_types():
+    for schema in (HOT_DEALS_RESPONSE_SCHEMA, DEAL_FACTS_RESPONSE_SCHEMA):
+        assert deal_properties(schema)["deal_type"] == {"type": "string", "enum": [item.value for item in DealType]}
+    assert "marketing_headline" not in deal_properties(DEAL_FACTS_RESPONSE_SCHEMA)
+
+
+def test_valid_deal_is_dumped_with_plain_strings():
+    data = validate_hot_deals({"hot_deals": [make_deal("A")]})
+    assert "validation_errors" not in data
+    assert data["hot_deals"][0]["deal_type"] == "extended_stay"
+    assert data["hot_deals"][0]["valid_from"] == "2026-01-01"
+
+
+def test_invalid_child_records_are_dropped():
+    raw = make_deal("A", special_offers="none")
+    raw["meal_plans"].append({"adult_price": "ask the hotel"})
+    deal, notes = validate_hot_deal(raw)
+    assert [meal_plan.name for meal_plan in deal.meal_plans] == ["Half board"]
+    assert deal.special_offers == []
+    assert notes == ["meal_plans[1]: dropped (2 error(s))", "special_offers: dropped non-list value"]
+
+
+def test_deals_missing_facts_are_rejected():
+    deal, notes = validate_hot_deal(make_deal("A", deal_type="flash_sale"))
+    assert deal is None and notes[0].startswith("deal_type:")
+    assert validate_hot_deal("not a deal")[0] is None
+
+
+def test_reports_point_at_the_response_and_the_kept_deals():
+    raw_deals = [make_deal("A", valid_from="soon"), make_deal("B", meal_plans=[{}]), make_deal("C")]
+    data = validate_hot_deals({"hot_deals": raw_deals})
+    assert [hot_deal["name"] for hot_deal in data["hot_deals"]] == ["B", "C"]
+    rejected, salvaged = data["validation_errors"]
+    assert (rejected["index"], rejected["salvaged"], rejected["raw_deal"]) == (0, False, raw_deals[0])
+    assert (salvaged["index"], salvaged["salvaged"], salvaged["deal_index"]) == (1, True, 0)
@@ -0,0 +1,117 @@
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from benchmark import synthetic_response
+from clients.telemetry import (
+    JsonLogSink,
+    MetricsSink,
+    PrometheusTextSink,
+    Telemetry,
+    estimate_cost,
+    format_report,
+    prometheus_text,
+)
+
+
+def usage(prompt, output, cached=0):
+    return SimpleNamespace(prompt_token_count=prompt, candidates_token_count=output, cached_content_token_count=cached)
+
+
+def test_cost_uses_the_model_family_price():
+    counts = {"prompt_tokens": 1_000_000, "cached_tokens": 200_000, "output_tokens": 100_000}
+    assert estimate_cost("models/gemini-1.5-pro-002", counts) == pytest.approx(0.8 * 1.25 + 0.2 * 0.3125 + 0.1 * 5.00)
+    assert estimate_cost("gemini-1.5-flash-8b", counts) == pytest.approx(0.8 * 0.075 + 0.2 * 0.01875 + 0.1 * 0.30)
+    assert estimate_cost("other-model", counts) is None
+
+
+def test_report_aggregates_stages_usage_and_counters():
+    telemetry = Telemetry()
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        telemetry.observe("generation", seconds, model="gemini-1.5-pro-002")
+    with pytest.raises(ValueError):
+        with telemetry.span("parse"):
+            raise ValueError("bad json")
+    telemetry.observe("custom", 0.5)
+    telemetry.observe("upload", 0.05)
+    telemetry.record_usage("gemini-1.5-pro-002", usage(1000, 200))
+    telemetry.record_usage("gemini-1.5-flash-002", usage(100, 50), stage="marketing_copy")
+    assert telemetry.record_usage("gemini-1.5-pro-002", None) is None
+    telemetry.increment("retries", 2)
+
+    report = telemetry.report()
+    # Pipeline stages in pipeline order, then custom ones
+    assert list(report["stages"]) == ["upload", "generation", "parse", "custom"]
+    generation = report["stages"]["generation"]
+    assert (generation["count"], generation["errors"], generation["total_seconds"]) == (4, 0, 1.0)
+    assert (generation["mean_ms"], generation["p50_ms"], generation["p95_ms"]) == (250.0, 300.0, 400.0)
+    assert (report["stages"]["parse"]["count"], report["stages"]["parse"]["errors"]) == (1, 1)
+    assert report["models"]["gemini-1.5-pro-002"]["calls"] == 1
+    assert report["totals"]["prompt_tokens"] == 1100 and report["totals"]["output_tokens"] == 250
+    assert report["totals"]["cost_usd"] == pytest.approx((1000 * 1.25 + 200 * 5.00 + 100 * 0.075 + 50 * 0.30) / 1e6,
+                                                          abs=1e-6)
+    assert report["counters"] == {"retries": 2}
+
+    assert "generation" in format_report(report) and "retries" in format_report(report)
+    telemetry.reset()
+    assert telemetry.report()["stages"] == {}
+
+
+def test_prometheus_text_format():
+    telemetry = Telemetry()
+    telemetry.observe("generation", 0.25)
+    telemetry.observe("generation", 0.75, ok=False)
+    telemetry.record_usage("gemini-1.5-pro-002", usage(1000, 200, cached=400))
+    telemetry.increment("fallbacks")
+    lines = prometheus_text(telemetry.report(), prefix="test").splitlines()
+
+    assert "# TYPE test_stage_seconds summary" in lines
+    assert 'test_stage_seconds{stage="generation",quantile="0.5"} 0.750000' in lines
+    assert 'test_stage_seconds_sum{stage="generation"} 1.000000' in lines
+    assert 'test_stage_seconds_count{stage="generation"} 2' in lines
+    assert 'test_stage_errors_total{stage="generation"} 1' in lines
+    assert 'test_tokens_total{model="gemini-1.5-pro-002",kind="cached"} 400' in lines
+    assert 'test_cost_usd_total{model="gemini-1.5-pro-002"} 0.001875' in lines
+    assert 'test_events_total{event="fallbacks"} 1' in lines
+    # Every sample line belongs to a declared metric family
+    families = {line.split()[2] for line in lines if line.startswith("# TYPE")}
+    assert all(line.split("{")[0].removesuffix("_sum").removesuffix("_count") in families
+               for line in lines if not line.startswith("#"))
+
+
+def test_sinks_receive_events_and_reports(tmp_path):
+    stream = io.StringIO()
+    log_path, prom_path = tmp_path / "events.jsonl", tmp_path / "metrics" / "hot_deals.prom"
+
+    class BrokenSink(MetricsSink):
+        def emit(self, event):
+            raise OSError("disk full")
+
+        def flush(self, report):
+            raise OSError("disk full")
+    telemetry = Telemetry(sinks=[JsonLogSink(stream=stream), JsonLogSink(path=str(log_path)),
+                                 PrometheusTextSink(str(prom_path)), BrokenSink()])
+    with telemetry.span("upload", model="m"):
+        pass
+    telemetry.record_usage("gemini-1.5-pro-002", usage(10, 5))
+    report = telemetry.flush()
+
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [event["event"] for event in events] == ["span", "usage", "report"]
+    assert events[0]["stage"] == "upload" and events[0]["model"] == "m" and events[0]["ok"]
+    assert events[2]["totals"] == report["totals"]
+    logged = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [dict(event, ts=None) for event in logged] == [dict(event, ts=None) for event in events]
+    assert prom_path.read_text() == prometheus_text(report)
+
+
+def test_client_calls_are_instrumented(make_client):
+    client = make_client([synthetic_response(2)])
+    client.extract_hot_deal_packages_from_bytes(b"%PDF-1.4 contract")
+    report = client.telemetry.report()
+    assert {"upload", "generation", "parse", "marketing_copy"} <= set(report["stages"])
+    assert report["stages"]["marketing_copy"]["count"] == 2
+    assert report["models"][client.model_name]["calls"] == 1
+    assert report["models"][client.copy_model_name]["calls"] == 2
@@ -0,0 +1,89 @@
+import json
+
+from benchmark import SAMPLE_DEAL, synthetic_response
+from clients.backends import FAKE_MARKETING_COPY, FakeBackend
+from clients.extraction_cache import ExtractionCache
+from clients.file_registry import FileRegistry
+from clients.google_client import DEAL_FACTS_PROMPT, GoogleGeminiClient, marketing_copy_failures
+from clients.scheduler import RequestScheduler
+from clients.structured_output import MARKETING_FIELDS
+
+
+def record_requests(client):
+    requests = []
+    generate = client.backend.generate
+
+    def recording(model, contents, **options):
+        requests.append((model, list(contents), options))
+        return generate(model, contents, **options)
+    client.backend.generate = recording
+    return requests
+
+
+def test_facts_then_copy_per_deal(make_client):
+    client = make_client([synthetic_response(2)])
+    requests = record_requests(client)
+    data = client.extract_hot_deal_packages_from_bytes(b"%PDF-1.4 contract")
+
+    facts, *copies = requests
+    # The contract goes out inline with the facts prompt, on the main model and the facts-only schema
+    assert facts[0] == client.model_name and facts[1][1] == DEAL_FACTS_PROMPT
+    schema = facts[2]["generation_config"]["response_schema"]
+    assert not set(MARKETING_FIELDS) & set(schema["properties"]["hot_deals"]["items"]["properties"])
+    # Each deal's copy is written by the copy model from its facts alone
+    assert [request[0] for request in copies] == [client.copy_model_name] * 2
+    assert all(not any(hasattr(part, "sha256") for part in request[1]) for request in copies)
+    assert all("marketing_headline" not in json.loads(request[1][1]) for request in copies)
+
+    assert [hot_deal["name"] for hot_deal in data["hot_deals"]] == [f"{SAMPLE_DEAL['name']} #{i}" for i in (1, 2)]
+    assert all(hot_deal[field] == FAKE_MARKETING_COPY[field]
+               for hot_deal in data["hot_deals"] for field in MARKETING_FIELDS)
+    assert "validation_errors" not in data
+
+
+def test_copy_is_cached_by_the_deal_facts(make_client):
+    client = make_client([synthetic_response(1)])
+    hot_deal = dict(SAMPLE_DEAL, marketing_headline="Old headline")
+    first = client.generate_marketing_copy(hot_deal)
+    # Different marketing fields, same facts: served from the cache
+    assert client.generate_marketing_copy(dict(hot_deal, marketing_headline="Other")) == first
+    assert client.backend.calls["generate"] == 1
+    client.generate_marketing_copy(hot_deal, refresh=True)
+    client.generate_marketing_copy(dict(hot_deal, minimum_nights=3))
+    assert client.backend.calls["generate"] == 3
+
+
+def test_copy_failures_keep_the_facts_and_are_not_cached(make_client):
+    client = make_client([synthetic_response(2)], copy_responses=["not json"])
+    file_bytes = b"%PDF-1.4 contract"
+    data = client.extract_hot_deal_packages_from_bytes(file_bytes)
+    assert len(data["hot_deals"]) == 2
+    assert all(hot_deal[field] == "" for hot_deal in data["hot_deals"] for field in MARKETING_FIELDS)
+    assert marketing_copy_failures(data) == [0, 1]
+    assert client.cached_hot_deal_packages(file_bytes) is None
+
+    # The next attempt writes the copy again once the copy model answers
+    client.backend.copy_responses = [json.dumps(FAKE_MARKETING_COPY)]
+    data = client.extract_hot_deal_packages_from_bytes(file_bytes)
+    assert marketing_copy_failures(data) == []
+    assert client.cached_hot_deal_packages(file_bytes) == data
+
+
+def test_streaming_yields_deals_in_order_with_copy(make_client):
+    client = make_client([synthetic_response(3)], stream_chunk_chars=64, latency_seconds=0.01)
+    file_bytes = b"%PDF-1.4 contract"
+    streamed = list(client.stream_hot_deal_packages_from_bytes(file_bytes))
+    assert [hot_deal["name"] for hot_deal in streamed] == [f"{SAMPLE_DEAL['name']} #{i}" for i in (1, 2, 3)]
+    assert all(hot_deal["marketing_headline"] == FAKE_MARKETING_COPY["marketing_headline"] for hot_deal in streamed)
+    assert client.cached_hot_deal_packages(file_bytes) == {"hot_deals": streamed}
+
+
+def test_single_call_mode_sends_the_full_prompt(tmp_path):
+    backend = FakeBackend([synthetic_response(2)])
+    client = GoogleGeminiClient(backend=backend, two_phase=False, cache=ExtractionCache(str(tmp_path / "cache")),
+                                file_registry=FileRegistry(backend.get_file, backend.delete_file,
+                                                           path=str(tmp_path / "files.json")),
+                                scheduler=RequestScheduler(hedging=False, seed=0))
+    data = client.extract_hot_deal_packages_from_bytes(b"%PDF-1.4 contract")
+    assert backend.calls["generate"] == 1
+    assert data["hot_deals"][0]["marketing_headline"] == SAMPLE_DEAL["marketing_headline"]